@@ -1,53 +1,178 @@
-data_path = 'dataWCA.slit'
-with open(data_path, 'r') as file:
-    lines = file.readlines()
-
-# Parse the file to extract relevant information
-header_end_index = lines.index("Atoms\n") + 2  # The section starts after "Atoms\n"
-header = lines[:header_end_index]
-atoms = lines[header_end_index:]
-
-atoms_type_1 = []
-atoms_type_2 = []
-
-for line in atoms:
-    parts = line.split()
-    atom_type = parts[1]  # Atom type is the second column
-    if atom_type == '1':
-        atoms_type_1.append(line)
-    elif atom_type == '2':
-        atoms_type_2.append(line)
-
-
-def convert_to_xyz(atoms, argon_radius=1.88, lj_radius=3.4):
-    """Convert atom data to XYZ format with adjusted sizes."""
-    num_atoms = len(atoms)
-    xyz_lines = [f"{num_atoms}\n", "Converted from LAMMPS file with adjusted sizes\n"]
-    for line in atoms:
-        parts = line.split()
-        atom_type = parts[1]  # Atom type
-        x, y, z = parts[2:5]  # Coordinates
-        if atom_type == '1':
-            size_adjusted = argon_radius  # Argon radius in Angstroms
-        elif atom_type == '2':
-            size_adjusted = lj_radius  # Lennard-Jones fluid radius in Angstroms
-        xyz_lines.append(f"{atom_type} {x} {y} {z} {size_adjusted:.3f}\n")
-    return xyz_lines
-
-
-xyz_type_1 = convert_to_xyz(atoms_type_1)
-xyz_type_2 = convert_to_xyz(atoms_type_2)
-
-
-output_path_xyz_type_1 = 'molekule_type_1.xyz'
-output_path_xyz_type_2 = 'molekule_type_2.xyz'
-
-with open(output_path_xyz_type_1, 'w') as file:
-    file.writelines(xyz_type_1)
-
-with open(output_path_xyz_type_2, 'w') as file:
-    file.writelines(xyz_type_2)
-
-print("Files created:")
-print(f"Type 1: {output_path_xyz_type_1}")
-print(f"Type 2: {output_path_xyz_type_2}")
+"""
+Převod LAMMPS data souboru (dataWCA.slit / .slit.gz) nebo custom dumpu (dumpWCA.cs)
+na XYZ soubory po typech atomů.
+
+Soubor se čte proudově po blocích řádků (NumPy), do paměti se nikdy nenačítá celý.
+Dump se zpracovává snímek po snímku, výstup je vícesnímkové XYZ.
+
+    python slit_to_xyz.py                      # dataWCA.slit -> molekule_type_1.xyz, molekule_type_2.xyz
+    python slit_to_xyz.py dumpWCA.cs           # -> dumpWCA_type_1.xyz, dumpWCA_type_2.xyz (všechny snímky)
+"""
+import gzip
+import itertools
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # .../src – kvůli core.*
+from core.lammps_data import format_columns
+
+# typ atomu -> poloměr pro vizualizaci
+TYPE_RADIUS = {1: 1.88, 2: 3.4}
+CHUNK_ROWS = 500_000
+COUNT_WIDTH = 20  # rezervovaná šířka řádku s počtem atomů, po zápisu se přepíše na místě
+
+
+def _open_text(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+class XyzWriter:
+    """Jeden výstupní XYZ soubor pro jeden typ; počet atomů ve snímku se doplní až po zápisu."""
+
+    def __init__(self, path, atom_type):
+        self.path = path
+        self.atom_type = atom_type
+        self.radius = TYPE_RADIUS[atom_type]
+        self.f = open(path, "wb")
+        self._count_pos = None
+        self._count = 0
+
+    def begin_frame(self, comment):
+        self._count_pos = self.f.tell()
+        self.f.write(b" " * COUNT_WIDTH + b"\n")
+        self.f.write(f"{comment}\n".encode())
+        self._count = 0
+
+    def write_rows(self, xyz):
+        if len(xyz) == 0:
+            return
+        # 'typ x y z poloměr' – vektorově jako sekce Atoms v core.lammps_data (np.savetxt formátuje po řádcích)
+        n = len(xyz)
+        self.f.write(format_columns([(np.full(n, self.atom_type), 0), (xyz[:, 0], 3), (xyz[:, 1], 3),
+                                     (xyz[:, 2], 3), (np.full(n, self.radius), 3)]))
+        self._count += len(xyz)
+
+    def end_frame(self):
+        end = self.f.tell()
+        self.f.seek(self._count_pos)
+        self.f.write(f"{self._count:<{COUNT_WIDTH}d}".encode())
+        self.f.seek(end)
+
+    def close(self):
+        self.f.close()
+
+
+def _stream_rows(f, n_rows, writers, type_col, xyz_cols, chunk_rows=CHUNK_ROWS, scale=None):
+    """Načte n_rows řádků po blocích a rozdělí je podle typu do writerů."""
+    remaining = n_rows
+    while remaining > 0:
+        n = min(chunk_rows, remaining)
+        block = np.loadtxt(itertools.islice(f, n), ndmin=2)
+        if len(block) == 0:
+            raise ValueError(f"Soubor skončil, chybí ještě {remaining} řádků atomů")
+        remaining -= len(block)
+
+        types = block[:, type_col].astype(np.int64)
+        xyz = block[:, xyz_cols]
+        if scale is not None:
+            lo, span = scale
+            xyz = lo + xyz * span
+        for atom_type, writer in writers.items():
+            writer.write_rows(xyz[types == atom_type])
+
+
+def convert_data_file(path, out_prefix="molekule", chunk_rows=CHUNK_ROWS):
+    """Sekce Atoms datového souboru -> {typ: xyz soubor}."""
+    writers = {t: XyzWriter(f"{out_prefix}_type_{t}.xyz", t) for t in TYPE_RADIUS}
+    with _open_text(path) as f:
+        n_atoms = None
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and parts[1] == "atoms":
+                n_atoms = int(parts[0])
+            if parts and parts[0] == "Atoms":
+                break
+        else:
+            raise ValueError(f"V souboru {path} chybí sekce Atoms")
+        if n_atoms is None:
+            raise ValueError(f"V hlavičce {path} chybí počet atomů")
+
+        next(f)  # prázdný řádek za "Atoms"
+        for w in writers.values():
+            w.begin_frame("Converted from LAMMPS file with adjusted sizes")
+        # atomic: id type x y z [ix iy iz]
+        _stream_rows(f, n_atoms, writers, type_col=1, xyz_cols=[2, 3, 4], chunk_rows=chunk_rows)
+
+    for w in writers.values():
+        w.end_frame()
+        w.close()
+    return {t: w.path for t, w in writers.items()}
+
+
+def convert_dump_file(path, out_prefix=None, chunk_rows=CHUNK_ROWS):
+    """Custom dump (ITEM: ATOMS id type x y z ...) -> vícesnímkové xyz po typech. Vrací ({typ: soubor}, počet snímků)."""
+    if out_prefix is None:
+        out_prefix = os.path.basename(str(path)).split(".")[0]
+    writers = {t: XyzWriter(f"{out_prefix}_type_{t}.xyz", t) for t in TYPE_RADIUS}
+    n_frames = 0
+    with _open_text(path) as f:
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if not line.startswith("ITEM: TIMESTEP"):
+                continue
+            step = int(f.readline())
+            f.readline()                         # ITEM: NUMBER OF ATOMS
+            n_atoms = int(f.readline())
+            f.readline()                         # ITEM: BOX BOUNDS ...
+            bounds = np.array([f.readline().split()[:2] for _ in range(3)], dtype=float)
+            columns = f.readline().split()[2:]   # ITEM: ATOMS id type x y z
+
+            scale = None
+            if "x" in columns:
+                names = ["x", "y", "z"]
+            elif "xu" in columns:
+                names = ["xu", "yu", "zu"]
+            else:
+                names = ["xs", "ys", "zs"]
+                scale = (bounds[:, 0], bounds[:, 1] - bounds[:, 0])
+            xyz_cols = [columns.index(c) for c in names]
+
+            for w in writers.values():
+                w.begin_frame(f"Timestep {step}")
+            _stream_rows(f, n_atoms, writers, columns.index("type"), xyz_cols, chunk_rows, scale)
+            for w in writers.values():
+                w.end_frame()
+            n_frames += 1
+
+    for w in writers.values():
+        w.close()
+    return {t: w.path for t, w in writers.items()}, n_frames
+
+
+def _is_dump(path):
+    with _open_text(path) as f:
+        return f.readline().startswith("ITEM: TIMESTEP")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        data_path = sys.argv[1]
+    else:
+        data_path = "dataWCA.slit" if os.path.exists("dataWCA.slit") else "dataWCA.slit.gz"
+
+    if _is_dump(data_path):
+        outputs, n_frames = convert_dump_file(data_path)
+        print(f"Snímků: {n_frames}")
+    else:
+        outputs = convert_data_file(data_path)
+
+    print("Files created:")
+    for atom_type, path in outputs.items():
+        print(f"Type {atom_type}: {path}")
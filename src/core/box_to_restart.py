@@ -1,12 +1,22 @@
 import re
 
-def make_restart_in_from_box(box_text: str, rstfile: str, nrun_cont: int) -> str:
+def make_restart_in_from_box(box_text: str, rstfile: str, nrun_cont: int | None,
+                             append_output: bool = False) -> str:
+    """
+    Из box.in делает вход для продолжения с restart-файла (read_restart, без релаксации/эквилибрации).
+    nrun_cont=None – "run ${nrun} upto": běží se do kroku nrun od kroku v restartu; spolu s
+    rstfile "run.restart.*" (LAMMPS načte soubor s nejvyšším krokem) je vstup nezávislý na kroku
+    a hodí se pro řetěz segmentů (cluster_service.submit_restart_chain).
+    append_output=True – log.lammps и dump-файлы дописываются, а не перезаписываются
+    (LAMMPS тогда нужно запускать с -log none, см. make_restart_run_script).
+    """
     txt = box_text
 
     # 1) вставка переменных перед "# General"
+    nrun_line = "" if nrun_cont is None else f"variable nrun_cont   equal   {nrun_cont}\n"
     insert = (
         "\n# --- Continuation from restart ---\n"
-        f"variable nrun_cont   equal   {nrun_cont}\n"
+        f"{nrun_line}"
         f"variable rstfile     string  {rstfile}\n\n"
     )
     txt = txt.replace("\n# General\n", insert + "# General\n", 1)
@@ -24,9 +34,88 @@ def make_restart_in_from_box(box_text: str, rstfile: str, nrun_cont: int) -> str
     txt = re.sub(r"^\s*velocity\s+fluid\s+scale\s+.*\n",
                  "", txt, flags=re.MULTILINE)
 
-    # 5) run ${nrun} -> run ${nrun_cont}
+    # 5) run ${nrun} -> run ${nrun_cont} / run ${nrun} upto
+    run_line = "run              ${nrun} upto" if nrun_cont is None else "run              ${nrun_cont}"
     txt = re.sub(r"^\s*run\s+\$\{nrun\}\s*$",
-                 "run              ${nrun_cont}",
+                 run_line,
                  txt, flags=re.MULTILINE)
 
+    if append_output:
+        # 6) дописывать в log.lammps и в dump-файлы предыдущего сегмента
+        txt = "log              log.lammps append\n" + txt
+        txt = re.sub(r"^(\s*dump\s+(\S+)\s+.*)$",
+                     r"\1\ndump_modify      \2 append yes",
+                     txt, flags=re.MULTILINE)
+
+    return txt
+
+
+def add_walltime_guard(input_text: str, timeout: str) -> str:
+    """
+    Vstup LAMMPS, který skončí sám před walltime fronty: "timer timeout" na začátku
+    (běh se po uplynutí času řádně ukončí) a po produkčním run checkpoint run.restart.<krok>,
+    ze kterého naváže další segment řetězu. Job tak skončí s nulovým kódem (afterok projde).
+    """
+    txt = f"timer            timeout {timeout} every 100\n" + input_text
+    txt = re.sub(r"^(\s*run\s+\$\{(?:nrun|nrun_cont)\}.*)$",
+                 r"\1\nwrite_restart    run.restart.*",
+                 txt, count=1, flags=re.MULTILINE)
     return txt
+
+
+def make_restart_run_script(run_text: str, input_name: str, node: str | None = None, queue: str | None = None,
+                            ppn: int | None = None, mem_gb: int | None = None, walltime: str | None = None,
+                            append_log: bool = False, before_run: str | None = None) -> str:
+    """
+    Из run.sh делает скрипт для qsub: новые ресурсы PBS (если заданы) и mpirun -in input_name.
+    Понимает и старые заголовки (#PBS -l nodes=..., #PBS -l mem=...).
+    before_run – shell-строка, вставляемая перед mpirun (например, переименование сегмента densF).
+    """
+    txt = run_text
+    if queue:
+        txt = re.sub(r"^#PBS -q .*$", f"#PBS -q {queue}", txt, flags=re.MULTILINE)
+    if node and ppn:
+        mem = f":mem={int(mem_gb)}GB" if mem_gb else ""
+        txt = re.sub(r"^#PBS -l select=.*$", f"#PBS -l select=1:host={node}:ncpus={ppn}:mpiprocs={ppn}{mem}",
+                     txt, flags=re.MULTILINE)
+        txt = re.sub(r"^#PBS -l nodes=.*$", f"#PBS -l nodes={node}:ppn={ppn}", txt, flags=re.MULTILINE)
+        txt = re.sub(r"(mpirun\s+-np\s+)\d+", rf"\g<1>{ppn}", txt)
+    if mem_gb:
+        txt = re.sub(r"^#PBS -l mem=.*$", f"#PBS -l mem={int(mem_gb)}gb", txt, flags=re.MULTILINE)
+    if walltime:
+        txt = re.sub(r"^#PBS -l walltime=.*$", f"#PBS -l walltime={walltime}", txt, flags=re.MULTILINE)
+
+    # vstup LAMMPS; s append_log se výchozí log.lammps při startu nepřepíše (log ... append je ve vstupu)
+    log = " -log none" if append_log else ""
+    txt = re.sub(r"-in\s+\S+(\s+-log\s+\S+)?", lambda m: f"-in {input_name}{log}", txt)
+    if before_run:
+        txt = re.sub(r"^(\s*mpirun\b)", lambda m: f"{before_run}\n{m.group(1)}", txt, count=1, flags=re.MULTILINE)
+    return txt
+
+
+def make_array_script(run_text: str, index_file: str, count: int, job_name: str, inner_script: str,
+                      node: str | None = None, queue: str | None = None, ppn: int | None = None,
+                      mem_gb: int | None = None, walltime: str | None = None) -> str:
+    """
+    PBS job array (#PBS -J 0-<count-1>) nad složkami z index_file (jedna složka na řádek, relativně
+    k adresáři qsub). Subjob i přejde do i-té složky a spustí v ní inner_script (run.sh / run_restart.sh).
+    Hlavička PBS se převezme z run_text (s novými zdroji), všechny subjoby mají stejné zdroje.
+    """
+    header = []
+    for line in run_text.splitlines():
+        if line.strip() and not line.startswith("#"):
+            break
+        if not line.startswith("#PBS -N"):
+            header.append(line)
+    txt = make_restart_run_script("\n".join(header) + "\n", inner_script, node=node, queue=queue, ppn=ppn,
+                                  mem_gb=mem_gb, walltime=walltime).rstrip("\n")
+    return (
+        f"{txt}\n"
+        f"#PBS -N {job_name}\n"
+        f"#PBS -J 0-{count - 1}\n"
+        "\n"
+        'cd "$PBS_O_WORKDIR"\n'
+        f'dir=$(sed -n "$((PBS_ARRAY_INDEX + 1))p" {index_file})\n'
+        'cd "$dir" || exit 1\n'
+        f'PBS_O_WORKDIR="$PWD" bash {inner_script}\n'
+    )
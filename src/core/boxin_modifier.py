@@ -1,38 +1,121 @@
 import os
-def modify_boxin(config, template_path, output_path, decimals_map=None):
-    with open(f"src/config/{template_path}", "r") as f:
-        lines = f.readlines()
+from functools import lru_cache
 
-    with open(output_path, "w") as f:
-        for line in lines:
-            replaced = False
-            for key in config:
-                if line.strip().startswith("variable"):
-                    parts = line.strip().split()
-                    if len(parts) >= 2 and parts[1] == key:
-                        if decimals_map and key in decimals_map:
-                            value_str = f"{config[key]:.{decimals_map[key]}f}"
-                        else:
-                            value_str = str(config[key])
-                        f.write(f"variable {key} equal {value_str}\n")
-                        replaced = True
-                        break
-            if not replaced:
-                f.write(line)
-
-
-    submit_template_path = "src/scripts/run_template.sh"
-    with open(submit_template_path, "r") as f:
-        template = f.read()
-
-    submit_filled = template.format(
+# Klíče configu, které se do box.in nedosazují jako "variable" (geometrie, PBS, názvy souborů)
+NON_TEMPLATE_KEYS = {
+    "Lx", "Ly", "Lz", "fluid_gap", "rho_fluid", "rho_wall",
+    "box_output", "box_template", "data_file", "data_cache",
+    "lammps_exe", "nodes", "ppn", "queue", "mem_gb", "walltime",
+    "potential_type", "simulation_name",
+}
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+class BoxTemplate:
+    """
+    Šablona box.in naparsovaná jen jednou: pamatuje si, na kterých řádcích jsou
+    "variable <jméno>" a read_data, takže dosazení configu je O(počet klíčů).
+    """
+
+    def __init__(self, text):
+        self.lines = text.splitlines(keepends=True)
+        self.variables = {}          # jméno -> [indexy řádků]
+        self.parameters = set()      # proměnné s číselnou hodnotou – ty má dosadit config
+        self.read_data_lines = []
+        for i, line in enumerate(self.lines):
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == "variable":
+                self.variables.setdefault(parts[1], []).append(i)
+                if len(parts) >= 4 and parts[2] == "equal" and _is_number(parts[3]):
+                    self.parameters.add(parts[1])
+            elif parts and parts[0] == "read_data":
+                self.read_data_lines.append(i)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r") as f:
+            return cls(f.read())
+
+    def render(self, config, decimals_map=None):
+        """Vrátí text box.in s hodnotami z configu."""
+        lines = list(self.lines)
+        for key, indices in self.variables.items():
+            if key not in config:
+                continue
+            if decimals_map and key in decimals_map:
+                value_str = f"{config[key]:.{decimals_map[key]}f}"
+            else:
+                value_str = str(config[key])
+            for i in indices:
+                lines[i] = f"variable {key} equal {value_str}\n"
+
+        # název datového souboru (i .gz) podle configu
+        if "data_file" in config:
+            for i in self.read_data_lines:
+                lines[i] = f"read_data        {config['data_file']}\n"
+        return "".join(lines)
+
+    def render_many(self, configs, decimals_map=None):
+        """Dávkové vykreslení pro sweep – šablona se nečte ani neparsuje znovu."""
+        return [self.render(config, decimals_map) for config in configs]
+
+    def check(self, config):
+        """
+        Vrátí (unknown, defaulted):
+          unknown   – klíče configu, které v šabloně nejsou a nejsou ani v NON_TEMPLATE_KEYS (nejspíš překlep)
+          defaulted – číselné proměnné šablony, které config nedosadil (zůstane hodnota ze šablony);
+                      odvozené (step, ${...}, is_file(...)) a string proměnné se nepočítají
+        """
+        unknown = sorted(k for k in config if k not in self.variables and k not in NON_TEMPLATE_KEYS)
+        defaulted = sorted(k for k in self.parameters if k not in config)
+        return unknown, defaulted
+
+
+@lru_cache(maxsize=None)
+def load_box_template(path):
+    return BoxTemplate.from_file(path)
+
+
+@lru_cache(maxsize=None)
+def load_run_template(path="src/scripts/run_template.sh"):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def render_run_script(config, template=None):
+    """Vyplní šablonu run.sh (PBS hlavička + spuštění LAMMPS)."""
+    template = template if template is not None else load_run_template()
+    return template.format(
         node=config["nodes"],
         ppn=config["ppn"],
+        mem_gb=config.get("mem_gb", 8),
+        walltime=config.get("walltime", "24:00:00"),
         queue=config["queue"],
         simulation_name=config["simulation_name"],
         lammps_exe=config["lammps_exe"]
     )
 
+
+def modify_boxin(config, template_path, output_path, decimals_map=None):
+    template = load_box_template(f"src/config/{template_path}")
+
+    unknown, defaulted = template.check(config)
+    if unknown:
+        print(f"UPOZORNĚNÍ: klíče {', '.join(unknown)} nejsou v šabloně {template_path}, nedosazeno.")
+    if defaulted:
+        print(f"UPOZORNĚNÍ: proměnné {', '.join(defaulted)} ze šablony {template_path} config nedosadil, "
+              f"zůstává hodnota ze šablony.")
+
+    with open(output_path, "w") as f:
+        f.write(template.render(config, decimals_map))
+
     submit_path = os.path.join(os.path.dirname(output_path), "run.sh")
     with open(submit_path, "w", newline="\n") as f:
-        f.write(submit_filled)
+        f.write(render_run_script(config))
@@ -0,0 +1,334 @@
+"""
+Konvergence hustotního profilu z fix ave/chunk (densF.dat + segmenty densF.seg_*.dat).
+
+Skript běží i na clusteru: cluster_service ho pošle na stdin `python3 -` spolu se skenem
+složek, proto jen standardní knihovna a syntaxe Pythonu 3.6 (bez numpy / dataclasses).
+Pro každou složku vypíše řádek
+    @@CONV folder  status  converged_step  more_steps  rel_err  steps
+status: converged / running / nodata; chybějící hodnota = "-".
+
+Postup:
+  - z běžícího průměru (ave running) se berou jen hodnoty na hranicích bloků po block_steps
+    krocích; průměr bloku = (D_b A_b - D_a A_a) / (D_b - D_a);
+  - blokové průměry se slučují po dvojicích, dokud jsou sousední bloky korelované
+    (autokorelace lag 1 > MAX_RHO1) – odhad chyby pak nepodceňuje korelační čas;
+  - rel_err = RMS(stderr / mean) přes biny tekutiny; drift = RMS z-skóre první vs. druhé poloviny;
+  - konvergováno v prvním kroku X, kde rel_err <= tol a drift < DRIFT_Z;
+    jinak "needs N more steps" z rel_err ~ 1/sqrt(kroky).
+Stav čtení se ukládá do <složka>/.convergence.json (offset, hranice bloků) – další sken
+čte jen nově dopsané bloky.
+"""
+import json
+import math
+import os
+import re
+import sys
+from typing import List, Optional, Tuple
+
+DENSF_FILE = "densF.dat"
+CACHE_FILE = ".convergence.json"
+CHECK_BYTES = 256      # kolik bajtů před offsetem z cache se ověřuje (týž soubor?)
+BLOCK_STEPS = 100000   # délka bloku (kroky); dělí nrestart, takže hranice sedí i na startu segmentu
+TOL = 0.02             # cílová relativní chyba profilu (RMS přes biny tekutiny)
+MIN_BLOCKS = 10
+DRIFT_Z = 2.0          # RMS z-skóre první vs. druhé poloviny; čistý šum dává ~1
+MAX_RHO1 = 0.3         # autokorelace sousedních blokových průměrů, nad ní se bloky slučují
+FLUID_THRESHOLD = 1e-3  # biny s hustotou pod tímto podílem maxima jsou stěna
+
+
+def _segment_start(first: int, second: Optional[int]) -> int:
+    """Začátek běžícího průměru: první výstup - nfreq (nfreq z rozdílu prvních dvou výstupů)."""
+    nfreq = (second - first) if second is not None else first
+    return first - nfreq
+
+
+def scan_file(path: str, block_steps: int = BLOCK_STEPS, state: Optional[dict] = None) -> dict:
+    """
+    Inkrementálně projde soubor ave/chunk a vrátí stav:
+      offset – bajt za posledním úplným blokem, steps – první dva výstupy (kvůli startu),
+      points – [[krok, [A...]], ...] běžícího průměru na hranicích bloků.
+    Nedopsaný konec souboru se nechá na příště.
+    """
+    state = dict(state or {})
+    state.setdefault("offset", 0)
+    state.setdefault("steps", [])
+    state.setdefault("points", [])
+
+    with open(path, "rb") as f:
+        f.seek(state["offset"])
+        while True:
+            head = f.readline()
+            if not head:
+                break
+            if head.startswith(b"#") or not head.strip():
+                state["offset"] = f.tell()
+                continue
+            if not head.endswith(b"\n"):
+                break
+            parts = head.split()
+            step, n = int(parts[0]), int(parts[1])
+            rows = [f.readline() for _ in range(n)]
+            if len(rows) < n or not rows[-1].endswith(b"\n"):
+                break
+            state["offset"] = f.tell()
+
+            if len(state["steps"]) < 2:
+                state["steps"].append(step)
+            start = _segment_start(state["steps"][0], state["steps"][1] if len(state["steps"]) > 1 else None)
+            # mezi hranicemi bloků se řádky chunků jen přeskočí
+            if (step - start) % block_steps == 0:
+                state["points"].append([step, [float(r.split()[-1]) for r in rows]])
+    return state
+
+
+def _first_step(path: str) -> Optional[int]:
+    """Krok první hlavičky bloku (po komentářích) – identita souboru / segmentu."""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"#") or not line.strip():
+                continue
+            try:
+                return int(line.split()[0])
+            except ValueError:
+                return None
+    return None
+
+
+def _bytes_before(path: str, offset: int) -> str:
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - CHECK_BYTES))
+        return f.read(min(offset, CHECK_BYTES)).decode("latin-1")
+
+
+def _cached_state(path: str, size: int, entry: Optional[dict], block_steps: int) -> Optional[dict]:
+    """
+    Stav z cache jen pro tentýž soubor: nový běh densF.dat přepíše a při pokračování se starý
+    přejmenuje na segment – nový densF.dat pak brzy přeroste starou velikost. Kontroluje se
+    první krok a bajty těsně před uloženým offsetem; jinak None (číst od začátku).
+    """
+    if not entry or entry.get("block_steps") != block_steps or entry.get("size", 0) > size:
+        return None
+    state = entry.get("state") or {}
+    steps, offset = state.get("steps") or [], state.get("offset", 0)
+    if steps and _first_step(path) != steps[0]:
+        return None
+    if offset and _bytes_before(path, offset) != entry.get("tail"):
+        return None
+    return state
+
+
+def _segment_files(folder: str) -> List[str]:
+    pattern = re.compile(r"^densF\.seg_(\d+)\.dat$")
+    names = sorted((int(m.group(1)), name) for name in os.listdir(folder) for m in [pattern.match(name)] if m)
+    files = [name for _, name in names]
+    if os.path.exists(os.path.join(folder, DENSF_FILE)):
+        files.append(DENSF_FILE)
+    return files
+
+
+def folder_blocks(folder: str, block_steps: int = BLOCK_STEPS, cache: Optional[dict] = None
+                  ) -> Tuple[List[Tuple[int, int, List[float]]], dict]:
+    """
+    Blokové průměry ze všech segmentů složky v časovém pořadí: [(délka, koncový krok, průměr[bins])].
+    Segment se ořízne na start následujícího (kroky po restartu se počítaly znovu).
+    cache – {soubor: {size, block_steps, tail, state}}; vrací i aktualizovanou cache.
+    """
+    cache = dict(cache or {})
+    states = []
+    for name in _segment_files(folder):
+        path = os.path.join(folder, name)
+        size = os.path.getsize(path)
+        entry = cache.get(name)
+        state = _cached_state(path, size, entry, block_steps)
+        if state is None or entry["size"] != size:
+            state = scan_file(path, block_steps, state)
+        cache[name] = {"size": size, "block_steps": block_steps, "state": state,
+                       "tail": _bytes_before(path, state["offset"])}
+        if state["steps"]:
+            states.append(state)
+
+    states.sort(key=lambda s: s["steps"][0])
+    blocks = []
+    for i, state in enumerate(states):
+        steps = state["steps"]
+        start = _segment_start(steps[0], steps[1] if len(steps) > 1 else None)
+        end = None
+        if i + 1 < len(states):
+            nxt = states[i + 1]["steps"]
+            end = _segment_start(nxt[0], nxt[1] if len(nxt) > 1 else None)
+        points = [p for p in state["points"] if end is None or p[0] <= end]
+        prev_step, prev_sum = start, None
+        for step, values in points:
+            duration = step - prev_step
+            if duration <= 0:
+                continue
+            elapsed = step - start
+            total = [v * elapsed for v in values]
+            mean = total if prev_sum is None else [(t - p) for t, p in zip(total, prev_sum)]
+            blocks.append((duration, step, [m / duration for m in mean]))
+            prev_step, prev_sum = step, total
+    return blocks, cache
+
+
+def _weighted_stats(blocks) -> Tuple[List[float], List[float], int]:
+    """(mean[bins], stderr[bins], kroky) z blokových průměrů (váha = délka bloku)."""
+    weights = [b[0] for b in blocks]
+    total = float(sum(weights))
+    nbins = len(blocks[0][2])
+    mean = [sum(w * b[2][j] for w, b in zip(weights, blocks)) / total for j in range(nbins)]
+    k = len(blocks)
+    if k < 2:
+        return mean, [float("nan")] * nbins, int(total)
+    stderr = []
+    for j in range(nbins):
+        var = sum(w * (b[2][j] - mean[j]) ** 2 for w, b in zip(weights, blocks)) / total * k / (k - 1)
+        stderr.append(math.sqrt(var / k))
+    return mean, stderr, int(total)
+
+
+def _merge_pairs(blocks):
+    merged = []
+    for a, b in zip(blocks[0::2], blocks[1::2]):
+        w = a[0] + b[0]
+        merged.append((w, b[1], [(a[0] * x + b[0] * y) / w for x, y in zip(a[2], b[2])]))
+    return merged
+
+
+def _rho1(blocks, fluid: List[int]) -> float:
+    """Průměrná autokorelace lag 1 blokových průměrů přes biny tekutiny."""
+    if len(blocks) < 4 or not fluid:
+        return 0.0
+    values = []
+    for j in fluid:
+        x = [b[2][j] for b in blocks]
+        m = sum(x) / len(x)
+        var = sum((v - m) ** 2 for v in x)
+        if var > 0:
+            values.append(sum((x[i] - m) * (x[i + 1] - m) for i in range(len(x) - 1)) / var)
+    return sum(values) / len(values) if values else 0.0
+
+
+def _fluid_bins(mean: List[float]) -> List[int]:
+    top = max(mean) if mean else 0.0
+    return [j for j, m in enumerate(mean) if m > FLUID_THRESHOLD * top and m > 0]
+
+
+def profile_error(blocks, min_blocks: int = MIN_BLOCKS) -> Tuple[float, float]:
+    """
+    (rel_err, drift) pro řadu bloků: bloky se slučují, dokud jsou korelované (a zbývá
+    dost bloků), rel_err = RMS(stderr/mean), drift = RMS z-skóre polovin.
+    """
+    mean, _, _ = _weighted_stats(blocks)
+    fluid = _fluid_bins(mean)
+    while len(blocks) >= 2 * min_blocks and _rho1(blocks, fluid) > MAX_RHO1:
+        blocks = _merge_pairs(blocks)
+    mean, stderr, _ = _weighted_stats(blocks)
+    if not fluid:
+        return float("inf"), 0.0
+    rel = math.sqrt(sum((stderr[j] / mean[j]) ** 2 for j in fluid) / len(fluid))
+
+    half = len(blocks) // 2
+    drift = 0.0
+    if half >= 2:
+        m1, s1, _ = _weighted_stats(blocks[:half])
+        m2, s2, _ = _weighted_stats(blocks[half:])
+        z2 = [(m1[j] - m2[j]) ** 2 / (s1[j] ** 2 + s2[j] ** 2) for j in fluid if s1[j] + s2[j] > 0]
+        drift = math.sqrt(sum(z2) / len(z2)) if z2 else 0.0
+    return rel, drift
+
+
+def evaluate(blocks, tol: float = TOL, min_blocks: int = MIN_BLOCKS, block_steps: int = BLOCK_STEPS) -> dict:
+    """
+    {status, converged_step, more_steps, rel_err, steps}:
+      converged – první konec bloku, kde rel_err <= tol a drift < DRIFT_Z;
+      running   – odhad, kolik kroků ještě chybí (rel_err klesá jako 1/sqrt(kroky)).
+    """
+    if len(blocks) < min_blocks:
+        steps = sum(b[0] for b in blocks)
+        more = (min_blocks - len(blocks)) * block_steps
+        return {"status": "running" if blocks else "nodata", "converged_step": None,
+                "more_steps": more if blocks else None, "rel_err": None, "steps": steps}
+
+    for k in range(min_blocks, len(blocks) + 1):
+        rel, drift = profile_error(blocks[:k], min_blocks)
+        if rel <= tol and drift < DRIFT_Z:
+            return {"status": "converged", "converged_step": blocks[k - 1][1], "more_steps": 0,
+                    "rel_err": rel, "steps": sum(b[0] for b in blocks)}
+
+    steps = sum(b[0] for b in blocks)
+    more = steps * ((rel / tol) ** 2 - 1) if math.isfinite(rel) else steps
+    if drift >= DRIFT_Z:
+        # profil se ještě mění – první polovina se nepočítá, potřeba aspoň tolik navíc
+        more = max(more, steps / 2)
+    more = int(math.ceil(max(more, block_steps) / block_steps)) * block_steps
+    return {"status": "running", "converged_step": None, "more_steps": more, "rel_err": rel, "steps": steps}
+
+
+def check_folder(folder: str, tol: float = TOL, block_steps: int = BLOCK_STEPS, use_cache: bool = True) -> dict:
+    cache_path = os.path.join(folder, CACHE_FILE)
+    cache = None
+    if use_cache:
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = None
+    try:
+        blocks, cache = folder_blocks(folder, block_steps, cache)
+    except Exception:
+        if cache is None:
+            raise
+        # poškozená / neplatná cache nesmí chybu zakonzervovat – znovu od začátku, jinak pryč s ní
+        try:
+            blocks, cache = folder_blocks(folder, block_steps, None)
+        except Exception:
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            raise
+    if use_cache:
+        try:
+            with open(cache_path, "w") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+    return evaluate(blocks, tol, block_steps=block_steps)
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return "%.4g" % value
+    return str(value)
+
+
+def main(argv: List[str]) -> int:
+    """python3 - [--tol 0.02] [--block-steps 100000] [složky...] (výchozí: všechny podsložky cwd)."""
+    tol, block_steps, folders = TOL, BLOCK_STEPS, []
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == "--tol":
+            tol = float(args.pop(0))
+        elif arg == "--block-steps":
+            block_steps = int(args.pop(0))
+        else:
+            folders.append(arg)
+    if not folders:
+        folders = sorted(d for d in os.listdir(".") if os.path.isdir(d) and not d.startswith("."))
+
+    for folder in folders:
+        try:
+            res = check_folder(folder, tol, block_steps)
+        except Exception as e:  # jedna rozbitá složka nesmí shodit sken ostatních
+            print("@@CONVERR %s\t%s" % (folder, e))
+            continue
+        print("@@CONV " + "\t".join([folder, res["status"], _fmt(res["converged_step"]), _fmt(res["more_steps"]),
+                                     _fmt(res["rel_err"]), _fmt(res["steps"])]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+# Parametry, které opravdu mění polohy částic v dataWCA.slit (sig12 určuje tloušťku stěny).
+# eps/sig/rcut ostatních interakcí jdou jen do box.in, takže soubor se pro ně sdílí.
+GEOMETRY_KEYS = ("Lx", "Ly", "Lz", "fluid_gap", "rho_fluid", "rho_wall", "sig12")
+
+# zvýšit při změně formátu zápisu, aby se nepoužily staré soubory
+FORMAT_VERSION = 1
+
+DEFAULT_MAX_GB = 20.0
+
+
+def cache_dir() -> Path:
+    """Složka cache: DATA_CACHE_DIR z .env, jinak ~/.cache/simapp/data."""
+    path = os.getenv("DATA_CACHE_DIR") or Path.home() / ".cache" / "simapp" / "data"
+    return Path(path)
+
+
+def max_bytes() -> int:
+    return int(float(os.getenv("DATA_CACHE_MAX_GB") or DEFAULT_MAX_GB) * 1024 ** 3)
+
+
+def cache_key(config) -> str:
+    """Hash geometrických parametrů (+ gzip ano/ne), čísla normalizovaná na float (13 == 13.0)."""
+    params = {k: float(config[k]) for k in GEOMETRY_KEYS}
+    params["gz"] = str(config["data_file"]).endswith(".gz")
+    params["version"] = FORMAT_VERSION
+    blob = json.dumps(params, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()[:32]
+
+
+def _entry(key):
+    return cache_dir() / f"{key}.slit"
+
+
+def _meta(key):
+    return cache_dir() / f"{key}.json"
+
+
+def _link_or_copy(src, dest):
+    """Hardlink, když to jde (stejný disk), jinak kopie."""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def fetch(key, dest) -> bool:
+    """
+    Pokud je soubor v cache, nalinkuje/zkopíruje ho do dest a vrátí True.
+    Přístup se zaznamená do mtime metadat (LRU).
+    """
+    entry = _entry(key)
+    if not entry.exists():
+        return False
+    # dest může být hardlink na starou položku cache – nikdy nepřepisovat na místě
+    if os.path.exists(dest):
+        os.remove(dest)
+    _link_or_copy(entry, dest)
+    meta = _meta(key)
+    if meta.exists():
+        os.utime(meta)
+    return True
+
+
+def store(key, src, params) -> None:
+    """Uloží hotový soubor do cache (atomicky přes dočasné jméno) a případně uvolní místo."""
+    folder = cache_dir()
+    folder.mkdir(parents=True, exist_ok=True)
+
+    tmp = folder / f"{key}.tmp.{os.getpid()}"
+    _link_or_copy(src, tmp)
+    os.replace(tmp, _entry(key))
+
+    meta = {"params": {k: params[k] for k in GEOMETRY_KEYS},
+            "data_file": params["data_file"],
+            "size": os.path.getsize(_entry(key)),
+            "created": time.time()}
+    with open(_meta(key), "w") as f:
+        json.dump(meta, f)
+
+    evict(max_bytes())
+
+
+def list_entries():
+    """[{key, size, last_used, params, data_file}, ...] od posledně použitého."""
+    folder = cache_dir()
+    if not folder.exists():
+        return []
+    entries = []
+    for meta_path in folder.glob("*.json"):
+        key = meta_path.stem
+        entry = _entry(key)
+        if not entry.exists():
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        entries.append({"key": key, "size": entry.stat().st_size,
+                        "last_used": meta_path.stat().st_mtime,
+                        "params": meta.get("params"), "data_file": meta.get("data_file")})
+    entries.sort(key=lambda e: e["last_used"], reverse=True)
+    return entries
+
+
+def _remove(key):
+    for path in (_entry(key), _meta(key)):
+        if path.exists():
+            path.unlink()
+
+
+def evict(limit) -> int:
+    """Maže nejdéle nepoužité položky, dokud celková velikost nepřesahuje limit. Vrací počet smazaných."""
+    entries = list_entries()
+    total = sum(e["size"] for e in entries)
+    removed = 0
+    while entries and total > limit:
+        oldest = entries.pop()
+        _remove(oldest["key"])
+        total -= oldest["size"]
+        removed += 1
+    return removed
+
+
+def clear() -> int:
+    """Vyprázdní cache, vrací počet smazaných položek."""
+    folder = cache_dir()
+    if not folder.exists():
+        return 0
+    keys = {p.name.split(".")[0] for p in folder.iterdir()}
+    for key in keys:
+        _remove(key)
+    for leftover in folder.glob("*.tmp.*"):
+        leftover.unlink()
+    return len(keys)
+
+
+if __name__ == "__main__":
+    # python -m core.data_cache list | clear   (spouštět ze složky src)
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if cmd == "clear":
+        print(f"Smazáno položek: {clear()}")
+    else:
+        entries = list_entries()
+        for e in entries:
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(e["last_used"]))
+            print(f"{e['key']}  {e['size'] / 1024 ** 2:9.1f} MB  {used}  {e['params']}")
+        print(f"Celkem: {len(entries)} položek, {sum(e['size'] for e in entries) / 1024 ** 3:.2f} GB "
+              f"(limit {max_bytes() / 1024 ** 3:.1f} GB) v {cache_dir()}")
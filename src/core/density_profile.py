@@ -0,0 +1,329 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+import io
+import re
+
+import numpy as np
+
+# fix ave/chunk ... ave running file densF.dat – při každém navázání z restartu začíná
+# průměr znovu; předchozí segment se před spuštěním přejmenuje na densF.seg_<první krok>.dat
+DENSF_FILE = "densF.dat"
+SEGMENT_PATTERN = "densF.seg_*.dat"
+MERGED_FILE = "densF_merged.dat"
+N_BLOCKS = 20  # počet bloků pro odhad směrodatné chyby
+
+
+def segment_rename_command(file_name: str = DENSF_FILE) -> str:
+    """Shell příkaz pro run skript: odloží aktuální densF.dat jako segment pojmenovaný prvním krokem."""
+    stem = file_name.rsplit(".", 1)[0]
+    return (f'if [ -s {file_name} ]; then '
+            f's=$(awk \'$1 !~ /^#/ && NF == 3 {{print $1; exit}}\' {file_name}); '
+            f'mv {file_name} "{stem}.seg_${{s:-0}}.dat"; fi')
+
+
+STREAM_CHUNK_BYTES = 256 * 1024 ** 2  # kolik bajtů se najednou parsuje (omezuje paměť u GB souborů)
+
+
+class AveChunkStream:
+    """
+    Rychlé čtení souboru fix ave/chunk (i rostoucího): jeden vektorizovaný průchod np.loadtxt
+    přes hlavičky bloků ("step n_chunks total") i řádky chunků – ze všech řádků se berou jen
+    sloupce (0, column), bloky mají pevnou délku 1 + n_chunks řádků.
+    read_new() vrací jen bloky dopsané od minulého volání; nedopsaný konec souboru počká.
+    """
+
+    def __init__(self, path, column: int = -1, chunk_bytes: int = STREAM_CHUNK_BYTES):
+        self.path = Path(path)
+        self.column = column
+        self.chunk_bytes = chunk_bytes
+        self.offset = 0                       # bajt za posledním úplným blokem
+        self.coords: Optional[np.ndarray] = None
+        self.n_chunks: Optional[int] = None
+        self._usecol: Optional[int] = None    # záporný index sloupce – platí pro hlavičku i řádek chunku
+
+    def _read_layout(self, f) -> bool:
+        """Komentáře, počet chunků a souřadnice binů z prvního bloku; False, dokud blok není celý."""
+        f.seek(0)
+        offset, first = 0, []
+        for raw in f:
+            line = raw.decode("ascii", "replace")
+            if not first and (not line.strip() or line.lstrip().startswith("#")):
+                offset += len(raw)
+                continue
+            if not raw.endswith(b"\n"):
+                return False
+            first.append(line.split())
+            if len(first) == 1 + int(first[0][1]):
+                break
+        if not first or len(first) < 1 + int(first[0][1]):
+            return False
+
+        rows = first[1:]
+        width = len(rows[0])
+        column = self.column if self.column < 0 else self.column - width
+        if not -len(first[0]) <= column < 0:
+            raise ValueError(f"Sloupec {self.column} nelze číst rychlým parserem (hlavička má {len(first[0])} čísla).")
+        self.n_chunks = len(rows)
+        self.coords = np.array([float(r[1]) for r in rows])
+        self._usecol = column
+        self.offset = offset
+        return True
+
+    def read_new(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Nové úplné bloky: (steps[k], values[k, n_chunks]); prázdné pole, když nic nepřibylo."""
+        empty = np.empty(0, dtype=np.int64), np.empty((0, self.n_chunks or 0))
+        with open(self.path, "rb") as f:
+            if self.n_chunks is None and not self._read_layout(f):
+                return empty
+            f.seek(self.offset)
+            steps, values = [], []
+            period = 1 + self.n_chunks
+            while True:
+                buf = f.read(self.chunk_bytes)
+                if not buf:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == 10)
+                n_blocks = len(newlines) // period
+                if n_blocks == 0:
+                    if len(buf) < self.chunk_bytes:
+                        break  # konec souboru uprostřed bloku – soubor ještě roste
+                    raise ValueError(f"Blok v {self.path} je delší než {self.chunk_bytes} B.")
+                end = int(newlines[n_blocks * period - 1]) + 1
+                table = np.loadtxt(io.BytesIO(buf[:end]), usecols=(0, self._usecol), ndmin=2)
+                if len(table) != n_blocks * period:
+                    raise ValueError(f"Neočekávaný formát {self.path} (prázdné řádky / komentáře uvnitř).")
+                blocks = table.reshape(n_blocks, period, 2)
+                # kontrola pravidelnosti: čísla chunků 1..n v každém bloku (jinak proměnný počet chunků)
+                if not np.array_equal(blocks[:, 1:, 0], np.broadcast_to(np.arange(1, period), (n_blocks, period - 1))):
+                    raise ValueError(f"Bloky v {self.path} nemají stálý počet chunků.")
+                steps.append(blocks[:, 0, 0].astype(np.int64))
+                values.append(blocks[:, 1:, 1])
+                self.offset += end
+                f.seek(self.offset)
+        if not steps:
+            return empty
+        return np.concatenate(steps), np.vstack(values)
+
+
+def _read_ave_chunk_lines(path, column: int = -1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pomalé čtení po řádcích – pro soubory s proměnným počtem chunků."""
+    with open(path, "r") as f:
+        lines = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    steps, blocks, coords = [], [], None
+    i = 0
+    while i < len(lines):
+        head = lines[i].split()
+        step, n_chunks = int(head[0]), int(head[1])
+        rows = lines[i + 1:i + 1 + n_chunks]
+        if len(rows) < n_chunks:
+            break
+        table = np.array([row.split() for row in rows], dtype=float)
+        if coords is None:
+            coords = table[:, 1]
+        steps.append(step)
+        blocks.append(table[:, column])
+        i += 1 + n_chunks
+
+    if coords is None:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, 0))
+    return np.array(steps, dtype=np.int64), coords, np.vstack(blocks)
+
+
+def read_ave_chunk(path, column: int = -1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Načte soubor fix ave/chunk: (steps[n_blocks], coords[n_bins], values[n_blocks, n_bins]).
+    column – sloupec hodnoty v řádku chunku (výchozí poslední = density/number).
+    Nedopsaný poslední blok (soubor ještě roste) se zahodí.
+    """
+    stream = AveChunkStream(path, column)
+    try:
+        steps, values = stream.read_new()
+    except ValueError:
+        return _read_ave_chunk_lines(path, column)
+    if stream.coords is None:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, 0))
+    return steps, stream.coords, values
+
+
+def segment_files(folder, file_name: str = DENSF_FILE) -> List[Path]:
+    """Všechny segmenty v pořadí: densF.seg_<krok>.dat podle kroku, aktuální densF.dat poslední."""
+    folder = Path(folder)
+    stem = file_name.rsplit(".", 1)[0]
+    pattern = re.compile(rf"^{re.escape(stem)}\.seg_(\d+)\.dat$")
+    segments = sorted((int(m.group(1)), p) for p in folder.iterdir() if (m := pattern.match(p.name)))
+    paths = [p for _, p in segments]
+    if (folder / file_name).exists():
+        paths.append(folder / file_name)
+    return paths
+
+
+def block_means(steps: np.ndarray, running: np.ndarray, nfreq: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Z běžícího průměru (ave running) zpět průměry jednotlivých bloků.
+    Start segmentu = první výstup - nfreq. Vrací (durations[n], means[n, bins]).
+    """
+    start = steps[0] - nfreq
+    elapsed = (steps - start).astype(float)               # D_k
+    durations = np.diff(np.concatenate(([0.0], elapsed)))  # d_k
+    weighted = running * elapsed[:, None]                  # D_k * A_k
+    means = np.diff(np.vstack((np.zeros((1, running.shape[1])), weighted)), axis=0) / durations[:, None]
+    return durations, means
+
+
+@dataclass
+class MergedProfile:
+    coords: np.ndarray
+    mean: np.ndarray
+    stderr: np.ndarray        # směrodatná chyba průměru po binech (z N_BLOCKS bloků)
+    steps: int                # celkem zprůměrovaných kroků
+    segments: int
+    blocks: int               # počet výstupních bloků ave/chunk ve výsledku
+
+
+def infer_nfreq(step_arrays: List[np.ndarray]) -> Optional[int]:
+    diffs = [np.diff(s) for s in step_arrays if len(s) > 1]
+    diffs = np.concatenate(diffs) if diffs else np.empty(0)
+    diffs = diffs[diffs > 0]
+    return int(diffs.min()) if len(diffs) else None
+
+
+def block_stats(durations: np.ndarray, means: np.ndarray,
+                n_blocks: int = N_BLOCKS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Časově vážený průměr bloků a jeho směrodatná chyba z n_blocks souvislých skupin
+    (skupiny tlumí korelaci sousedních výstupů). Vrací (mean[bins], stderr[bins]).
+    """
+    mean = (means * durations[:, None]).sum(axis=0) / durations.sum()
+    groups = np.array_split(np.arange(len(durations)), min(n_blocks, len(durations)))
+    if len(groups) < 2:
+        return mean, np.full_like(mean, np.nan)
+    g_w = np.array([durations[g].sum() for g in groups])
+    g_mean = np.vstack([(means[g] * durations[g][:, None]).sum(axis=0) / durations[g].sum() for g in groups])
+    var = ((g_mean - mean) ** 2 * g_w[:, None]).sum(axis=0) / g_w.sum() * len(groups) / (len(groups) - 1)
+    return mean, np.sqrt(var / len(groups))
+
+
+def merge_segments(paths: List[Path], running: bool = True, nfreq: Optional[int] = None,
+                   n_blocks: int = N_BLOCKS) -> Optional[MergedProfile]:
+    """
+    Sloučí segmenty densF z jednotlivých navázání do jednoho časově váženého profilu.
+    Segment i se ořízne na start segmentu i+1 (kroky po posledním restartu se počítaly znovu).
+    running=False pro soubory bez 'ave running' (každý blok je už samostatný průměr).
+    """
+    data = [read_ave_chunk(p) for p in paths]
+    data = [d for d in data if len(d[0])]
+    if not data:
+        return None
+    data.sort(key=lambda d: d[0][0])
+    nfreq = nfreq or infer_nfreq([d[0] for d in data])
+    if nfreq is None:
+        nfreq = int(data[0][0][0])  # jediný blok od kroku 0
+
+    coords = data[0][1]
+    all_durations, all_means = [], []
+    for k, (steps, seg_coords, values) in enumerate(data):
+        if len(seg_coords) != len(coords):
+            raise ValueError(f"Segment {paths[k]} má jiný počet binů ({len(seg_coords)} vs {len(coords)}).")
+        if k + 1 < len(data):
+            next_start = data[k + 1][0][0] - nfreq
+            keep = steps <= next_start
+            steps, values = steps[keep], values[keep]
+            if not len(steps):
+                continue
+        if running:
+            durations, means = block_means(steps, values, nfreq)
+        else:
+            durations, means = np.full(len(steps), float(nfreq)), values
+        all_durations.append(durations)
+        all_means.append(means)
+
+    durations = np.concatenate(all_durations)
+    means = np.vstack(all_means)
+    mean, stderr = block_stats(durations, means, n_blocks)
+    return MergedProfile(coords=coords, mean=mean, stderr=stderr, steps=int(durations.sum()),
+                         segments=len(all_means), blocks=len(durations))
+
+
+def write_profile(path, profile: MergedProfile) -> None:
+    header = (f"Sloučený profil: {profile.segments} segmentů, {profile.blocks} bloků, "
+              f"{profile.steps} kroků\nCoord1 density/number stderr")
+    np.savetxt(path, np.column_stack((profile.coords, profile.mean, profile.stderr)),
+               fmt="%.6g", header=header)
+
+
+def merge_folder(folder, file_name: str = DENSF_FILE) -> Optional[Path]:
+    """Sloučí všechny segmenty ve složce do densF_merged.dat; None, pokud data nejsou."""
+    analysis = analyze_folder(folder, file_name)
+    return analysis.merged_file if analysis is not None else None
+
+
+@dataclass
+class ContactDensity:
+    """Kontaktní hustota tekutiny u stěn: první maximum profilu od každé stěny."""
+    z_left: float
+    rho_left: float
+    err_left: float
+    z_right: float
+    rho_right: float
+    err_right: float
+
+    @property
+    def mean(self) -> float:
+        return (self.rho_left + self.rho_right) / 2.0
+
+
+def _first_peak(profile: np.ndarray, order: np.ndarray, threshold: float) -> int:
+    """Index prvního lokálního maxima ve směru order (od stěny), za první nenulovou hustotou."""
+    values = profile[order]
+    filled = np.flatnonzero(values > threshold)
+    if not len(filled):
+        return int(order[0])
+    i = int(filled[0])
+    while i + 1 < len(values) and values[i + 1] >= values[i]:
+        i += 1
+    return int(order[i])
+
+
+def contact_density(coords: np.ndarray, mean: np.ndarray, stderr: Optional[np.ndarray] = None,
+                    threshold: float = 1e-3) -> ContactDensity:
+    """
+    Kontaktní hustota u obou stěn štěrbiny: hodnota prvního píku od levé i pravé stěny.
+    threshold – relativně k maximu profilu; biny stěn (nulová hustota tekutiny) se přeskočí.
+    """
+    limit = threshold * float(np.nanmax(mean)) if len(mean) else 0.0
+    stderr = np.full_like(mean, np.nan) if stderr is None else stderr
+    left = _first_peak(mean, np.arange(len(mean)), limit)
+    right = _first_peak(mean, np.arange(len(mean))[::-1], limit)
+    return ContactDensity(float(coords[left]), float(mean[left]), float(stderr[left]),
+                          float(coords[right]), float(mean[right]), float(stderr[right]))
+
+
+@dataclass
+class ProfileAnalysis:
+    profile: MergedProfile
+    contact: ContactDensity
+    merged_file: Path
+
+
+def analyze_folder(folder, file_name: str = DENSF_FILE) -> Optional[ProfileAnalysis]:
+    """
+    Analýza stažené složky simulace: sloučený profil ze všech segmentů (densF_merged.dat),
+    blokové chyby a kontaktní hustota u stěn. None, pokud densF data nejsou.
+    """
+    profile = merge_segments(segment_files(folder, file_name))
+    if profile is None:
+        return None
+    out = Path(folder) / MERGED_FILE
+    write_profile(out, profile)
+    return ProfileAnalysis(profile, contact_density(profile.coords, profile.mean, profile.stderr), out)
+
+
+def format_analysis(analysis: ProfileAnalysis) -> str:
+    p, c = analysis.profile, analysis.contact
+    return (f"Profil: {p.steps} kroků, {p.blocks} bloků, {p.segments} segmentů\n"
+            f"Kontaktní hustota vlevo (z = {c.z_left:.3f}): {c.rho_left:.4f} ± {c.err_left:.4f}\n"
+            f"Kontaktní hustota vpravo (z = {c.z_right:.3f}): {c.rho_right:.4f} ± {c.err_right:.4f}\n"
+            f"Uloženo: {analysis.merged_file}")
@@ -0,0 +1,120 @@
+import gzip
+import numpy as np
+
+# Kolik atomů se nejvýš formátuje najednou (cca 40 B na řádek => ~40 MB bufferu)
+CHUNK_ATOMS = 1_000_000
+
+
+def open_data_file(path, mode="wb"):
+    """Otevře datový soubor; pro příponu .gz rovnou gzip (LAMMPS read_data .gz umí načíst)."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+def _fixed_width_digits(values, decimals=0):
+    """
+    Převede čísla na matici ASCII znaků (N, šířka), zarovnanou doprava mezerami.
+    Pro LAMMPS stačí, že sloupce jsou oddělené bílými znaky, takže pevná šířka nevadí.
+    """
+    values = np.asarray(values)
+    scale = 10 ** decimals
+    scaled = np.rint(np.abs(values) * scale).astype(np.int64)
+    negative = (values < 0) & (scaled > 0)
+    int_part = scaled // scale
+    frac_part = scaled % scale
+
+    n_int = len(str(int(int_part.max()))) if len(values) else 1
+    width = int(negative.any()) + n_int + (decimals + 1 if decimals else 0)
+    out = np.full((len(values), width), ord(" "), dtype=np.uint8)
+
+    col = width - 1
+    for _ in range(decimals):
+        out[:, col] = ord("0") + frac_part % 10
+        frac_part //= 10
+        col -= 1
+    if decimals:
+        out[:, col] = ord(".")
+        col -= 1
+
+    n_digits = np.ones(len(values), dtype=np.int64)
+    for k in range(n_int):
+        digit = ord("0") + int_part % 10
+        if k == 0:
+            out[:, col] = digit
+        else:
+            visible = int_part > 0
+            out[:, col - k] = np.where(visible, digit, ord(" "))
+            n_digits += visible
+        int_part //= 10
+
+    rows = np.nonzero(negative)[0]
+    out[rows, col - n_digits[rows]] = ord("-")
+    return out
+
+
+def format_columns(columns):
+    """
+    Zformátuje textové řádky ze sloupců najednou: columns = [(hodnoty, počet desetinných míst), ...],
+    sloupce oddělené mezerou, řádky '\n'. Bez smyčky přes řádky.
+    """
+    n = len(columns[0][0])
+    space = np.full((n, 1), ord(" "), dtype=np.uint8)
+    newline = np.full((n, 1), ord("\n"), dtype=np.uint8)
+    parts = []
+    for values, decimals in columns:
+        if parts:
+            parts.append(space)
+        parts.append(_fixed_width_digits(values, decimals))
+    return np.hstack(parts + [newline]).tobytes()
+
+
+def format_atoms(ids, types, xyz, decimals=3):
+    """Zformátuje řádky sekce Atoms ('id type x y z') najednou, bez smyčky přes atomy."""
+    return format_columns([(ids, 0), (types, 0)] + [(xyz[:, i], decimals) for i in range(3)])
+
+
+def write_data_file(path, box, masses, regions):
+    """
+    Zapíše LAMMPS data soubor v jednom průchodu.
+
+    box     – (Lx, Ly, Lz), box začíná v 0
+    masses  – {typ: hmotnost}
+    regions – seznam (atom_type, count, chunks), kde count je přesný počet atomů
+              oblasti a chunks je iterátor polí (n, 3) se souřadnicemi
+
+    Hlavička se píše s přesným počtem atomů předem, takže soubor se už nemusí
+    znovu načítat a přepisovat. Atomy se zapisují po blocích, paměť je omezená
+    velikostí bloku. Vrací seznam skutečně zapsaných počtů pro každou oblast.
+    """
+    Lx, Ly, Lz = box
+    n_total = sum(count for _, count, _ in regions)
+
+    header = (
+        "LAMMPS Description\n\n"
+        f"{n_total} atoms\n"
+        f"{len(masses)} atom types\n\n"
+        f"0.0 {Lx} xlo xhi\n"
+        f"0.0 {Ly} ylo yhi\n"
+        f"0.0 {Lz} zlo zhi\n\n"
+        "Masses\n\n"
+        + "".join(f"{atom_type} {mass}\n" for atom_type, mass in masses.items())
+        + "\nAtoms\n\n"
+    )
+
+    written = []
+    atom_id = 1
+    with open_data_file(path) as f:
+        f.write(header.encode("ascii"))
+        for atom_type, count, chunks in regions:
+            n_region = 0
+            for xyz in chunks:
+                ids = np.arange(atom_id, atom_id + len(xyz), dtype=np.int64)
+                types = np.full(len(xyz), atom_type, dtype=np.int64)
+                f.write(format_atoms(ids, types, xyz))
+                atom_id += len(xyz)
+                n_region += len(xyz)
+            if n_region != count:
+                raise ValueError(f"Oblast typu {atom_type}: hlavička hlásí {count} atomů, zapsáno {n_region}")
+            written.append(n_region)
+    return written
@@ -1,5 +1,22 @@
 import numpy as np
 import os
+from core.lammps_data import CHUNK_ATOMS, write_data_file
+from core import data_cache
+
+
+def lattice_region(xs, ys, zs):
+    """Vrátí pole (N, 3) souřadnic mřížky x × y × z v pořadí z -> y -> x (x se mění nejrychleji)."""
+    zz, yy, xx = np.meshgrid(zs, ys, xs, indexing="ij")
+    return np.column_stack((xx.ravel(), yy.ravel(), zz.ravel()))
+
+
+def lattice_chunks(xs, ys, zs, max_atoms=CHUNK_ATOMS):
+    """Stejná mřížka jako lattice_region, ale po vrstvách v z tak, aby blok měl nejvýš ~max_atoms atomů."""
+    layers = max(1, max_atoms // max(len(xs) * len(ys), 1))
+    for k in range(0, len(zs), layers):
+        yield lattice_region(xs, ys, zs[k:k + layers])
+
+
 def generate_particles(config):
     # 1) Vstupní parametry z configu
     Lx = config["Lx"]
@@ -59,15 +76,8 @@ def generate_particles(config):
     Nz_fluid = int(fluid_gap // a_fluid)
     print(f"Tek nz:{Nz_fluid}")
 
-    # 8) Spočítej skutečné počty částic a objemy
-    N_wall_single = Nx_wall * Ny_wall * Nz_wall
-    N_wall = 2 * N_wall_single  # 2 stěny
+    # 8) Objemy (počty částic se berou až z opravdu vygenerovaných mřížek níže)
     V_wall = 2 * (Lx * Ly * wall_thickness)
-    rho_wall_actual = N_wall / V_wall
-
-    N_fluid = Nx_fluid * Ny_fluid * Nz_fluid
-    V_fluid = fluid_gap * Lx * Ly
-    rho_fluid_actual = N_fluid / V_fluid
 
     # # 9) Zkontroluj odchylku hustoty (třeba ±1%)
     # wall_diff = abs(rho_wall_actual - rho_wall)/rho_wall
@@ -78,75 +88,53 @@ def generate_particles(config):
     #     print(f"UPOZORNĚNÍ: Hustota tekutiny se liší o více než ±1%: {rho_fluid_actual:.4f} vs {rho_fluid}")
 
 
-    with open(data_file, "w") as f:
-        f.write("LAMMPS Description\n\n")
-        f.write(f"{N_wall + N_fluid} atoms\n")
-        f.write("2 atom types\n\n")
-        f.write(f"0.0 {Lx} xlo xhi\n")
-        f.write(f"0.0 {Ly} ylo yhi\n")
-        f.write(f"0.0 {Lz} zlo zhi\n\n")
-        f.write("Masses\n\n1 1.0\n2 1.0\n\n")
-        f.write("Atoms\n\n")
-
-        atom_id = 1
-
-        # Generování TEKUTINY. Z-rozsah: wall_thickness až (wall_thickness + fluid_gap), s offsetem 0.5*a_fluid
-        # z_fluid_start = wall_thickness + 0.5 * a_fluid
-        # z_fluid_end   = z_fluid_start + Nz_fluid * a_fluid
-        # for z in np.arange(z_fluid_start, z_fluid_end, a_fluid):
-        #     for y in np.arange(0.5*a_fluid, Ly, a_fluid):
-        #         for x in np.arange(0.5*a_fluid, Lx, a_fluid):
-        #             f.write(f"{atom_id} 1 {x:.3f} {y:.3f} {z:.3f}\n")
-        #             atom_id += 1
-        z_fluid_start = Lz/2 - fluid_gap/2 + 0.5 * a_fluid
-        z_fluid_end   = z_fluid_start + Nz_fluid * a_fluid
-        Nz_fluid_new = 0
-        for z in np.arange(z_fluid_start, z_fluid_end, a_fluid):
-            Nz_fluid_new += 1
-            for y in np.arange(0.5*a_fluid, Ly, a_fluid):
-                for x in np.arange(0.5*a_fluid, Lx, a_fluid):
-                    f.write(f"{atom_id} 1 {x:.3f} {y:.3f} {z:.3f}\n")
-                    atom_id += 1
-        tek_pocet = atom_id-1
-        
-        
-        # Generování STĚNY (dole): z in [0, wall_thickness] 4 vrstvy => krok a_z, offset 0.5*a_z
-        z_bottom_start = 0.5 * a_z
-        z_bottom_end   = z_bottom_start + Nz_wall * a_z
-        for z in np.arange(z_bottom_start, z_bottom_end, a_z):
-            for y in np.arange(0.5*a_xy, Ly, a_xy):
-                for x in np.arange(0.5*a_xy, Lx, a_xy):
-                    f.write(f"{atom_id} 2 {x:.3f} {y:.3f} {z:.3f}\n")
-                    atom_id += 1
-        stena_1_pocet = atom_id-1 - tek_pocet
-        
-        
-        # Generování STĚNY (nahoře): z in [Lz - wall_thickness, Lz]
-        z_top_start = (Lz - wall_thickness) - 0.5 * a_z
-        z_top_end   = z_top_start + Nz_wall * a_z
-        # for z in np.arange(z_top_start, z_top_end, a_z):
-        for k in range(Nz_wall):
-            z = z_top_start + (k + 0.5) * a_z
-            for y in np.arange(0.5*a_xy, Ly, a_xy):
-                for x in np.arange(0.5*a_xy, Lx, a_xy):
-                    f.write(f"{atom_id} 2 {x:.3f} {y:.3f} {z:.3f}\n")
-                    atom_id += 1
-        stena_2_pocet = atom_id-1 - tek_pocet - stena_1_pocet
+    # Generování TEKUTINY. Z-rozsah: wall_thickness až (wall_thickness + fluid_gap), s offsetem 0.5*a_fluid
+    z_fluid_start = Lz/2 - fluid_gap/2 + 0.5 * a_fluid
+    z_fluid_end   = z_fluid_start + Nz_fluid * a_fluid
+    fluid_x = np.arange(0.5*a_fluid, Lx, a_fluid)
+    fluid_y = np.arange(0.5*a_fluid, Ly, a_fluid)
+    fluid_z = np.arange(z_fluid_start, z_fluid_end, a_fluid)
+
+    # Generování STĚNY (dole): z in [0, wall_thickness] 4 vrstvy => krok a_z, offset 0.5*a_z
+    wall_x = np.arange(0.5*a_xy, Lx, a_xy)
+    wall_y = np.arange(0.5*a_xy, Ly, a_xy)
+    z_bottom = (np.arange(Nz_wall) + 0.5) * a_z
+
+    # Generování STĚNY (nahoře): z in [Lz - wall_thickness, Lz]
+    z_top_start = (Lz - wall_thickness) - 0.5 * a_z
+    z_top = z_top_start + (np.arange(Nz_wall) + 0.5) * a_z
+
+    # Přesné počty známe z os mřížky ještě před zápisem => hlavička se už nepřepisuje
+    tek_pocet = len(fluid_x) * len(fluid_y) * len(fluid_z)
+    stena_1_pocet = len(wall_x) * len(wall_y) * len(z_bottom)
+    stena_2_pocet = len(wall_x) * len(wall_y) * len(z_top)
+    N_fluid = tek_pocet
+    N_wall = stena_1_pocet + stena_2_pocet
+
+    # Stejná geometrie => stejný soubor: nejdřív zkusíme cache (config "data_cache: false" ji vypne)
+    use_cache = config.get("data_cache", True)
+    key = data_cache.cache_key(config) if use_cache else None
+    if use_cache and data_cache.fetch(key, data_file):
+        print(f"Data soubor převzat z cache ({key})")
+    else:
+        # soubor může být hardlink do cache – smazat, ne přepisovat na místě
+        if os.path.exists(data_file):
+            os.remove(data_file)
+        # ID jdou souvisle: tekutina, spodní stěna, horní stěna
+        write_data_file(data_file, (Lx, Ly, Lz), {1: 1.0, 2: 1.0}, [
+            (1, tek_pocet, lattice_chunks(fluid_x, fluid_y, fluid_z)),
+            (2, stena_1_pocet, lattice_chunks(wall_x, wall_y, z_bottom)),
+            (2, stena_2_pocet, lattice_chunks(wall_x, wall_y, z_top)),
+        ])
+        if use_cache:
+            data_cache.store(key, data_file, config)
     print(f"N-tek: {tek_pocet}, stena_1: {stena_1_pocet}, stena_2: {stena_2_pocet}, N_wall: {N_wall}")
-        
-
 
-    # TODO 
-    N_fluid = Nx_fluid * Ny_fluid * Nz_fluid_new
+    # Skutečné hustoty podle opravdu vygenerovaných počtů
     V_fluid = fluid_gap * Lx * Ly
     rho_fluid_actual = N_fluid / V_fluid
-    
-    with open(data_file, "r+") as f:
-        lines = f.readlines()
-        lines[2] = f"{N_fluid + N_wall} atoms\n"
-        f.seek(0)
-        f.writelines(lines)
-        
+    rho_wall_actual = N_wall / V_wall
+
     # Vrátíme dictionary s užitečnými daty
     return {
         "n_wall": N_wall,
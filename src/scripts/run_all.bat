@@ -39,7 +39,12 @@ echo Vytvorena slozka: %SIM_FOLDER%
 
 REM ======= Krok 2: Kopirovani  ========
 echo [2/3] Kopiruju slozku na kluster...
-pscp -i "%CLUSTER_KEY_PATH%" -r "%SIM_FOLDER%" %CLUSTER_USERNAME%@%CLUSTER_HOST%:"%CLUSTER_SIMULATION_DIR%"
+REM jeden komprimovany tar stream (zstd/gzip), pri chybe klasicke pscp -r
+python "%ROOT%\src\simapp\cluster_service.py" upload "%SIM_FOLDER%"
+if errorlevel 1 (
+  echo [WARN] Tar stream selhal, kopiruju pres pscp...
+  pscp -i "%CLUSTER_KEY_PATH%" -r "%SIM_FOLDER%" %CLUSTER_USERNAME%@%CLUSTER_HOST%:"%CLUSTER_SIMULATION_DIR%"
+)
 
 
 REM ======= Krok 3: Spousteni na klusteru ========
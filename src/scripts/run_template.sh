@@ -2,9 +2,9 @@
 
 #PBS -q {queue}
 
-#PBS -l select=1:ncpus={ppn}:mpiprocs={ppn}:mem=8GB
+#PBS -l select=1:host={node}:ncpus={ppn}:mpiprocs={ppn}:mem={mem_gb}GB
 #PBS -l place=scatter
-#PBS -l walltime=24:00:00
+#PBS -l walltime={walltime}
 #PBS -N {simulation_name}
 
 #PBS -V
@@ -13,3 +13,10 @@
 cd "$PBS_O_WORKDIR"
 
 mpirun -np {ppn} {lammps_exe} -in box.in
+status=$?
+
+# konec běhu do progress.dat (end / failed) – "step phase target steps/s eta_s"
+step=$(tail -n 1 progress.dat 2>/dev/null | awk '{{print $1}}')
+if [ $status -eq 0 ]; then phase=end; else phase=failed; fi
+echo "${{step:-0}} $phase - 0 0" >> progress.dat
+exit $status
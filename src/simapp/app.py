@@ -1,9 +1,8 @@
 from PyQt5 import QtWidgets, uic
 from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import QTimer
 from dotenv import load_dotenv
 import yaml
-import requests
-from bs4 import BeautifulSoup
 import subprocess
 import os
 import shutil
@@ -16,8 +15,20 @@ from pathlib import Path
 from pages_ui.unfinished_simulations_dialog import UnfinishedSimulationsDialog
 from pages_ui.node_selection_dialog import NodeSelectionDialog
 
-from pbs_parser import (parse_node_load_from_nodes,parse_node_load_from_jobs)
+from pbs_parser import format_node_load
+from pbs_client import PbsWebClient
+from pbs_jobs import JobMonitor, default_poll_interval, format_jobs
+from load_history import LoadHistory, default_interval
+from scheduler import JobSpec, chain_plan, load_cluster_layout, node_states, place_batch, recommend, template_nrun
 import cluster_service
+import ssh_pool
+from remote_index import RemoteIndex
+from cluster_worker import ClusterRunner
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # .../src – kvůli core.*
+from core.density_profile import analyze_folder, format_analysis
+
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -35,9 +46,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self.loc_sim_path = os.getenv("LOCAL_NOTEBOOK_PATH")  
         self.lmp_path = os.getenv("LAMMPS_PATH") 
         self.cluster_sim_path = os.getenv("CLUSTER_SIMULATION_DIR")
+        # lokální index stavu simulací na clusteru (SQLite, TTL z .env)
+        self.remote_index = RemoteIndex(f"{self.user_name}@{self.host}:{self.cluster_sim_path}")
         
                       
         uic.loadUi(self.ui_path, self)
+
+        # всё, что ходит на кластер/pbsweb, выполняется в фоне – окно не зависает
+        self.runner = ClusterRunner(parent=self)
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setMaximumWidth(250)
+        self.progressBar.hide()
+        self.statusbar.addPermanentWidget(self.progressBar)
+        # zrušení běžícího kopírování složky (cancel event -> přenos skončí mezi bloky)
+        self.cancelCopyButton = QtWidgets.QPushButton("Zrušit kopírování")
+        self.cancelCopyButton.hide()
+        self.cancelCopyButton.clicked.connect(self.cancel_copy)
+        self.statusbar.addPermanentWidget(self.cancelCopyButton)
+        self._copy_future = None
+        self.runner.busy_changed.connect(self.on_busy_changed)
+        self._load_future = None
+        # sdílený HTTP klient pro pbsweb (keep-alive, ETag, krátká TTL cache, timeouty)
+        self.pbs_client = PbsWebClient()
         
         with open(self.styles_path, "r") as file:
             self.setStyleSheet(file.read())  
@@ -46,15 +76,28 @@ class MainWindow(QtWidgets.QMainWindow):
             self.config = yaml.safe_load(f)
 
 
-        self.node_to_queue = {
-            "node01": "enp5", "node02": "enp5", "node03": "enp5",
-            "node04": "enp5", "node05": "enp5", "node06": "enp5",
-            "node36": "enp5", "node37": "enp5",
-            "node26": "enp3", "node27": "enp3", "node28": "enp3",
-            "node29": "enp3", "node30": "enp3", "node31": "enp3",
-            "node32": "enp3", "node33": "enp3", "node34": "enp3"
-        }
-        self.queue_to_max_walltime = {"enp5": "20 dnů", "enp3": "3 dny"}
+        # nody, fronty, limity walltime a kapacity – src/config/cluster.yaml
+        self.cluster = load_cluster_layout()
+        self.node_to_queue = self.cluster.node_to_queue
+
+        # historie zatížení nodů: vzorek z pbsweb každých LOAD_SAMPLE_INTERVAL s (v pozadí)
+        self.load_history = LoadHistory()
+        self.node_cpus = self.cluster.node_cpus
+        self._sample_future = None
+        self.sampleTimer = QTimer(self)
+        self.sampleTimer.timeout.connect(self.sample_node_load)
+        self.sampleTimer.start(int(default_interval() * 1000))
+        QTimer.singleShot(0, self.sample_node_load)
+
+        # stav našich jobů: jeden qstat -f každých JOB_POLL_INTERVAL s, do GUI jdou jen změny
+        self.job_monitor = JobMonitor()
+        self._jobs_future = None
+        self.jobsLabel = QtWidgets.QLabel()
+        self.statusbar.addPermanentWidget(self.jobsLabel)
+        self.jobTimer = QTimer(self)
+        self.jobTimer.timeout.connect(self.poll_jobs)
+        self.jobTimer.start(int(default_poll_interval() * 1000))
+        QTimer.singleShot(0, self.poll_jobs)
 
         self.nodes.addItems(self.node_to_queue.keys())
         self.nodes.currentTextChanged.connect(self.update_info)
@@ -87,6 +130,9 @@ class MainWindow(QtWidgets.QMainWindow):
         # on start recompute 
         self.on_potential_or_sigma_changed()
         self.on_geom_param_changed()
+
+        # poslední známý stav z indexu – hned, bez dotazu na cluster
+        self.simComboBox.addItems(self.remote_index.folders())
         
         
     def run_simulation_locally(self):
@@ -182,6 +228,7 @@ class MainWindow(QtWidgets.QMainWindow):
             
             try:
                 subprocess.run([self.runall_path], check=True)
+                self.remote_index.invalidate()
             except subprocess.CalledProcessError as e:
                 QtWidgets.QMessageBox.critical(self, "Chyba", f"Běh .bat selhal:\n{e}")
 
@@ -206,77 +253,167 @@ class MainWindow(QtWidgets.QMainWindow):
         self.config["nodes"] = node
         self.config["queue"] = queue
 
-        usage = self.get_node_load(node)
-        self.loadLabel.setText(usage)
+        # predchozi dotaz na jinou nodu uz nas nezajima
+        if self._load_future is not None:
+            self._load_future.cancel()
+        self.loadLabel.setText("Načítám…")
+        self._load_future = self.runner.submit(self.get_node_load, node,
+                on_done=lambda usage, node=node: self.on_node_load(node, usage))
 
-        max_time = self.queue_to_max_walltime.get(queue)
+        max_time = self.cluster.walltime_text(queue)
         if max_time:
             self.maxTimeLabel.setText(f"max: {max_time}")
         else:
             self.maxTimeLabel.setText("neznámý limit")
         
-    def get_node_load(self, node) -> str:
-        """Zkusí zjistit zatížení nejdřív ze staré tabulky (nody v 1. sloupci), pokud ji nenajde, přepne se na nový formát tabulky jobs."""
-        try:
-            nodes_url = "https://pbsweb.enputron.ujep.cz/statuspbs/nodes"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                            "AppleWebKit/537.36 (KHTML, like Gecko) "
-                            "Chrome/122.0.0.0 Safari/537.36"
-            }
-            r_nodes = requests.get(nodes_url, headers=headers)
-            
-            text = parse_node_load_from_nodes(r_nodes.text, node)
-            if text is not None:
-                return text
-            
-            jobs_url = "https://pbsweb.enputron.ujep.cz/statuspbs/jobs"
-            r_jobs = requests.get(jobs_url, headers=headers)
+    def on_node_load(self, node, usage):
+        if node == self.nodes.currentText():
+            self.loadLabel.setText(usage)
+
+    def on_busy_changed(self, running):
+        """Indikátor v status baru: neurčitý, dokud nepřijde konkrétní progress v bajtech."""
+        if running:
+            if not self.progressBar.isVisible():
+                self.progressBar.setRange(0, 0)
+                self.progressBar.show()
+            self.statusbar.showMessage(f"Běžící operace: {running}")
+        else:
+            self.progressBar.hide()
+            self.statusbar.clearMessage()
+
+    def on_bytes_progress(self, done, total):
+        if total:
+            self.progressBar.setRange(0, 1000)
+            self.progressBar.setValue(int(1000 * done / total))
+            self.progressBar.setFormat(f"{done / 1024 ** 2:.1f} / {total / 1024 ** 2:.1f} MB")
+        else:
+            self.progressBar.setRange(0, 0)
+
+    def on_task_error(self, text):
+        QtWidgets.QMessageBox.critical(self, "Chyba", text)
 
-            text = parse_node_load_from_jobs(r_jobs.text, node)
-            if text is not None:
-                return text            
+    def get_node_loads(self, nodes) -> dict:
+        """{node: text zatížení} pro všechny nody z jednoho snapshotu."""
+        try:
+            source, snapshot = self.pbs_client.load_snapshot()
+        except Exception as e:
+            return {node: f"Chyba načítání: {e}" for node in nodes}
+        return self.format_node_loads(nodes, source, snapshot)
+
+    @staticmethod
+    def format_node_loads(nodes, source, snapshot) -> dict:
+        if snapshot is None:
+            return {node: "Informace nenalezena" for node in nodes}
+        return {node: format_node_load(snapshot.get(node), source) for node in nodes}
+
+    def sample_node_load(self):
+        """Tick sampleru – pokud předchozí vzorek ještě běží (pomalý pbsweb), tento se vynechá."""
+        if self._sample_future is not None and not self._sample_future.done:
+            return
+        self._sample_future = self.runner.submit(self.record_load_sample,
+                                                 on_error=lambda text: print(f"[load sampler] {text}"))
 
-            return "Informace nenalezena"
+    def record_load_sample(self) -> int:
+        source, snapshot = self.pbs_client.load_snapshot()
+        if snapshot is None:
+            return 0
+        return self.load_history.record(snapshot, source, nodes=self.node_to_queue.keys())
 
+    def get_node_overview(self, nodes, job: JobSpec | None = None):
+        """
+        (node_load, node_history, recommendation) pro dialog výběru nody:
+        aktuální zatížení, posledních 24 h a doporučení plánovače pro job (z jednoho snapshotu).
+        """
+        try:
+            source, snapshot = self.pbs_client.load_snapshot()
+            node_load = self.format_node_loads(nodes, source, snapshot)
         except Exception as e:
-            return f"Chyba načítání: {e}"
+            source, snapshot = None, None
+            node_load = {node: f"Chyba načítání: {e}" for node in nodes}
+        node_history = self.load_history.summary(nodes, capacity=self.node_cpus)
+
+        recommendation = None
+        if job is not None:
+            states = [s for s in node_states(self.cluster, source, snapshot, node_history) if s.node in nodes]
+            recommendation = recommend(job, self.cluster, states)
+        return node_load, node_history, recommendation
+
+    def get_node_load(self, node) -> str:
+        """Zatížení jedné nody (text pro loadLabel)."""
+        return self.get_node_loads([node])[node]
+
+    def poll_jobs(self, show=False):
+        """Tick job monitoru – pokud předchozí qstat ještě běží, tento se vynechá (kromě tlačítka)."""
+        if self._jobs_future is not None and not self._jobs_future.done and not show:
+            return
+        self._jobs_future = self.runner.submit(
+            cluster_service.query_jobs, key_path=self.key_path, user_name=self.user_name, host=self.host,
+            cluster_sim_path=self.cluster_sim_path, on_done=lambda result: self.on_jobs_polled(result, show),
+            on_error=self.on_task_error if show else (lambda text: print(f"[job monitor] {text}")))
 
     def show_job_status(self):
-        status, error = cluster_service.get_job_status( key_path=self.key_path,
-                                    user_name=self.user_name, host=self.host)
+        self.poll_jobs(show=True)
 
+    def on_jobs_polled(self, result, show=False):
+        records, error = result
         if error is not None:
-            QtWidgets.QMessageBox.critical(self, "Chyba",f"Chyba při načítání qstat:\n{error}")
+            if show:
+                QtWidgets.QMessageBox.critical(self, "Chyba", f"Chyba při načítání qstat:\n{error}")
             return
-        
-        if not status:
+
+        changes = self.job_monitor.update(records)
+        for change in changes:
+            # hotový / spadlý job mění stav složky – index se při dalším čtení obnoví z clusteru
+            if change.kind in ("finished", "failed") and change.job.folder:
+                self.remote_index.invalidate(change.job.folder)
+
+        active = self.job_monitor.active_jobs()
+        running = sum(job.status == "running" for job in active)
+        text = f"Joby: {running} běží, {len(active) - running} čeká"
+        if changes:
+            last = changes[-1]
+            text += f" | {last.job.folder or last.job.name}: {last.kind}"
+            self.jobsLabel.setToolTip("\n".join(f"{c.job.job_id} {c.job.folder or c.job.name}: {c.kind}"
+                                                for c in changes))
+        self.jobsLabel.setText(text)
+
+        if not show:
+            return
+        if not active:
             QtWidgets.QMessageBox.information(self, "Stav úloh", "Žádné úlohy neběží.")
-            return        
-                
+            return
+
+        # průběh z progress.dat (heartbeat z LAMMPS) – jedno další volání, jen pro tabulku
+        self.runner.submit(cluster_service.read_progress, key_path=self.key_path, user_name=self.user_name,
+                           host=self.host, cluster_sim_path=self.cluster_sim_path,
+                           on_done=lambda result: self.show_jobs_table(active, result[0]),
+                           on_error=self.on_task_error)
+
+    def show_jobs_table(self, jobs, progress=None):
         box = QtWidgets.QMessageBox(self)
         box.setWindowTitle("Stav úloh")
-        box.setInformativeText(status)
+        box.setInformativeText(format_jobs(jobs, progress))
         box.setStandardButtons(QtWidgets.QMessageBox.Ok)
-        box.setStyleSheet("QLabel{min-width: 900px;}")
+        box.setStyleSheet("QLabel{min-width: 900px; font-family: monospace;}")
         box.exec_()
 
-
-
     def update_simComboBox(self):
-        """Načte seznam složek se simulacemi z clusteru a zobrazí je v comboboxu."""
-        folders, error = cluster_service.list_remote_simulations( key_path=self.key_path, 
-                user_name=self.user_name, host=self.host, cluster_sim_path=self.cluster_sim_path)
+        """Načte seznam složek se simulacemi z clusteru (tlačítko = vždy čerstvý sken) a zobrazí je v comboboxu."""
+        self.runner.submit(cluster_service.get_remote_state, key_path=self.key_path, user_name=self.user_name,
+                host=self.host, cluster_sim_path=self.cluster_sim_path, index=self.remote_index, force=True,
+                on_done=self.on_remote_state, on_error=self.on_task_error)
 
+    def on_remote_state(self, result):
+        rows, error = result
         if error is not None:
             QtWidgets.QMessageBox.critical(self, "Chyba při načítání", error)
             return
+        folders = [row["folder"] for row in rows]
 
         self.simComboBox.clear()
         if folders:
             self.simComboBox.addItems(folders)
 
-# TODO: добавить реализацию копирования на комп и запуска анализа плотности 
     def copy_and_run_local_analysis(self):
 
         """Copy fold from cluster to PC"""
@@ -285,20 +422,34 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning( self, "Upozornění", "Nejprve vyber simulaci v seznamu.")
             return
         
-        notebook_source = os.getenv("NOTEBOOK_SOURCE") 
-
-        error = cluster_service.copy_simulation_folder( key_path=self.key_path, user_name=self.user_name,
-                host=self.host, cluster_sim_path=self.cluster_sim_path, sim_name=sim_name, local_results_dir=Path(self.results_dir))
+        self._copy_future = self.runner.submit(cluster_service.copy_simulation_folder, key_path=self.key_path, user_name=self.user_name,
+                host=self.host, cluster_sim_path=self.cluster_sim_path, sim_name=sim_name, local_results_dir=Path(self.results_dir),
+                on_done=lambda error, sim_name=sim_name: self.on_folder_copied(sim_name, error),
+                on_error=self.on_task_error, on_progress=self.on_bytes_progress)
+        self._copy_future.ended.connect(self.cancelCopyButton.hide)
+        self.cancelCopyButton.show()
+
+    def cancel_copy(self):
+        if self._copy_future is not None and not self._copy_future.done:
+            self._copy_future.cancel()
+            self.statusbar.showMessage("Kopírování zrušeno", 5000)
+
+    def on_folder_copied(self, sim_name, error):
         if error is not None:
             QtWidgets.QMessageBox.critical(self, "Chyba při kopírování", error)
             return
 
-        QtWidgets.QMessageBox.information( self, "Hotovo", f"Složka simulace '{sim_name}' byla zkopírována.")
+        # lokální analýza densF (core.density_profile) v pozadí – místo externího notebooku
+        self.runner.submit(analyze_folder, Path(self.results_dir) / sim_name,
+                           on_done=lambda analysis: self.on_analysis_done(sim_name, analysis),
+                           on_error=self.on_task_error)
 
-        # # Копирование и запуск notebook ??? po zmenam kodu nevim
-        # notebook_dest = os.path.join(str(self.results_dir), "hustotni_profil.ipynb")
-        # shutil.copy(notebook_source, notebook_dest)
-        # os.startfile(notebook_dest)
+    def on_analysis_done(self, sim_name, analysis):
+        if analysis is None:
+            QtWidgets.QMessageBox.information(self, "Hotovo", f"Složka simulace '{sim_name}' byla zkopírována "
+                                              "(densF.dat v ní zatím není).")
+            return
+        QtWidgets.QMessageBox.information(self, f"Analýza – {sim_name}", format_analysis(analysis))
 
     def get_decimals_map(self):
         decimals_map = {}
@@ -310,26 +461,60 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
     def check_and_copy_dens_with_restart(self):
-        incomplete, error, isfinished = cluster_service.completeness_check( key_path=self.key_path, user_name=self.user_name,
-                            host=self.host, cluster_sim_path=self.cluster_sim_path)
+        self.runner.submit(cluster_service.completeness_check, key_path=self.key_path, user_name=self.user_name,
+                           host=self.host, cluster_sim_path=self.cluster_sim_path, index=self.remote_index,
+                           on_done=self.on_check_for_copy, on_error=self.on_task_error)
+
+    def on_check_for_copy(self, result):
+        incomplete, error, isfinished, converged_early = result
 
         if error is not None:
             QtWidgets.QMessageBox.critical(self, "Chyba", error)
             return
 
+        if converged_early:
+            self.offer_early_stop(converged_early)
+
         if isfinished is None:
             QtWidgets.QMessageBox.information(self, "Chyba",
                     "Žádná simulace nedoběhla do požádovaného počtu kroků")
         else:
-            error2 = cluster_service.copy_densF_for_finish_sim( key_path=self.key_path, user_name=self.user_name,
-                            host=self.host, cluster_sim_path=self.cluster_sim_path, isfinished=isfinished, local_results_dir=Path(self.results_dir))
-            if error2 is not None:
-                QtWidgets.QMessageBox.critical(self, "Chyba", error)
+            self.runner.submit(cluster_service.copy_densF_for_finish_sim, key_path=self.key_path, user_name=self.user_name,
+                            host=self.host, cluster_sim_path=self.cluster_sim_path, isfinished=isfinished,
+                            local_results_dir=Path(self.results_dir),
+                            on_done=self.on_densF_copied, on_error=self.on_task_error)
+
+    def on_densF_copied(self, error2):
+        if error2 is not None:
+            QtWidgets.QMessageBox.critical(self, "Chyba", error2)
+
+    def offer_early_stop(self, folders):
+        """Profil zkonvergoval dřív než nrun – nabídnout ukončení (soubor STOP, viz cluster_service.request_early_stop)."""
+        answer = QtWidgets.QMessageBox.question(
+            self, "Konvergence",
+            "Profil hustoty už zkonvergoval, i když simulace nedoběhly do nrun:\n\n"
+            + "\n".join(folders) + "\n\nUkončit je předčasně?")
+        if answer != QtWidgets.QMessageBox.Yes:
+            return
+        self.runner.submit(cluster_service.request_early_stop, key_path=self.key_path, user_name=self.user_name,
+                           host=self.host, cluster_sim_path=self.cluster_sim_path, folders=folders,
+                           on_done=lambda error: self.on_early_stop_requested(folders, error),
+                           on_error=self.on_task_error)
+
+    def on_early_stop_requested(self, folders, error):
+        for folder in folders:
+            self.remote_index.invalidate(folder)
+        if error is not None:
+            QtWidgets.QMessageBox.critical(self, "Chyba", f"Chyba při ukončování simulací:\n{error}")
 
 
     def check_restart_and_restart(self):
-        incomplete, error, isfinished = cluster_service.completeness_check( key_path=self.key_path, user_name=self.user_name,
-                            host=self.host, cluster_sim_path=self.cluster_sim_path)
+        self.runner.submit(cluster_service.completeness_check, key_path=self.key_path, user_name=self.user_name,
+                           host=self.host, cluster_sim_path=self.cluster_sim_path, index=self.remote_index,
+                           on_done=self.on_check_for_restart, on_error=self.on_task_error)
+
+    def on_check_for_restart(self, result):
+        incomplete, error, isfinished, _converged_early = result
 
         if error is not None:
             QtWidgets.QMessageBox.critical(self, "Chyba", error)
@@ -345,11 +530,24 @@ class MainWindow(QtWidgets.QMainWindow):
         dlg.set_data(incomplete)
         result = dlg.exec_()
         
-        if result == QtWidgets.QDialog.Accepted and dlg.selected_folder:
+        if result != QtWidgets.QDialog.Accepted or not dlg.selected_folder:
+            return
+        if len(dlg.selected_rows) > 1:
+            self.start_batch_restart(dlg.selected_rows)
+        else:
             self.start_restart_for_simulation( dlg.selected_folder, dlg.selected_last_step, 
                                                dlg.selected_expected_nrun)        
             
             
+    @staticmethod
+    def restart_job(sim_name, last_step, expected_nrun) -> JobSpec:
+        """Job pro plánovač: zbývající kroky; bez údajů ze skenu celý nrun ze šablony."""
+        if last_step is not None and expected_nrun is not None:
+            steps = max(int(expected_nrun) - int(last_step), 0)
+        else:
+            steps = template_nrun() or 0
+        return JobSpec(sim_name, steps)
+
     def start_restart_for_simulation(self, sim_name: str, last_step: int | None, expected_nrun: int | None):
         """
         Открываем окно выбора нода + ресурсов.
@@ -367,19 +565,24 @@ class MainWindow(QtWidgets.QMainWindow):
         node_max_time = {}
         for node in nodes:
             queue = self.node_to_queue[node]
-            node_max_time[node] = self.queue_to_max_walltime.get(queue, "—")
+            node_max_time[node] = self.cluster.walltime_text(queue) or "—"
 
-        # словарь {node: load_text} - просто обходим все ноды и спрашиваем HTML-парсер
-        node_load = {}
-        for node in nodes:
-            node_load[node] = self.get_node_load(node)
+        job = self.restart_job(sim_name, last_step, expected_nrun)
+
+        # словарь {node: load_text} - одна загрузка pbsweb na všechny nody + historie + doporučení (в фоне)
+        self.runner.submit(self.get_node_overview, nodes, job, on_error=self.on_task_error,
+                           on_done=lambda overview: self.choose_node_and_restart(
+                               sim_name, last_step, expected_nrun, nodes, node_max_time, *overview))
 
+    def choose_node_and_restart(self, sim_name, last_step, expected_nrun, nodes, node_max_time, node_load,
+                                node_history=None, recommendation=None):
         dlg = NodeSelectionDialog(self)
-        dlg.set_data(nodes, node_max_time, node_load)
 
         # дефолтные значения для спинбоксов из конфига, просто напоминание что так можно
         dlg.spinPpn.setValue(int(self.config.get("ppn", 8)))
         dlg.spinMemGb.setValue(int(self.config.get("mem_gb", 8)))
+        # doporučení plánovače přepíše výchozí výběr (řádek + ppn + paměť)
+        dlg.set_data(nodes, node_max_time, node_load, node_history, self.node_cpus, recommendation)
 
         if dlg.exec_() != QtWidgets.QDialog.Accepted:
             return
@@ -398,11 +601,113 @@ class MainWindow(QtWidgets.QMainWindow):
         #    - expected_nrun      (из Диалога №1)
         #    - node, ppn, mem_gb  (из Диалога №2)
 
-        # пока что только передадим их в cluster_service, реализацию скрипта допишем позже
-        error = cluster_service.restart_simulation_on_cluster(key_path=self.key_path, user_name=self.user_name,
+        # walltime z doporučení jen pokud uživatel nechal doporučenou nodu i ppn, jinak zůstane z run.sh
+        walltime = None
+        if recommendation is not None and (node, ppn) == (recommendation.node, recommendation.ppn):
+            walltime = recommendation.walltime
+
+            # běh přes limit fronty: nabídnout řetěz segmentů (afterok), který doběhne bez ručních restartů
+            segments, segment_walltime = chain_plan(recommendation, self.cluster)
+            if segments > 1:
+                answer = QtWidgets.QMessageBox.question(
+                    self, "Řetěz segmentů",
+                    f"Odhad běhu {recommendation.est_hours:.0f} h je delší než limit fronty {recommendation.queue}.\n"
+                    f"Odeslat jako řetěz {segments} navazujících jobů (walltime {segment_walltime})?")
+                if answer == QtWidgets.QMessageBox.Yes:
+                    spec = cluster_service.RestartSpec(sim_name, node, recommendation.queue, ppn, mem_gb,
+                                                       expected_nrun=expected_nrun, walltime=segment_walltime)
+                    self.runner.submit(cluster_service.submit_restart_chain, key_path=self.key_path,
+                                       user_name=self.user_name, host=self.host,
+                                       cluster_sim_path=self.cluster_sim_path, spec=spec, segments=segments,
+                                       on_done=lambda result: self.on_chain_submitted(sim_name, result),
+                                       on_error=self.on_task_error)
+                    return
+
+        # navázání z posledního run.restart.<step> (box_cont_<step>.in + run_restart.sh na clusteru)
+        self.runner.submit(cluster_service.restart_simulation_on_cluster, key_path=self.key_path, user_name=self.user_name,
                             host=self.host, cluster_sim_path=self.cluster_sim_path, sim_name=sim_name,node=node, queue=self.node_to_queue.get(node, ""),
-            ppn=ppn, mem_gb=mem_gb, last_step=last_step, expected_nrun=expected_nrun )
-        
+            ppn=ppn, mem_gb=mem_gb, last_step=last_step, expected_nrun=expected_nrun, walltime=walltime,
+            on_done=lambda error: self.on_restart_submitted(sim_name, node, error), on_error=self.on_task_error)
+
+    def start_batch_restart(self, rows):
+        """
+        Hromadný restart vybraných simulací: plánovač rozmístí joby po nodách (place_batch),
+        uživatel rozmístění potvrdí a vše se odešle jedním sezením na cluster.
+        """
+        jobs = [self.restart_job(*row) for row in rows]
+        self.runner.submit(self.plan_batch, jobs, on_error=self.on_task_error,
+                           on_done=lambda placement: self.confirm_batch_restart(rows, placement))
+
+    def plan_batch(self, jobs):
+        """{sim: Recommendation | None} z jednoho snapshotu pbsweb a historie zatížení."""
+        nodes = list(self.node_to_queue)
+        try:
+            source, snapshot = self.pbs_client.load_snapshot()
+        except Exception:
+            source, snapshot = None, None
+        history = self.load_history.summary(nodes, capacity=self.node_cpus)
+        return place_batch(jobs, self.cluster, node_states(self.cluster, source, snapshot, history))
+
+    def confirm_batch_restart(self, rows, placement):
+        specs, lines = [], []
+        for sim_name, _, expected_nrun in rows:
+            rec = placement.get(sim_name)
+            if rec is None:
+                lines.append(f"{sim_name}: nelze umístit (žádná vhodná noda / ppn)")
+                continue
+            specs.append(cluster_service.RestartSpec(sim_name, rec.node, rec.queue, rec.ppn, rec.mem_gb,
+                                                     expected_nrun=expected_nrun, walltime=rec.walltime))
+            lines.append(f"{sim_name}: {rec.node}, ppn {rec.ppn}, {rec.mem_gb} GB, walltime {rec.walltime}"
+                         f" – {rec.reason}")
+        if not specs:
+            QtWidgets.QMessageBox.critical(self, "Chyba", "\n".join(lines))
+            return
+
+        # stejné zdroje pro všechny -> jeden qsub jako PBS job array (walltime nejdelšího jobu)
+        array = len(specs) > 1 and len({(s.node, s.queue, s.ppn, s.mem_gb) for s in specs}) == 1
+        if array:
+            walltime = max((s.walltime for s in specs), key=lambda w: int(w.split(":")[0]))
+            for spec in specs:
+                spec.walltime = walltime
+            lines.append(f"\nOdešle se jako jeden job array ({len(specs)} subjobů).")
+
+        answer = QtWidgets.QMessageBox.question(
+            self, "Hromadný restart", "Navržené rozmístění:\n\n" + "\n".join(lines) + "\n\nOdeslat?")
+        if answer != QtWidgets.QMessageBox.Yes:
+            return
+
+        self.runner.submit(cluster_service.batch_restart_on_cluster, key_path=self.key_path,
+                           user_name=self.user_name, host=self.host, cluster_sim_path=self.cluster_sim_path,
+                           specs=specs, array=array, on_done=self.on_batch_restart_submitted,
+                           on_error=self.on_task_error)
+
+    def on_batch_restart_submitted(self, results):
+        lines, failed = [], False
+        for sim_name, (job_id, error) in results.items():
+            self.remote_index.invalidate(sim_name)
+            if job_id:
+                self.job_monitor.register(job_id, sim_name)
+            if error is not None:
+                failed = True
+                lines.append(f"{sim_name}: CHYBA – {error}")
+            else:
+                lines.append(f"{sim_name}: {job_id}")
+        box = QtWidgets.QMessageBox.warning if failed else QtWidgets.QMessageBox.information
+        box(self, "Hromadný restart", "\n".join(lines))
+
+    def on_chain_submitted(self, sim_name, result):
+        job_ids, error = result
+        self.remote_index.invalidate(sim_name)
+        if error is not None:
+            QtWidgets.QMessageBox.critical(self, "Chyba", f"Chyba při odesílání řetězu:\n{error}")
+        else:
+            for job_id in job_ids:
+                self.job_monitor.register(job_id, sim_name)
+            QtWidgets.QMessageBox.information(self, "Řetěz odeslán",
+                                              f"Simulace '{sim_name}': {len(job_ids)} segmentů\n" + "\n".join(job_ids))
+
+    def on_restart_submitted(self, sim_name, node, error):
+        self.remote_index.invalidate(sim_name)
         if error is not None:
             QtWidgets.QMessageBox.critical( self, "Chyba", f"Chyba při spouštění restartu:\n{error}" )
         else:
@@ -476,6 +781,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
 app = QtWidgets.QApplication([])
+app.aboutToQuit.connect(ssh_pool.close_all)
 window = MainWindow()
+app.aboutToQuit.connect(window.pbs_client.close)
+app.aboutToQuit.connect(window.load_history.close)
 window.show()
 app.exec_()
@@ -1,21 +1,75 @@
 from __future__ import annotations
-from typing import List, Tuple, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Optional
+import base64
+import fnmatch
+import hashlib
+import os
+import re
+import shlex
 import subprocess
+import sys
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # .../src – kvůli core.*
+import ssh_pool
+from pbs_jobs import JobRecord, parse_qstat
+from remote_index import RemoteIndex
+from core.box_to_restart import (add_walltime_guard, make_array_script, make_restart_in_from_box,
+                                 make_restart_run_script)
+from core.density_profile import SEGMENT_PATTERN, merge_folder, segment_rename_command
+from core import convergence
+
+
+def _run_plink(key_path: str, user_name: str, host: str, command: str,
+               input: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Внутренний helper для plink (через пул SSH-соединений, если он доступен); input – текст на stdin."""
+    pool = ssh_pool.get_pool(key_path, user_name, host)
+    if pool is not None:
+        try:
+            return pool.run(command, input=input)
+        except Exception as e:
+            return subprocess.CompletedProcess(command, 255, "", f"SSH chyba: {e}")
 
-def _run_plink(key_path: str, user_name: str, host: str, command: str) -> subprocess.CompletedProcess:
-    """Внутренний helper для plink."""
     return subprocess.run(
         ["plink", "-batch", "-i", key_path, f"{user_name}@{host}", command,],
+        input=input,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
     )
 
 
+def _split_remote(path: str) -> Tuple[Optional[str], Optional[str], str]:
+    """'user@host:/path' -> (user, host, '/path'); локальный путь -> (None, None, path)."""
+    if "@" in path and ":" in path.split("@", 1)[1]:
+        user, rest = path.split("@", 1)
+        host, remote = rest.split(":", 1)
+        return user, host, remote
+    return None, None, path
+
+
 def _run_pscp( key_path: str, source: str, dest: str, recursive: bool = False) -> subprocess.CompletedProcess:
-    """Внутренний helper для pscp."""
+    """Внутренний helper для pscp (через SFTP пула, если он доступен)."""
+    src_user, src_host, src_path = _split_remote(source)
+    dst_user, dst_host, dst_path = _split_remote(dest)
+    user, host = (src_user, src_host) if src_host else (dst_user, dst_host)
+
+    pool = ssh_pool.get_pool(key_path, user, host) if host else None
+    if pool is not None:
+        try:
+            if src_host:
+                pool.get(src_path, dst_path, recursive=recursive)
+            else:
+                pool.put(src_path, dst_path, recursive=recursive)
+            return subprocess.CompletedProcess([source, dest], 0, "", "")
+        except Exception as e:
+            return subprocess.CompletedProcess([source, dest], 1, "", f"SFTP chyba ({source}): {e}")
+
     cmd = ["pscp", "-i", key_path]
     if recursive:
         cmd.append("-r")
@@ -24,6 +78,55 @@ def _run_pscp( key_path: str, source: str, dest: str, recursive: bool = False) -
     return subprocess.run( cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
 
+@contextmanager
+def _remote_stream(key_path: str, user_name: str, host: str, command: str):
+    """
+    Потоковый вывод удалённой команды: отдаёт (stdout, read_stderr), где stdout –
+    бинарный файловый объект, read_stderr() – текст ошибок после чтения stdout.
+    """
+    pool = ssh_pool.get_pool(key_path, user_name, host)
+    if pool is not None:
+        with pool.stream(command) as (stdout, stderr):
+            yield stdout, lambda: stderr.read().decode("utf-8", errors="replace")
+        return
+
+    proc = subprocess.Popen(["plink", "-batch", "-i", key_path, f"{user_name}@{host}", command],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        yield proc.stdout, lambda: proc.stderr.read().decode("utf-8", errors="replace")
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.wait()
+
+
+@contextmanager
+def _remote_sink(key_path: str, user_name: str, host: str, command: str):
+    """Потоковый ввод в удалённую команду: отдаёт бинарный stdin; ошибка команды -> RuntimeError."""
+    pool = ssh_pool.get_pool(key_path, user_name, host)
+    if pool is not None:
+        with pool.sink(command) as stdin:
+            yield stdin
+        return
+
+    proc = subprocess.Popen(["plink", "-batch", "-i", key_path, f"{user_name}@{host}", command],
+                            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    # stderr se čte průběžně ve vlákně – upovídaná vzdálená strana by jinak zaplnila rouru a zasekla zápis
+    errors: List[bytes] = []
+    reader = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+    reader.start()
+    try:
+        yield proc.stdin
+    finally:
+        proc.stdin.close()
+        reader.join()
+        proc.stderr.close()
+        proc.wait()
+    if proc.returncode != 0:
+        err = b"".join(errors).decode("utf-8", errors="replace")
+        raise RuntimeError(err or f"plink exit {proc.returncode}")
+
+
 def get_job_status(key_path: str, user_name: str, host: str) -> Tuple[Optional[str], Optional[str]]:
     """
     Запускает `qstat -u user_name` на кластере.
@@ -42,6 +145,38 @@ def get_job_status(key_path: str, user_name: str, host: str) -> Tuple[Optional[s
         return None, str(e)
 
 
+# Všechny naše joby jedním voláním: id z `qstat -u` (s historií -x, pokud ji PBS umí),
+# pak `qstat -f` pro všechna najednou – JSON (-F json), jinak text. set -f: id polí '123[]' nejsou glob.
+_QSTAT_FULL = (
+    "set -f; ids=$( (qstat -x -u {user} 2>/dev/null || qstat -u {user}) "
+    "| awk '$1 ~ /^[0-9]/ {{sub(/[.].*/, \"\", $1); print $1}}'); "
+    '[ -z "$ids" ] && exit 0; '
+    # podpora -F json se zjistí jednou a spustí se jen jedna forma: s neznámým id (job mezitím
+    # zmizel z historie) qstat vypíše ostatní a skončí s kódem 153 – fallback podle kódu by za JSON
+    # přilepil ještě textový výpis; na další formu (bez -x) se přechází jen při prázdném výstupu
+    'fmt=; qstat -Bf -F json >/dev/null 2>&1 && fmt="-F json"; '
+    'out=$(qstat -f -x -t $fmt $ids 2>/dev/null); '
+    '[ -n "$out" ] || out=$(qstat -f -t $fmt $ids); '
+    '[ -n "$out" ] || exit 1; printf \'%s\\n\' "$out"'
+)
+
+
+def query_jobs(key_path: str, user_name: str, host: str, cluster_sim_path: Optional[str] = None
+               ) -> Tuple[Optional[Dict[str, JobRecord]], Optional[str]]:
+    """
+    Структурированный статус всех наших jobů jedním вызовом (qstat -f, viz pbs_jobs).
+    Возвращает ({job_id: JobRecord}, None) или (None, text_error).
+    """
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                        command=_QSTAT_FULL.format(user=shlex.quote(user_name)))
+    if result.returncode != 0 and not result.stdout.strip():
+        return None, result.stderr.strip() or "Neznámá chyba qstat"
+    try:
+        return parse_qstat(result.stdout, cluster_sim_path), None
+    except ValueError as e:  # rozbitý JSON
+        return None, f"Nelze přečíst výstup qstat: {e}"
+
+
 def list_remote_simulations(key_path: str, user_name: str, host: str, cluster_sim_path: str,
                             ) -> Tuple[Optional[List[str]], Optional[str]]:
     """
@@ -60,36 +195,494 @@ def list_remote_simulations(key_path: str, user_name: str, host: str, cluster_si
         return None, str(e)
 
 
+# Soubory, do kterých LAMMPS jen připisuje – při růstu se stahuje jen nový konec
+APPEND_PATTERNS = ["dump*", "densF.dat", "log.lammps"]
+STREAM_CHUNK = 1 << 20
+
+
+def _matches(name: str, patterns: Optional[List[str]]) -> bool:
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(os.path.basename(name), p) for p in patterns or [])
+
+
+def remote_manifest(key_path: str, user_name: str, host: str, remote_dir: str, with_hash: bool = False
+                    ) -> Tuple[Optional[Dict[str, Dict[str, Any]]], Optional[str]]:
+    """
+    Список файлов удалённой папки одним вызовом: {rel_path: {size, mtime, md5}}.
+    md5 считается только при with_hash=True (для больших дампов это долго).
+    """
+    command = f"cd {remote_dir} && find . -type f -printf '%P\\t%s\\t%T@\\n'"
+    if with_hash:
+        command += " && echo '--md5--' && find . -type f -exec md5sum {} +"
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host, command=command)
+    if result.returncode != 0:
+        return None, result.stderr or f"Nelze načíst obsah složky {remote_dir}"
+
+    manifest: Dict[str, Dict[str, Any]] = {}
+    lines = iter(result.stdout.splitlines())
+    for line in lines:
+        if line == "--md5--":
+            break
+        parts = line.split("\t")
+        if len(parts) != 3:
+            continue
+        manifest[parts[0]] = {"size": int(parts[1]), "mtime": int(float(parts[2])), "md5": None}
+    for line in lines:
+        digest, _, name = line.partition("  ")
+        name = name[2:] if name.startswith("./") else name
+        if name in manifest:
+            manifest[name]["md5"] = digest
+    return manifest, None
+
+
+def _local_md5(path: Path) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def plan_sync(manifest: Dict[str, Dict[str, Any]], local_dir: Path, include: Optional[List[str]] = None,
+              exclude: Optional[List[str]] = None, append_patterns: Optional[List[str]] = None
+              ) -> List[Tuple[str, str, int]]:
+    """
+    Сравнивает удалённый манифест с локальной копией. Возвращает [(rel_path, action, offset)],
+    action: "full" – скачать целиком, "append" – докачать с offset, "touch" – совпадает по md5,
+    нужно только выставить mtime. Совпадающие файлы в план не попадают.
+    """
+    plan: List[Tuple[str, str, int]] = []
+    for name, remote in sorted(manifest.items()):
+        if include and not _matches(name, include):
+            continue
+        if _matches(name, exclude):
+            continue
+
+        local = local_dir / name
+        if not local.exists():
+            plan.append((name, "full", 0))
+            continue
+        st = local.stat()
+        if st.st_size == remote["size"] and int(st.st_mtime) == remote["mtime"]:
+            continue
+        if remote["md5"] is not None and st.st_size == remote["size"] and _local_md5(local) == remote["md5"]:
+            plan.append((name, "touch", 0))
+        elif st.st_size < remote["size"] and _matches(name, append_patterns):
+            plan.append((name, "append", st.st_size))
+        else:
+            plan.append((name, "full", 0))
+    return plan
+
+
+def remote_prefix_md5(key_path: str, user_name: str, host: str, remote_dir: str, prefixes: Dict[str, int]
+                      ) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """md5 prvních N bajtů několika souborů jedním voláním: {rel_path: N} -> {rel_path: md5}."""
+    parts = [f"printf '%s\\t' {shlex.quote(name)}; head -c {size} {shlex.quote(name)} | md5sum"
+             for name, size in prefixes.items()]
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                        command=f"cd {remote_dir} && {{ {'; '.join(parts)}; }}")
+    if result.returncode != 0:
+        return None, result.stderr or f"Nelze spočítat md5 souborů ve složce {remote_dir}"
+    digests = {}
+    for line in result.stdout.splitlines():
+        name, _, digest = line.partition("\t")
+        if digest:
+            digests[name] = digest.split()[0]
+    return digests, None
+
+
+def _verify_appends(key_path: str, user_name: str, host: str, remote_dir: str, local_dir: Path,
+                    plan: List[Tuple[str, str, int]]) -> Tuple[Optional[List[Tuple[str, str, int]]], Optional[str]]:
+    """
+    "append" jen tam, kde je lokální soubor opravdu začátkem vzdáleného: nový běh LAMMPS
+    log.lammps / dumpy / densF.dat přepíše (densF.dat se při pokračování odkládá jako segment),
+    takže větší vzdálený soubor může být úplně jiný. Jinak se stáhne celý.
+    """
+    appends = {name: offset for name, action, offset in plan if action == "append"}
+    if not appends:
+        return plan, None
+    remote_md5, err = remote_prefix_md5(key_path, user_name, host, remote_dir, appends)
+    if err is not None:
+        return None, err
+    verified = []
+    for name, action, offset in plan:
+        if action == "append" and remote_md5.get(name) != _local_md5(local_dir / name):
+            action, offset = "full", 0
+        verified.append((name, action, offset))
+    return verified, None
+
+
+class TransferCancelled(Exception):
+    """Přenos zrušen uživatelem (TaskFuture.cancel() -> cancel event)."""
+
+    def __init__(self):
+        super().__init__("Přenos byl zrušen.")
+
+
+def _check_cancel(cancel) -> None:
+    if cancel is not None and cancel.is_set():
+        raise TransferCancelled()
+
+
+def _stream_to_file(key_path: str, user_name: str, host: str, command: str, out, progress=None,
+                    cancel=None) -> int:
+    written = 0
+    with _remote_stream(key_path, user_name, host, command) as (stdout, _):
+        while True:
+            _check_cancel(cancel)
+            chunk = stdout.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            out.write(chunk)
+            written += len(chunk)
+            if progress is not None:
+                progress(len(chunk))
+    return written
+
+
+def sync_simulation_folder(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                           sim_name: str, local_results_dir: Path, include: Optional[List[str]] = None,
+                           exclude: Optional[List[str]] = None, append_patterns: Optional[List[str]] = None,
+                           with_hash: bool = False, progress=None, cancel=None
+                           ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Инкрементальная синхронизация папки симуляции (в духе rsync):
+      - новые/изменённые файлы скачиваются целиком,
+      - выросшие дописываемые файлы (APPEND_PATTERNS: дампы, densF.dat, log.lammps) – только хвост,
+      - include/exclude – шаблоны fnmatch (например exclude=["run.restart.*"]).
+    progress(bytes_done, bytes_total) вызывается по ходу передачи; cancel (threading.Event)
+    se kontroluje mezi bloky – zrušený přenos vrátí chybu, rozpracovaný .part se smaže.
+    Возвращает (stats, error); stats: {"full": [...], "append": [...], "skipped": n, "bytes": n}.
+    """
+    try:
+        remote_dir = f"{cluster_sim_path}/{sim_name}"
+        manifest, err = remote_manifest(key_path, user_name, host, remote_dir, with_hash=with_hash)
+        if err is not None:
+            return None, err
+
+        local_dir = local_results_dir / sim_name
+        local_dir.mkdir(parents=True, exist_ok=True)
+        if append_patterns is None:
+            append_patterns = APPEND_PATTERNS
+        plan = plan_sync(manifest, local_dir, include, exclude, append_patterns)
+        plan, err = _verify_appends(key_path, user_name, host, remote_dir, local_dir, plan)
+        if err is not None:
+            return None, err
+
+        total = sum(manifest[name]["size"] - offset for name, action, offset in plan if action != "touch")
+        done = 0
+
+        def _advance(n: int):
+            nonlocal done
+            done += n
+            if progress is not None:
+                progress(done, total)
+
+        stats: Dict[str, Any] = {"full": [], "append": [], "skipped": len(manifest) - len(plan), "bytes": 0}
+        for name, action, offset in plan:
+            _check_cancel(cancel)
+            remote = manifest[name]
+            local = local_dir / name
+            local.parent.mkdir(parents=True, exist_ok=True)
+            remote_file = shlex.quote(name)
+
+            if action == "append":
+                with open(local, "ab") as out:
+                    # jen do velikosti z manifestu – běžící simulace soubor mezitím prodlužuje
+                    command = (f"cd {remote_dir} && tail -c +{offset + 1} {remote_file}"
+                               f" | head -c {remote['size'] - offset}")
+                    stats["bytes"] += _stream_to_file(key_path, user_name, host, command, out, _advance, cancel)
+                stats["append"].append(name)
+            elif action == "full":
+                part = local.with_name(local.name + ".part")
+                try:
+                    with open(part, "wb") as out:
+                        stats["bytes"] += _stream_to_file(key_path, user_name, host,
+                                                          f"cd {remote_dir} && head -c {remote['size']} {remote_file}",
+                                                          out, _advance, cancel)
+                except TransferCancelled:
+                    part.unlink()
+                    raise
+                # neúplný přenos nesmí přepsat dosavadní lokální kopii
+                if part.stat().st_size != remote["size"]:
+                    size = part.stat().st_size
+                    part.unlink()
+                    return stats, f"Soubor {name} se nepřenesl celý ({size} z {remote['size']} B)"
+                os.replace(part, local)
+                stats["full"].append(name)
+
+            if local.stat().st_size != remote["size"] and action != "touch":
+                return stats, f"Soubor {name} se nepřenesl celý ({local.stat().st_size} z {remote['size']} B)"
+            os.utime(local, (remote["mtime"], remote["mtime"]))
+
+        return stats, None
+    except Exception as e:
+        return None, str(e)
+
+
+COPY_MODES = ("auto", "tar", "sync")
+
+
+def default_copy_mode() -> str:
+    """SIM_COPY_MODE v .env: auto (první kopie tarem, další synchronizací) / tar / sync."""
+    mode = (os.getenv("SIM_COPY_MODE") or "auto").strip().lower()
+    return mode if mode in COPY_MODES else "auto"
+
+
 def copy_simulation_folder( key_path: str, user_name: str, host: str, cluster_sim_path: str,
-                           sim_name: str, local_results_dir: Path) -> Optional[str]:
+                           sim_name: str, local_results_dir: Path, exclude: Optional[List[str]] = None,
+                           progress=None, mode: Optional[str] = None, cancel=None) -> Optional[str]:
     """
     Копирует папку конкретной симуляции с кластера в локальный каталог.
+    mode (výchozí SIM_COPY_MODE):
+      - "tar"  – celá složka jedním komprimovaným proudem (download_folder_tar),
+      - "sync" – инкрементально через sync_simulation_folder (докачивает только новое),
+      - "auto" – tar, pokud lokální kopie ještě není, jinak sync.
+    progress(bytes_done, bytes_total); u taru celkový objem předem neznámý (total = 0).
+    cancel (threading.Event, z ClusterRunner) přenos přeruší mezi bloky.
     Возвращает:
       - None, если всё ок
       - текст ошибки, если что-то пошло не так
     """
+    mode = mode or default_copy_mode()
+    local_dir = local_results_dir / sim_name
+    if mode == "auto":
+        mode = "sync" if local_dir.is_dir() and any(local_dir.iterdir()) else "tar"
+
+    if mode == "tar":
+        # tar zachová mtime souborů, takže další sync porovná složku správně
+        return download_folder_tar(key_path=key_path, user_name=user_name, host=host,
+                                   cluster_sim_path=cluster_sim_path, sim_name=sim_name,
+                                   local_results_dir=local_results_dir, exclude=exclude, cancel=cancel,
+                                   progress=(lambda done: progress(done, 0)) if progress is not None else None)
+
+    _, error = sync_simulation_folder(key_path=key_path, user_name=user_name, host=host,
+                                      cluster_sim_path=cluster_sim_path, sim_name=sim_name,
+                                      local_results_dir=local_results_dir, exclude=exclude,
+                                      progress=progress, cancel=cancel)
+    return error
+
+
+class _CountingIO:
+    """Обёртка над потоком, считает переданные байты и вызывает progress(bytes_done)."""
+
+    def __init__(self, raw, progress=None, cancel=None):
+        self.raw = raw
+        self.progress = progress
+        self.cancel = cancel
+        self.count = 0
+
+    def _add(self, n: int):
+        self.count += n
+        if self.progress is not None and n:
+            self.progress(self.count)
+
+    def read(self, size: int = -1) -> bytes:
+        _check_cancel(self.cancel)
+        data = self.raw.read(size)
+        self._add(len(data))
+        return data
+
+    def write(self, data: bytes) -> int:
+        self.raw.write(data)
+        self._add(len(data))
+        return len(data)
+
+    def flush(self):
+        if hasattr(self.raw, "flush"):
+            self.raw.flush()
+
+
+def _zstd_available(key_path: str, user_name: str, host: str) -> bool:
+    """zstd je potřeba na obou stranách: příkaz na clustru a balík zstandard lokálně."""
     try:
-        dest_sim_folder = local_results_dir / sim_name
-        dest_sim_folder.mkdir(parents=True, exist_ok=True)
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host, command="command -v zstd")
+    return result.returncode == 0 and bool(result.stdout.strip())
 
-        remote_path = f"{user_name}@{host}:{cluster_sim_path}/{sim_name}/*"
-        result = _run_pscp( key_path=key_path, source=remote_path, 
-                           dest=str(dest_sim_folder), recursive=True)
-        if result.returncode != 0:
-            return result.stderr or "Chyba při kopírování simulace"
 
+def _pick_compression(key_path: str, user_name: str, host: str, compression: str) -> str:
+    if compression == "auto":
+        return "zstd" if _zstd_available(key_path, user_name, host) else "gzip"
+    return compression
+
+
+def _extract_stream(tar: tarfile.TarFile, dest: Path):
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(dest, filter="data")
+    else:
+        tar.extractall(dest)
+
+
+def download_folder_tar(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                        sim_name: str, local_results_dir: Path, compression: str = "auto",
+                        exclude: Optional[List[str]] = None, progress=None, cancel=None) -> Optional[str]:
+    """
+    Скачивает папку симуляции одним сжатым потоком `tar | zstd` (или gzip) и распаковывает
+    его на лету по мере поступления байтов. progress(bytes) – сколько сжатых байт уже пришло;
+    cancel (threading.Event) se kontroluje při každém čtení proudu.
+    Возвращает None или текст ошибки.
+    """
+    try:
+        compression = _pick_compression(key_path, user_name, host, compression)
+        excludes = " ".join(f"--exclude={shlex.quote(p)}" for p in exclude or [])
+        compressor = "zstd -c -3 -T0" if compression == "zstd" else "gzip -c -1"
+        command = f"cd {cluster_sim_path} && tar -cf - {excludes} {shlex.quote(sim_name)} | {compressor}"
+
+        local_results_dir.mkdir(parents=True, exist_ok=True)
+        with _remote_stream(key_path, user_name, host, command) as (stdout, read_stderr):
+            counted = _CountingIO(stdout, progress, cancel)
+            if compression == "zstd":
+                import zstandard
+                reader = zstandard.ZstdDecompressor().stream_reader(counted)
+                with tarfile.open(fileobj=reader, mode="r|") as tar:
+                    _extract_stream(tar, local_results_dir)
+            else:
+                with tarfile.open(fileobj=counted, mode="r|gz") as tar:
+                    _extract_stream(tar, local_results_dir)
+            if counted.count == 0:
+                return read_stderr() or f"Prázdný tar stream pro {sim_name}"
         return None
     except Exception as e:
         return str(e)
 
 
+def upload_folder_tar(key_path: str, user_name: str, host: str, local_folder: Path,
+                      cluster_sim_path: str, compression: str = "auto",
+                      exclude: Optional[List[str]] = None, progress=None) -> Optional[str]:
+    """
+    Загружает локальную папку на кластер одним сжатым tar-потоком (аналог `pscp -r`):
+    локально tar + zstd/gzip -> stdin удалённого `zstd -dc | tar -xf -`.
+    progress(bytes) – сколько сжатых байт уже отправлено. Возвращает None или текст ошибки.
+    """
+    try:
+        local_folder = Path(local_folder)
+        compression = _pick_compression(key_path, user_name, host, compression)
+        decompressor = "zstd -dc" if compression == "zstd" else "gzip -dc"
+        command = f"mkdir -p {cluster_sim_path} && cd {cluster_sim_path} && {decompressor} | tar -xf -"
+
+        def _filter(info: tarfile.TarInfo):
+            return None if _matches(info.name, exclude) else info
+
+        with _remote_sink(key_path, user_name, host, command) as stdin:
+            counted = _CountingIO(stdin, progress)
+            if compression == "zstd":
+                import zstandard
+                with zstandard.ZstdCompressor(level=3).stream_writer(counted, closefd=False) as zout:
+                    with tarfile.open(fileobj=zout, mode="w|") as tar:
+                        tar.add(str(local_folder), arcname=local_folder.name, filter=_filter)
+            else:
+                with tarfile.open(fileobj=counted, mode="w|gz") as tar:
+                    tar.add(str(local_folder), arcname=local_folder.name, filter=_filter)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+HARVEST_WORKERS = 8
+
+
+def _harvest_tar(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                 folders: List[str], local_results_dir: Path, file_name: str,
+                 extra_pattern: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """
+    Все файлы одним tar-потоком; распаковка на лету, принимаются только запрошенные '<folder>/<file_name>'
+    (и '<folder>/<extra_pattern>', например сегменты densF после рестартов).
+    """
+    wanted = {f"{folder}/{file_name}": folder for folder in folders}
+    quoted = " ".join(f"'{name}'" for name in wanted)
+    if extra_pattern:
+        # glob se rozbalí na clusteru; bez shody zůstane doslova a tar ho přeskočí
+        quoted += " " + " ".join(f"'{folder}'/{extra_pattern}" for folder in folders)
+    command = f"cd {cluster_sim_path} && tar -cf - --ignore-failed-read {quoted} 2>/dev/null; true"
+
+    results: Dict[str, Optional[str]] = {folder: f"{file_name} nenalezen ve složce {folder}" for folder in folders}
+    with _remote_stream(key_path, user_name, host, command) as (stdout, read_stderr):
+        with tarfile.open(fileobj=stdout, mode="r|") as tar:
+            for member in tar:
+                folder = wanted.get(member.name)
+                if folder is None and extra_pattern and member.name.count("/") == 1:
+                    parent, base = member.name.split("/")
+                    if parent in folders and fnmatch.fnmatch(base, extra_pattern):
+                        _extract_member(tar, member, local_results_dir / parent / base)
+                    continue
+                if folder is None or not member.isfile():
+                    continue
+                _extract_member(tar, member, local_results_dir / folder / file_name)
+                results[folder] = None
+    return results
+
+
+def _extract_member(tar: tarfile.TarFile, member: tarfile.TarInfo, dest: Path) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    src = tar.extractfile(member)
+    with open(dest, "wb") as out:
+        while True:
+            chunk = src.read(1 << 20)
+            if not chunk:
+                break
+            out.write(chunk)
+
+
+def _harvest_parallel(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                      folders: List[str], local_results_dir: Path, file_name: str,
+                      workers: int) -> Dict[str, Optional[str]]:
+    """По одному pscp/SFTP на папку, но параллельно в ограниченном пуле потоков."""
+    def _copy_one(folder: str) -> Optional[str]:
+        local_path = local_results_dir / folder
+        local_path.mkdir(parents=True, exist_ok=True)
+        remote_file = f"{user_name}@{host}:{cluster_sim_path}/{folder}/{file_name}"
+        result = _run_pscp(key_path=key_path, source=remote_file, dest=str(local_path / file_name),
+                           recursive=False)
+        if result.returncode != 0:
+            return result.stderr or f"Chyba při kopírování {file_name} ze složky {folder}"
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(folders, executor.map(_copy_one, folders)))
+
+
+def harvest_densF(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                  folders: List[str], local_results_dir: Path, mode: str = "tar",
+                  workers: int = HARVEST_WORKERS, file_name: str = "densF.dat",
+                  segments: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Скачивает densF.dat из всех заданных папок.
+      mode="tar"      – один удалённый tar-поток (один round trip на всё),
+                        вместе с сегментами densF.seg_*.dat прошлых продолжений (segments=True),
+      mode="parallel" – pscp/SFTP на папку в пуле из workers потоков (только сам file_name).
+    Ошибка одной папки не прерывает остальные. Возвращает {folder: None | текст ошибки}.
+    """
+    if not folders:
+        return {}
+    try:
+        if mode == "tar":
+            return _harvest_tar(key_path, user_name, host, cluster_sim_path, folders,
+                                local_results_dir, file_name,
+                                extra_pattern=SEGMENT_PATTERN if segments else None)
+        return _harvest_parallel(key_path, user_name, host, cluster_sim_path, folders,
+                                 local_results_dir, file_name, workers)
+    except Exception as e:
+        return {folder: str(e) for folder in folders}
+
+
+def summarize_harvest(results: Dict[str, Optional[str]]) -> Optional[str]:
+    """None, если всё скачалось; иначе текст со списком неудачных папок."""
+    failed = {folder: err for folder, err in results.items() if err is not None}
+    if not failed:
+        return None
+    lines = [f"{folder}: {err.strip()}" for folder, err in failed.items()]
+    return f"Nepodařilo se stáhnout {len(failed)} z {len(results)} souborů:\n" + "\n".join(lines)
+
+
 def copy_density_files( key_path: str, user_name: str, host: str, cluster_sim_path: str,
                        local_results_dir: Path) -> Optional[str]:
     """
     Создаёт локальные папки и копирует densF.dat из каждой симуляции с кластера.
     Возвращает:
       - None, если всё ок
-      - текст ошибки, если что-то пошло не так (первая серьёзная ошибка)
+      - текст ошибки со списком папок, которые скачать не удалось
     """
     # 1. Получаем список папок на кластере
     folders, err = list_remote_simulations(key_path=key_path, user_name=user_name, host=host,
@@ -99,133 +692,646 @@ def copy_density_files( key_path: str, user_name: str, host: str, cluster_sim_pa
     if not folders:
         return "Na clustru nebyly nalezeny žádné složky se simulacemi."
 
-    # 2. Копируем densF.dat из каждой
-    for folder in folders:
-        local_path = local_results_dir / folder
-        local_path.mkdir(parents=True, exist_ok=True)
+    # 2. Копируем densF.dat из всех сразу
+    results = harvest_densF(key_path=key_path, user_name=user_name, host=host,
+                            cluster_sim_path=cluster_sim_path, folders=folders,
+                            local_results_dir=local_results_dir)
+    return summarize_harvest(results)
 
-        remote_file = (f"{user_name}@{host}:{cluster_sim_path}/{folder}/densF.dat")
-        local_file_path = local_path / "densF.dat"
 
-        result = _run_pscp( key_path=key_path, source=remote_file, dest=str(local_file_path),
-                           recursive=False)
-        # если очень хочется, можно проверять returncode и копить ошибки в список
-        # но для простоты: если сломалось — возвращаем первую ошибку
+# Один удалённый скрипт на все папки: на каждую строку TSV
+#   folder  nrun  last_restart_step  log_size log_mtime  densF_size densF_mtime
+# отсутствующее значение = "-"
+_SCAN_SCRIPT = (
+    "for d in */; do d=${d%/}; [ -d \"$d\" ] || continue; "
+    "nrun=$(awk '$1==\"variable\" && $2==\"nrun\" {print $4; exit}' \"$d/box.in\" 2>/dev/null); "
+    "last=$(ls \"$d\" 2>/dev/null | sed -n 's/^run[.]restart[.]\\([0-9][0-9]*\\)$/\\1/p' | sort -n | tail -1); "
+    "log=$(stat -c '%s %Y' \"$d/log.lammps\" 2>/dev/null || echo '- -'); "
+    "dens=$(stat -c '%s %Y' \"$d/densF.dat\" 2>/dev/null || echo '- -'); "
+    "printf '%s\\t%s\\t%s\\t%s\\t%s\\n' \"$d\" \"${nrun:--}\" \"${last:--}\" \"$log\" \"$dens\"; "
+    "done"
+)
+
+
+def _int_or_none(text: str) -> Optional[int]:
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+def parse_scan_table(text: str) -> List[Dict[str, Any]]:
+    """Разбирает вывод _SCAN_SCRIPT в список словарей (по одному на папку)."""
+    rows: List[Dict[str, Any]] = []
+    for line in text.splitlines():
+        parts = line.split("\t")
+        if len(parts) != 5:
+            continue
+        folder, nrun, last, log, dens = parts
+        log_size, log_mtime = (log.split() + ["-", "-"])[:2]
+        dens_size, dens_mtime = (dens.split() + ["-", "-"])[:2]
+        rows.append({
+            "folder": folder,
+            "nrun": _int_or_none(nrun),
+            "last_step": _int_or_none(last),
+            "log_size": _int_or_none(log_size),
+            "log_mtime": _int_or_none(log_mtime),
+            "densF_size": _int_or_none(dens_size),
+            "densF_mtime": _int_or_none(dens_mtime),
+        })
+    return rows
+
+
+CONVERGENCE_COLUMNS = ("conv_status", "conv_step", "conv_more", "conv_err")
+
+
+def default_convergence_tol() -> float:
+    """Cílová relativní chyba profilu pro konvergenci (CONVERGENCE_TOL v .env)."""
+    return float(os.getenv("CONVERGENCE_TOL") or convergence.TOL)
+
+
+def parse_convergence(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Řádky '@@CONV folder status conv_step more rel_err steps' (core/convergence.py)
+    -> {folder: {conv_status, conv_step, conv_more, conv_err}}; '@@CONVERR' (rozbitá složka) se přeskočí.
+    """
+    result: Dict[str, Dict[str, Any]] = {}
+    for line in text.splitlines():
+        if not line.startswith("@@CONV "):
+            continue
+        parts = line[len("@@CONV "):].split("\t")
+        if len(parts) != 6:
+            continue
+        folder, status, step, more, rel_err, _steps = parts
+        result[folder] = {
+            "conv_status": status,
+            "conv_step": _int_or_none(step),
+            "conv_more": _int_or_none(more),
+            "conv_err": _float_or_none(rel_err),
+        }
+    return result
+
+
+def scan_remote_simulations(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                            tol: Optional[float] = None) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Одним вызовом plink сканирует все папки симуляций на кластере.
+    Ve stejném volání běží core/convergence.py (poslaný na stdin `python3 -`) – konvergence
+    profilu hustoty každé složky; bez python3 na clusteru zůstanou conv_* None.
+    Возвращает (rows, error), где rows: [{folder, nrun, last_step, log_size, log_mtime,
+    densF_size, densF_mtime, conv_status, conv_step, conv_more, conv_err}, ...]; отсутствующие значения – None.
+    """
+    tol = default_convergence_tol() if tol is None else tol
+    command = (f"cd {cluster_sim_path} && {{ {_SCAN_SCRIPT}; }} </dev/null && "
+               f"{{ python3 - --tol {tol:g} 2>/dev/null || true; }}")
+    try:
+        result = _run_plink(key_path=key_path, user_name=user_name, host=host, command=command,
+                            input=Path(convergence.__file__).read_text(encoding="utf-8"))
         if result.returncode != 0:
-            return result.stderr or f"Chyba při kopírování densF.dat ze složky {folder}"
+            return None, result.stderr or "Chyba při skenování složek simulací"
+        conv = parse_convergence(result.stdout)
+        rows = parse_scan_table(result.stdout)
+        for row in rows:
+            row.update(conv.get(row["folder"]) or dict.fromkeys(CONVERGENCE_COLUMNS))
+        return rows, None
+    except Exception as e:
+        return None, str(e)
 
-    return None
 
+# Heartbeat všech složek jedním voláním: první řádek "@@NOW <epoch>", pak na složku
+#   folder \t mtime \t poslední řádek progress.dat ("step phase target steps/s eta_s")
+# fix print soubor jen doplňuje, proto tail -n 1 místo cat celého souboru
+PROGRESS_FILE = "progress.dat"
+_PROGRESS_SCRIPT = (
+    'echo "@@NOW $(date +%s)"; '
+    f"for f in */{PROGRESS_FILE}; do [ -f \"$f\" ] || continue; "
+    f"printf '%s\\t%s\\t%s\\n' \"${{f%/{PROGRESS_FILE}}}\" \"$(stat -c %Y \"$f\")\" \"$(tail -n 1 \"$f\")\"; "
+    "done"
+)
+
+
+@dataclass
+class Progress:
+    """Poslední heartbeat simulace z progress.dat (fix print v box.in + konec běhu z run.sh)."""
+    folder: str
+    step: int
+    phase: str                         # relax / eql / production / end / failed
+    target: Optional[int] = None       # krok, kde fáze končí (production: nrun)
+    steps_per_s: Optional[float] = None
+    eta_s: Optional[float] = None      # odhad zbývajícího času aktuálního run (cpuremain)
+    age_s: Optional[float] = None      # stáří záznamu (s) podle času na clusteru
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.target:
+            return None
+        return min(1.0, self.step / self.target)
+
+
+def _float_or_none(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
 
-def completeness_check(key_path: str, user_name: str, host: str, cluster_sim_path: str
-                                        ) -> Tuple[List[Tuple[str, int | None, int]], Optional[str], List[str]]:
+
+def parse_progress(text: str) -> Dict[str, Progress]:
+    """Разбирает вывод _PROGRESS_SCRIPT -> {folder: Progress}; neúplné řádky se přeskočí."""
+    now, progress = None, {}
+    for line in text.splitlines():
+        if line.startswith("@@NOW "):
+            now = _float_or_none(line.split()[1])
+            continue
+        parts = line.split("\t")
+        if len(parts) != 3:
+            continue
+        folder, mtime, last = parts
+        fields = last.split()
+        step = _int_or_none(fields[0]) if fields else None
+        if step is None or len(fields) < 2:
+            continue
+        fields += ["-"] * (5 - len(fields))
+        mtime = _float_or_none(mtime)
+        progress[folder] = Progress(
+            folder=folder, step=step, phase=fields[1],
+            target=_int_or_none(fields[2].split(".")[0]),
+            steps_per_s=_float_or_none(fields[3]), eta_s=_float_or_none(fields[4]),
+            age_s=(now - mtime) if now is not None and mtime is not None else None)
+    return progress
+
+
+def read_progress(key_path: str, user_name: str, host: str, cluster_sim_path: str
+                  ) -> Tuple[Optional[Dict[str, Progress]], Optional[str]]:
+    """Heartbeat všech simulací (progress.dat) jedním voláním plink. Возвращает (progress, error)."""
+    try:
+        result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                            command=f"cd {cluster_sim_path} && {_PROGRESS_SCRIPT}")
+        if result.returncode != 0:
+            return None, result.stderr or "Chyba při čtení progress.dat"
+        return parse_progress(result.stdout), None
+    except Exception as e:
+        return None, str(e)
+
+
+def get_remote_state(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                     index: Optional[RemoteIndex] = None, force: bool = False
+                     ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Состояние всех симуляций: из индекса, если он свежий (TTL), иначе одним сканом
+    с кластера с записью в индекс. force=True – всегда на кластер.
     """
-    Для всех симуляций на кластере:
-      - читает nrun из box.in,
-      - ищет файлы run.restart.* и определяет последний шаг,
-      - если последний шаг >= nrun -> добавляет путь папки в isfinished
-      - иначе добавляет запись в список unfinished_list незавершённых симуляций.
+    if index is not None and not force and index.is_fresh():
+        return index.rows(), None
+
+    rows, err = scan_remote_simulations(key_path=key_path, user_name=user_name, host=host,
+                                        cluster_sim_path=cluster_sim_path)
+    if err is None and index is not None:
+        index.replace_all(rows)
+    return rows, err
+
+
+def completeness_check(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                       index: Optional[RemoteIndex] = None, force: bool = False
+                       ) -> Tuple[List[Tuple[str, int | None, int]], Optional[str], List[str], List[str]]:
+    """
+    Для всех симуляций на кластере (одним удалённым сканом или из индекса, см. get_remote_state):
+      - берёт nrun из box.in,
+      - берёт последний шаг из файлов run.restart.*,
+      - профиль zkonvergoval (conv_status 'converged') -> isfinished, i když nrun ještě nedoběhl;
+        takové složky jsou navíc v converged_early (kandidáti na předčasný konec, request_early_stop),
+      - последний шаг >= nrun, ale profil ještě nekonverguje -> unfinished s prodloužením
+        expected_nrun = last_step + conv_more,
+      - без údaje o konvergenci (python3 na clusteru chybí, žádný densF.dat) – jen podle nrun.
 
     Возвращает:
-      (unfinished_list, error, isfinished),
+      (unfinished_list, error, isfinished, converged_early),
       где unfinished_list: [(folder, last_restart_step | None, expected_nrun), ...]
     """
-    # 1. Получаем список папок
-    folders, err = list_remote_simulations( key_path=key_path, user_name=user_name, host=host, cluster_sim_path=cluster_sim_path)
+    rows, err = get_remote_state(key_path=key_path, user_name=user_name, host=host,
+                                 cluster_sim_path=cluster_sim_path, index=index, force=force)
     if err is not None:
-        return [], err
-    if not folders:
-        return [], "Na clustru nebyly nalezeny žádné složky se simulacemi."
-    
+        return [], err, [], []
+    if not rows:
+        return [], "Na clustru nebyly nalezeny žádné složky se simulacemi.", [], []
+
     unfinished: List[Tuple[str, int | None, int]] = []
     isfinished: List[str] = []
-    
+    converged_early: List[str] = []
 
-    for folder in folders:
-        # --- читаем nrun из box.in ---
-        cmd_nrun = (
-            f"cd {cluster_sim_path}/{folder} && "
-            "grep 'variable nrun' box.in | awk '{print $4}'")
-        
-        result_nrun = _run_plink( key_path=key_path, user_name=user_name, host=host, command=cmd_nrun,)
-        if result_nrun.returncode != 0 or not result_nrun.stdout.strip():
-            return [], result_nrun.stderr or f"Nelze zjistit nrun v simulaci {folder}"
-        try:
-            nrun = int(result_nrun.stdout.strip().split()[0])
-        except ValueError:
-            return [], f"Neplatná hodnota nrun v simulaci {folder}: {result_nrun.stdout!r}"
-
-        # --- ищем restart файлы, в случае ошибки программа возвращает 0 ---
-        cmd_ls_restart = (
-            f"cd {cluster_sim_path}/{folder} && ls run.restart.* 2>/dev/null || true")
-        
-        
-        result_restart = _run_plink( key_path=key_path, user_name=user_name, host=host, command=cmd_ls_restart)
-        if result_restart.returncode != 0:
-            # тут treat как ошибку, это уже странно
-            return [], result_restart.stderr or f"Chyba při listování restart souborů v {folder}"
-        
-        # список всех рестарт файлов + требуемый последний рестарт
-        lines = [ln for ln in result_restart.stdout.strip().splitlines() if ln]
-        steps: List[int] = []
-        for name in lines:
-            # ожидаем имена вида run.restart.500000б оставляем то что после точки
-            parts = name.rsplit(".", 1)
-            if len(parts) != 2:
-                continue
-            try:
-                steps.append(int(parts[1]))
-            except ValueError:
-                continue
-        #тайпхинт переменной
-        last_step: int | None = max(steps) if steps else None
+    for row in rows:
+        folder = row["folder"]
+        nrun = row["nrun"]
+        if nrun is None:
+            return [], f"Nelze zjistit nrun v simulaci {folder}", [], []
 
-        # решение: докопалась ли симуляция до конца
-        finished = last_step is not None and last_step >= nrun
+        last_step = row["last_step"]
+        reached = last_step is not None and last_step >= nrun
+        status, more = row.get("conv_status"), row.get("conv_more")
 
-        if finished:
+        # решение: докопалась ли симуляция до конца – přednost má konvergence profilu
+        if status == "converged":
+            isfinished.append(str(folder))
+            if not reached:
+                converged_early.append(str(folder))
+        elif status == "running" and more and last_step is not None and last_step + more > nrun:
+            unfinished.append((folder, last_step, last_step + more))
+        elif reached:
             isfinished.append(str(folder))
         else:
             unfinished.append((folder, last_step, nrun))
 
-    return unfinished, None, isfinished
+    return unfinished, None, isfinished, converged_early
+
+
+# Soubor, na který čeká "fix halt ... v_stop" v box.in (is_file(STOP)) a _latest_step_guard řetězu
+STOP_FILE = "STOP"
+
+
+def request_early_stop(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                       folders: List[str]) -> Optional[str]:
+    """
+    Předčasný konec zkonvergovaných simulací: jedním voláním vytvoří STOP ve všech složkách.
+    Běžící LAMMPS skončí do nprogress kroků (error soft – zbytek box.in i write_restart doběhne), další segmenty
+    řetězu se hned ukončí. Возвращает None или текст ошибки.
+    """
+    if not folders:
+        return None
+    targets = " ".join(shlex.quote(f"{folder}/{STOP_FILE}") for folder in folders)
+    try:
+        result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                            command=f"cd {cluster_sim_path} && touch {targets}")
+        if result.returncode != 0:
+            return result.stderr.strip() or "Nepodařilo se vytvořit soubor STOP"
+        return None
+    except Exception as e:
+        return str(e)
 
 
 
 def copy_densF_for_finish_sim(key_path: str, user_name: str, host: str, cluster_sim_path: str,
-                              isfinished: List[str], local_results_dir: Path):
-    folders, err = list_remote_simulations( key_path=key_path, user_name=user_name, host=host, cluster_sim_path=cluster_sim_path)
-    
-    for folder in folders:
-        if folder in isfinished:
-            # копируем densF.dat, как в copy_density_files
-            local_path = local_results_dir / folder
-            local_path.mkdir(parents=True, exist_ok=True)
-
-            remote_file = f"{user_name}@{host}:{cluster_sim_path}/{folder}/densF.dat"
-            local_file_path = local_path / "densF.dat"
-
-            copy_result = _run_pscp(
-                key_path=key_path,
-                source=remote_file,
-                dest=str(local_file_path),
-                recursive=False,
-            )
-            if copy_result.returncode != 0:
-                return copy_result.stderr or f"Chyba při kopírování densF.dat ze složky {folder}"
-    return None
+                              isfinished: List[str], local_results_dir: Path) -> Optional[str]:
+    """
+    Копирует densF.dat (и сегменты прошлых продолжений) из уже известных завершённых папок
+    (без повторного ls на кластере) и сливает их в densF_merged.dat – профиль за весь прогон.
+    """
+    results = harvest_densF(key_path=key_path, user_name=user_name, host=host,
+                            cluster_sim_path=cluster_sim_path, folders=isfinished,
+                            local_results_dir=local_results_dir)
+    for folder, error in results.items():
+        if error is None:
+            try:
+                merge_folder(Path(local_results_dir) / folder)
+            except Exception as e:
+                results[folder] = f"Sloučení segmentů densF selhalo: {e}"
+    return summarize_harvest(results)
+
 
 
 
+# Номер последнего run.restart.<step>, run.sh и box.in одной папки (выполняется в ней)
+_RESTART_PROBE = (
+    "step=$(ls | sed -n 's/^run[.]restart[.]\\([0-9][0-9]*\\)$/\\1/p' | sort -n | tail -1); "
+    "echo \"@@STEP ${step}\"; echo @@RUN; cat run.sh 2>/dev/null; echo; echo @@BOX; cat box.in 2>/dev/null"
+)
+RESTART_RUN_SCRIPT = "run_restart.sh"
+RESTART_ARRAY_INDEX = "restart_array.idx"
+
+
+@dataclass
+class RestartSpec:
+    """Одна симуляция для (пакетного) продолжения и ресурсы PBS для неё."""
+    sim_name: str
+    node: Optional[str]
+    queue: str
+    ppn: int
+    mem_gb: int
+    expected_nrun: Optional[int] = None
+    walltime: Optional[str] = None
+
+
+def parse_restart_probe(text: str) -> Tuple[Optional[int], str, str]:
+    """Вывод _RESTART_PROBE -> (last_restart_step | None, run_sh_text, box_in_text)."""
+    head, _, rest = text.partition("@@RUN\n")
+    run_text, _, box_text = rest.partition("\n@@BOX\n")
+    match = re.search(r"@@STEP (\d+)", head)
+    return (int(match.group(1)) if match else None), run_text.rstrip("\n") + "\n", box_text
+
+
+def probe_restart_states(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                         sim_names: List[str]) -> Tuple[Optional[Dict[str, Tuple[Optional[int], str, str]]], Optional[str]]:
+    """Одним вызовом для всех папок: {sim: (last_restart_step, run_sh, box_in)}."""
+    names = " ".join(shlex.quote(name) for name in sim_names)
+    command = (f'cd "{cluster_sim_path}" && for d in {names}; do echo "@@SIM $d"; '
+               f'(cd "$d" 2>/dev/null && {_RESTART_PROBE}); echo; done')
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host, command=command)
+    if result.returncode != 0:
+        return None, result.stderr.strip() or result.stdout.strip() or "neznámá chyba"
+
+    states = {}
+    for chunk in result.stdout.split("@@SIM ")[1:]:
+        name, _, body = chunk.partition("\n")
+        states[name.strip()] = parse_restart_probe(body)
+    return states, None
+
+
+def _expected_nrun(spec: RestartSpec, box_text: str) -> Optional[int]:
+    """Cílový počet kroků: ze skenu, jinak 'variable nrun equal N' z box.in."""
+    if spec.expected_nrun is not None:
+        return int(spec.expected_nrun)
+    match = re.search(r"^variable\s+nrun\s+equal\s+(\d+)", box_text, re.MULTILINE)
+    return int(match.group(1)) if match else None
+
+
+def prepare_restart_files(spec: RestartSpec, step: Optional[int], run_text: str, box_text: str
+                          ) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """
+    Файлы продолжения для одной папки: box_cont_<step>.in + run_restart.sh.
+    Без restart-файла – run_restart.sh над box.in (весь прогон заново). Возвращает (files, error).
+    """
+    if not run_text.strip():
+        return None, "run.sh nenalezen"
+    if not box_text.strip():
+        return None, "box.in nenalezen"
+
+    if step is None:
+        # ještě žádný checkpoint – nezbývá než celý běh od read_data
+        input_name, files = "box.in", {}
+    else:
+        expected_nrun = _expected_nrun(spec, box_text)
+        if expected_nrun is None:
+            return None, "V box.in chybí 'variable nrun', nelze spočítat zbývající kroky."
+        nrun_cont = int(expected_nrun) - step
+        if nrun_cont <= 0:
+            return None, f"Simulace už doběhla (krok {step} z {expected_nrun}), restart není potřeba."
+        input_name = f"box_cont_{step}.in"
+        files = {input_name: make_restart_in_from_box(box_text, f"run.restart.{step}", nrun_cont,
+                                                      append_output=True)}
+
+    # densF.dat předchozího běhu se před startem odloží jako segment (viz core.density_profile)
+    files[RESTART_RUN_SCRIPT] = make_restart_run_script(
+        run_text, input_name, node=spec.node, queue=spec.queue, ppn=spec.ppn, mem_gb=spec.mem_gb,
+        walltime=spec.walltime, append_log=step is not None,
+        before_run=segment_rename_command() if step is not None else None)
+    return files, None
+
+
+def _write_files_command(files: Dict[str, str]) -> str:
+    """Часть shell-команды, записывающая небольшие текстовые файлы (base64 – без проблем с кавычками)."""
+    parts = []
+    for name, text in files.items():
+        b64 = base64.b64encode(text.encode("utf-8")).decode("ascii")
+        parts.append(f"printf %s '{b64}' | base64 -d > {shlex.quote(name)}")
+    return " && ".join(parts)
+
+
+def _array_commands(sim_names: List[str], run_text: str, array_name: str, inner_script: str,
+                    index_file: str, **resources) -> List[str]:
+    """Řádky shellu: zapíše index složek a skript job array (make_array_script) a odešle ho (@@ARRAY <id>)."""
+    index = "".join(f"{name}\n" for name in sim_names)
+    script = make_array_script(run_text, index_file, len(sim_names), array_name, inner_script, **resources)
+    return [_write_files_command({index_file: index, f"{array_name}.sh": script}),
+            f'j=$(qsub {array_name}.sh 2>&1) && echo "@@ARRAY $j" || echo "@@ARRAYERR $j"']
+
+
+def parse_job_lines(text: str) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """Строки '@@JOB <sim> <id>' / '@@ERR <sim> <text>' -> {sim: (job_id, error)}."""
+    results: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    for line in text.splitlines():
+        tag, _, rest = line.partition(" ")
+        name, _, value = rest.partition(" ")
+        if tag == "@@JOB":
+            results[name] = (value.strip(), None)
+        elif tag == "@@ERR":
+            results[name] = (None, value.strip() or "neznámá chyba")
+    return results
+
+
+def batch_restart_on_cluster(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                             specs: List[RestartSpec], array: bool = False,
+                             array_name: str = "restart_batch") -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """
+    Пакетное продолжение симуляций с последних контрольных точек:
+      1) один вызов читает restart-шаги, run.sh и box.in всех папок;
+      2) локально готовятся box_cont_<step>.in и run_restart.sh (prepare_restart_files);
+      3) один удалённый bash-скрипт (через stdin) записывает всё и делает qsub для каждой папки –
+         либо, при array=True, один qsub PBS job array над restart_array.idx
+         (все subjoby берут ресурсы первой спецификации).
+    Возвращает {sim: (job_id | None, error | None)} для каждой запрошенной симуляции.
+    """
+    if not specs:
+        return {}
+    results: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    states, error = probe_restart_states(key_path, user_name, host, cluster_sim_path,
+                                         [spec.sim_name for spec in specs])
+    if error is not None:
+        return {spec.sim_name: (None, f"Chyba při čtení složek simulací na clustru:\n{error}") for spec in specs}
+
+    lines = [f'cd "{cluster_sim_path}" || exit 1']
+    prepared = []
+    for spec in specs:
+        if not spec.queue:
+            results[spec.sim_name] = (None, "Pro vybraný node nebyla nalezena fronta (queue).")
+            continue
+        step, run_text, box_text = states.get(spec.sim_name, (None, "", ""))
+        files, error = prepare_restart_files(spec, step, run_text, box_text)
+        if error is not None:
+            results[spec.sim_name] = (None, error)
+            continue
+        prepared.append((spec, run_text, files))
+
+    # PBS nepřijme pole s jediným subjobem – jedna složka jde obyčejným qsub
+    array = array and len(prepared) > 1
+    if array:
+        # index pole se skládá až na clusteru jen ze složek, kde se soubory opravdu zapsaly –
+        # jinak by subjob spustil starý run_restart.sh (nebo žádný)
+        lines.append(f": > {RESTART_ARRAY_INDEX}")
+    for spec, _, files in prepared:
+        name = shlex.quote(spec.sim_name)
+        done = f" && printf '%s\\n' {name} >> {RESTART_ARRAY_INDEX}" if array else ""
+        submit = "" if array else (f' && j=$(qsub {RESTART_RUN_SCRIPT} 2>&1) && echo "@@JOB {spec.sim_name} $j"'
+                                   f' || echo "@@ERR {spec.sim_name} $j"')
+        lines.append(f'((cd {name} && {_write_files_command(files)}{submit}){done}) '
+                     f'|| echo "@@ERR {spec.sim_name} zápis selhal"')
+
+    if array:
+        first, run_text, _ = prepared[0]
+        script = make_array_script(run_text, RESTART_ARRAY_INDEX, len(prepared), array_name, RESTART_RUN_SCRIPT,
+                                   node=first.node, queue=first.queue, ppn=first.ppn, mem_gb=first.mem_gb,
+                                   walltime=first.walltime)
+        # rozsah pole podle zapsaného indexu (-J z příkazové řádky přebije #PBS -J ve skriptu)
+        lines += [_write_files_command({f"{array_name}.sh": script}),
+                  f"n=$(wc -l < {RESTART_ARRAY_INDEX})",
+                  f'if [ "$n" -gt 1 ]; then j=$(qsub -J 0-$((n - 1)) {array_name}.sh 2>&1) '
+                  f'&& echo "@@ARRAY $j" || echo "@@ARRAYERR $j"; '
+                  f'elif [ "$n" -eq 1 ]; then d=$(cat {RESTART_ARRAY_INDEX}); '
+                  f'j=$(cd "$d" && qsub {RESTART_RUN_SCRIPT} 2>&1) && echo "@@JOB $d $j" || echo "@@ERR $d $j"; fi',
+                  f"echo @@INDEX; cat {RESTART_ARRAY_INDEX}"]
+
+    if prepared:
+        result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                            command="bash -s", input="\n".join(lines) + "\n")
+        output, _, index_text = result.stdout.partition("@@INDEX\n")
+        submitted = parse_job_lines(output)
+        array_id = re.search(r"^@@ARRAY (\S+)", output, re.MULTILINE)
+        array_err = re.search(r"^@@ARRAYERR (.*)$", output, re.MULTILINE)
+        # subjob i = i-tý řádek indexu, který na clusteru opravdu vznikl
+        index = {name: i for i, name in enumerate(index_text.splitlines())}
+        for spec, _, _ in prepared:
+            if spec.sim_name in submitted:
+                results[spec.sim_name] = submitted[spec.sim_name]
+            elif array and array_id and spec.sim_name in index:
+                # 123[].server -> 123[i].server pro i-tý subjob
+                results[spec.sim_name] = (array_id.group(1).replace("[]", f"[{index[spec.sim_name]}]"), None)
+            else:
+                msg = (array_err.group(1) if array_err else "") or result.stderr.strip() or "qsub neproběhl"
+                results[spec.sim_name] = (None, msg)
+    return {spec.sim_name: results[spec.sim_name] for spec in specs}
+
+
+def submit_array(key_path: str, user_name: str, host: str, cluster_sim_path: str, sim_names: List[str],
+                 run_text: str, array_name: str = "sweep", inner_script: str = "run.sh",
+                 index_file: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Odešle už nahrané složky (např. body sweepu) jako jeden PBS job array: index složek
+    (<array_name>.idx) a <array_name>.sh se zapíšou do cluster_sim_path, subjob i spustí
+    inner_script v i-té složce. Zdroje PBS bere pole z run_text (hlavička run.sh).
+    Jediná složka jde obyčejným qsub. Vrací (job_id, error).
+    """
+    if not sim_names:
+        return None, "Seznam simulací je prázdný."
+    if len(sim_names) == 1:
+        lines = [f'cd "{cluster_sim_path}"/{shlex.quote(sim_names[0])} || exit 1',
+                 f'j=$(qsub {inner_script} 2>&1) && echo "@@ARRAY $j" || echo "@@ARRAYERR $j"']
+    else:
+        lines = [f'cd "{cluster_sim_path}" || exit 1']
+        lines += _array_commands(sim_names, run_text, array_name, inner_script, index_file or f"{array_name}.idx")
+
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                        command="bash -s", input="\n".join(lines) + "\n")
+    match = re.search(r"^@@ARRAY (\S+)", result.stdout, re.MULTILINE)
+    if match:
+        return match.group(1), None
+    error = re.search(r"^@@ARRAYERR (.*)$", result.stdout, re.MULTILINE)
+    return None, (error.group(1) if error else "") or result.stderr.strip() or "qsub neproběhl"
+
+
+# Řetěz segmentů (qsub -W depend=afterok): každý segment naváže z posledního run.restart.* v době
+# svého startu a skončí sám před walltime (timer timeout) s checkpointem pro další segment.
+CHAIN_INPUT = "box_chain.in"
+CHAIN_START_INPUT = "box_chain_start.in"
+CHAIN_RUN_SCRIPT = "run_chain.sh"
+CHAIN_START_SCRIPT = "run_chain_start.sh"
+CHAIN_TIMEOUT_MARGIN_MIN = 30  # min – rezerva na zápis restartu a úklid před walltime
+
+
+def chain_timeout(walltime: str, margin_min: int = CHAIN_TIMEOUT_MARGIN_MIN) -> str:
+    """'72:00:00' -> '71:30:00' – timeout LAMMPS kousek před walltime fronty."""
+    h, m, sec = (int(x) for x in walltime.split(":"))
+    total = max(60, h * 3600 + m * 60 + sec - margin_min * 60)
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+def _latest_step_guard(nrun: int) -> str:
+    """
+    Shell: segment bez práce (poslední restart už je na nrun nebo je ve složce STOP –
+    profil zkonvergoval, viz request_early_stop) skončí hned a s nulovým kódem.
+    """
+    return ("step=$(ls | sed -n 's/^run[.]restart[.]\\([0-9][0-9]*\\)$/\\1/p' | sort -n | tail -1); "
+            f'if [ "${{step:-0}}" -ge {nrun} ]; then echo "hotovo (krok $step)"; exit 0; fi; '
+            f'if [ -e {STOP_FILE} ]; then echo "zastaveno ({STOP_FILE}, krok $step)"; exit 0; fi')
+
+
+def prepare_chain_files(spec: RestartSpec, step: Optional[int], run_text: str, box_text: str
+                        ) -> Tuple[Optional[Dict[str, str]], Optional[str], Optional[str]]:
+    """
+    Soubory řetězu pro jednu složku -> (files, first_script, error).
+    Bez restartu první segment startuje od read_data (box_chain_start.in), další segmenty
+    vždy z nejnovějšího run.restart.* (box_chain.in, "run ${nrun} upto").
+    """
+    if not run_text.strip():
+        return None, None, "run.sh nenalezen"
+    if not box_text.strip():
+        return None, None, "box.in nenalezen"
+    if not spec.walltime:
+        return None, None, "Pro řetěz segmentů je potřeba walltime."
+    nrun = _expected_nrun(spec, box_text)
+    if nrun is None:
+        return None, None, "V box.in chybí 'variable nrun', nelze spočítat zbývající kroky."
+    if step is not None and step >= nrun:
+        return None, None, f"Simulace už doběhla (krok {step} z {nrun}), restart není potřeba."
+
+    timeout = chain_timeout(spec.walltime)
+    resources = dict(node=spec.node, queue=spec.queue, ppn=spec.ppn, mem_gb=spec.mem_gb, walltime=spec.walltime)
+    # "run ${nrun} upto" – prodloužení (expected_nrun nad nrun z box.in, viz completeness_check) jde přes nrun
+    box_text = re.sub(r"^(variable\s+nrun\s+equal\s+)\d+", rf"\g<1>{nrun}", box_text, count=1, flags=re.MULTILINE)
+    cont_in = make_restart_in_from_box(box_text, "run.restart.*", None, append_output=True)
+    files = {
+        CHAIN_INPUT: add_walltime_guard(cont_in, timeout),
+        CHAIN_RUN_SCRIPT: make_restart_run_script(
+            run_text, CHAIN_INPUT, append_log=True,
+            before_run=f"{_latest_step_guard(nrun)}\n{segment_rename_command()}", **resources),
+    }
+    first_script = CHAIN_RUN_SCRIPT
+    if step is None:
+        files[CHAIN_START_INPUT] = add_walltime_guard(box_text, timeout)
+        files[CHAIN_START_SCRIPT] = make_restart_run_script(run_text, CHAIN_START_INPUT, **resources)
+        first_script = CHAIN_START_SCRIPT
+    return files, first_script, None
+
+
+def submit_restart_chain(key_path: str, user_name: str, host: str, cluster_sim_path: str,
+                         spec: RestartSpec, segments: int) -> Tuple[Optional[List[str]], Optional[str]]:
+    """
+    Odešle simulaci jako řetěz `segments` jobů spojených -W depend=afterok – běh delší než
+    walltime fronty (např. 5M kroků na enp3) doběhne bez ručních restartů.
+    Jedno volání čte stav složky (probe_restart_states), druhé zapíše soubory a odešle celý řetěz.
+    Vrací (job_ids v pořadí segmentů, error).
+    """
+    if not spec.queue:
+        return None, "Pro vybraný node nebyla nalezena fronta (queue)."
+    segments = max(1, int(segments))
+    states, error = probe_restart_states(key_path, user_name, host, cluster_sim_path, [spec.sim_name])
+    if error is not None:
+        return None, f"Chyba při čtení složky simulace na clustru:\n{error}"
+    step, run_text, box_text = states.get(spec.sim_name, (None, "", ""))
+    files, first_script, error = prepare_chain_files(spec, step, run_text, box_text)
+    if error is not None:
+        return None, error
+
+    lines = [f'cd "{cluster_sim_path}"/{shlex.quote(spec.sim_name)} || exit 1',
+             _write_files_command(files) + ' || { echo "@@ERR zápis selhal"; exit 1; }',
+             f'j=$(qsub {first_script} 2>&1) || {{ echo "@@ERR $j"; exit 1; }}',
+             'echo "@@JOB $j"']
+    if segments > 1:
+        lines += [f"for i in $(seq 2 {segments}); do",
+                  f'  j=$(qsub -W depend=afterok:$j {CHAIN_RUN_SCRIPT} 2>&1) || {{ echo "@@ERR $j"; exit 1; }}',
+                  '  echo "@@JOB $j"',
+                  "done"]
+    result = _run_plink(key_path=key_path, user_name=user_name, host=host,
+                        command="bash -s", input="\n".join(lines) + "\n")
+    job_ids = re.findall(r"^@@JOB (\S+)", result.stdout, re.MULTILINE)
+    error = re.search(r"^@@ERR (.*)$", result.stdout, re.MULTILINE)
+    if error or not job_ids:
+        message = (error.group(1) if error else "") or result.stderr.strip() or "qsub neproběhl"
+        if job_ids:
+            message += f"\n(odeslané segmenty: {', '.join(job_ids)})"
+        return None, message
+    return job_ids, None
+
 
 def restart_simulation_on_cluster(key_path: str, user_name: str, host: str, cluster_sim_path: str,
                                   sim_name: str, node: str, queue: str, ppn: int, mem_gb: int,
-                                  last_step: int | None, expected_nrun: int | None):
+                                  last_step: int | None, expected_nrun: int | None,
+                                  walltime: str | None = None):
     """
-      - проверяем входные данные;
-      - переписываем ресурсы в run.sh (nodes, queue, mem);
-      - запускаем qsub run.sh через plink.
-      
+    Продолжение одной симуляции с последней контрольной точки (batch_restart_on_cluster с одной папкой):
+      - номер последнего run.restart.<step>, run.sh и box.in читаются одним вызовом;
+      - nrun_cont = expected_nrun - step (expected_nrun по умолчанию – nrun из box.in);
+      - box_cont_<step>.in (read_restart, без релаксации, log/dump дописываются)
+        и run_restart.sh с новыми ресурсами PBS, затем qsub run_restart.sh – вторым вызовом.
+    Если restart-файла ещё нет (упала до первого restart), запускается box.in с начала, как раньше.
+    last_step из GUI только для сверки – решает последний restart-файл на кластере.
+
           Возвращает:
       None       - если всё ок;
       строку str - с текстом ошибки, если что-то пошло не так
@@ -237,38 +1343,46 @@ def restart_simulation_on_cluster(key_path: str, user_name: str, host: str, clus
         return "Nebyl vybrán žádný node."
     if not queue:
         return "Pro vybraný node nebyla nalezena fronta (queue)."    
-    
-    remote_sim_dir = Path(cluster_sim_path) / sim_name
-    remote_sim_dir_str = str(remote_sim_dir)
-    
-    mem_str = f"{int(mem_gb)}gb"
-
-
-    # Команда, которая выполняется на кластере
-    remote_cmd_parts = [
-        f'cd "{remote_sim_dir_str}"',
-        'if [ ! -f run.sh ]; then echo "run.sh nenalezen"; exit 1; fi',
-        # обновляем узел + ppn
-        f"sed -i 's/^#PBS -l nodes=.*/#PBS -l nodes={node}:ppn={ppn}/' run.sh",
-        # очередь
-        f"sed -i 's/^#PBS -q .*/#PBS -q {queue}/' run.sh",
-        # память
-        f"sed -i 's/^#PBS -l mem=.*/#PBS -l mem={mem_str}/' run.sh",
-        # запуск задания
-        "qsub run.sh",
-    ]
-    
-    remote_cmd = " && ".join(remote_cmd_parts)
-    
-    result = _run_plink(
-        key_path=key_path,
-        user_name=user_name,
-        host=host,
-        command=remote_cmd,
-    )        
-    
-    if result.returncode != 0:
-        msg = result.stderr.strip() or result.stdout.strip() or "neznámá chyba"
-        return f"Chyba při spouštění restartu na clustru:\n{msg}"
-    
+
+    spec = RestartSpec(sim_name, node, queue, ppn, mem_gb, expected_nrun=expected_nrun, walltime=walltime)
+    _, error = batch_restart_on_cluster(key_path, user_name, host, cluster_sim_path, [spec])[sim_name]
+    if error is not None:
+        return f"Chyba při spouštění restartu na clustru:\n{error}"
     return None
+
+
+
+if __name__ == "__main__":
+    # Nahrání složky simulace z .bat (run_all.bat):  python cluster_service.py upload <složka>
+    if len(sys.argv) == 3 and sys.argv[1] == "upload":
+        error = upload_folder_tar(key_path=os.getenv("CLUSTER_KEY_PATH"), user_name=os.getenv("CLUSTER_USERNAME"),
+                                  host=os.getenv("CLUSTER_HOST"), local_folder=Path(sys.argv[2]),
+                                  cluster_sim_path=os.getenv("CLUSTER_SIMULATION_DIR"),
+                                  progress=lambda n: print(f"\r{n / 1024 ** 2:.1f} MB", end="", file=sys.stderr))
+        print(file=sys.stderr)
+        if error is not None:
+            print(f"[ERR] {error}", file=sys.stderr)
+            sys.exit(1)
+
+    # Sweep jako jeden job array:  python cluster_service.py submit-array <sweep_index.txt> [název]
+    # (složky z indexu už musí být nahrané; zdroje PBS se berou z run.sh první složky)
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == "submit-array":
+        index_path = Path(sys.argv[2])
+        names = [line.strip() for line in index_path.read_text().splitlines() if line.strip()]
+        if not names:
+            print(f"[ERR] Index {index_path} je prázdný", file=sys.stderr)
+            sys.exit(1)
+        root = index_path.parent
+        run_texts = [(root / name / "run.sh").read_text() for name in names]
+        headers = {tuple(l for l in text.splitlines() if l.startswith("#PBS") and not l.startswith("#PBS -N"))
+                   for text in run_texts}
+        if len(headers) > 1:
+            print("[WARN] run.sh složek mají různé zdroje PBS, pole použije zdroje první složky", file=sys.stderr)
+        job_id, error = submit_array(key_path=os.getenv("CLUSTER_KEY_PATH"), user_name=os.getenv("CLUSTER_USERNAME"),
+                                     host=os.getenv("CLUSTER_HOST"), cluster_sim_path=os.getenv("CLUSTER_SIMULATION_DIR"),
+                                     sim_names=names, run_text=run_texts[0],
+                                     array_name=sys.argv[3] if len(sys.argv) == 4 else index_path.stem)
+        if error is not None:
+            print(f"[ERR] {error}", file=sys.stderr)
+            sys.exit(1)
+        print(job_id)
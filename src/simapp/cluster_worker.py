@@ -0,0 +1,109 @@
+from __future__ import annotations
+import inspect
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskFuture(QObject):
+    """
+    Результат фоновой операции. Сигналы приходят в GUI-поток (объект создаётся в нём):
+      progress(done, total) – total=0 значит «неизвестно»,
+      finished(result)      – функция вернула результат,
+      failed(text)          – исключение в функции.
+    cancel() – кооперативная отмена: функция, принимающая аргумент cancel, видит
+    cancel.is_set(); в любом случае результат отменённой задачи уже не доставляется.
+    Po ended se QObject smaže (deleteLater) i se spojenými lambdami; uložená reference
+    dál smí používat jen done a cancel() (čistě pythonové atributy).
+    """
+    progress = pyqtSignal(object, object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    ended = pyqtSignal()  # vždy na konci (i po zrušení) – pro počítadlo běžících úloh
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cancel_event = threading.Event()
+        self.done = False
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+
+class _Task(QRunnable):
+    def __init__(self, future: TaskFuture, fn, args, kwargs):
+        super().__init__()
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        future = self.future
+        try:
+            if future.cancelled():
+                return
+            try:
+                result = self.fn(*self.args, **self.kwargs)
+            except Exception:
+                if not future.cancelled():
+                    future.failed.emit(traceback.format_exc(limit=3))
+                return
+            if not future.cancelled():
+                future.finished.emit(result)
+        finally:
+            future.done = True
+            future.ended.emit()
+
+
+class ClusterRunner(QObject):
+    """
+    Запускает блокирующие функции cluster_service / HTTP в пуле потоков Qt.
+    Независимые операции идут параллельно (до max_threads), GUI не блокируется.
+    """
+    # сколько задач сейчас выполняется – для индикатора в статус-баре
+    busy_changed = pyqtSignal(int)
+
+    def __init__(self, max_threads: int = 4, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._running = 0
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, **kwargs) -> TaskFuture:
+        """
+        fn(*args, **kwargs) выполнится в фоне. Если fn принимает аргументы progress/cancel,
+        runner подставит колбэк прогресса и threading.Event отмены.
+        """
+        future = TaskFuture(self)
+        params = inspect.signature(fn).parameters
+        if "progress" in params and "progress" not in kwargs:
+            kwargs["progress"] = lambda done, total=0: future.progress.emit(done, total)
+        if "cancel" in params and "cancel" not in kwargs:
+            kwargs["cancel"] = future.cancel_event
+
+        if on_done is not None:
+            future.finished.connect(on_done)
+        if on_error is not None:
+            future.failed.connect(on_error)
+        if on_progress is not None:
+            future.progress.connect(on_progress)
+        future.ended.connect(self._task_ended)
+        # jinak by každá úloha (vzorkování, qstat každou minutu) zůstala viset na runneru
+        future.ended.connect(future.deleteLater)
+
+        self._running += 1
+        self.busy_changed.emit(self._running)
+        self.pool.start(_Task(future, fn, args, kwargs))
+        return future
+
+    def _task_ended(self):
+        self._running = max(0, self._running - 1)
+        self.busy_changed.emit(self._running)
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
@@ -7,38 +7,174 @@ from core.config_loader import load_config
 from core.particle_generator import generate_particles
 from core.boxin_modifier import modify_boxin
 from core.density_check import check_density
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
 import shutil
 import os
 import yaml
 
-def main():
-    config = load_config(in_src("config", "params.yaml")) #or str(CONFIG/"params.yaml")
+
+def build_simulation(config, decimals_map):
+    """Vytvoří jednu složku simulace (data soubor, density_check, box.in, run.sh, submit_job.sh) a vrátí její název."""
     sim_name = config["simulation_name"]
     output_dir = os.path.join(".", sim_name)
     os.makedirs(output_dir, exist_ok=True) # dovoluju prepis jiz existujici slozky
-    
+
     # 1
     positions = generate_particles(config)
-    
+    if positions is None:
+        raise ValueError(f"Generování částic pro {sim_name} bylo zrušeno (viz výpis výše).")
+
     # 2
     check_density(config, positions, output_dir)
-    
+
     # 3
     template = config["box_template"]
     output_boxin = os.path.join(output_dir, config["box_output"])
-    # Načtení desetinných míst
-    with open(in_src("config", "decimals.yaml")) as f:
-        decimals_map = yaml.safe_load(f)
-        
     modify_boxin(config, template, output_boxin, decimals_map)
 
-    
+
     # 4
     shutil.copy(in_src("scripts", "submit_job.sh"), output_dir)
-    
+    return sim_name
+
+
+def sweep_configs(base_config, grid, name_format=None):
+    """
+    Rozvine mřížku parametrů {klíč: [hodnoty]} na seznam configů (kartézský součin).
+    Název složky se skládá z name_format (str.format s parametry bodu), jinak z
+    base simulation_name + hodnot mřížky. Tečky v názvu se mění na '_' jako v GUI (rho0_6).
+    Pokud se mění fluid_gap a Lz v mřížce není, přepočítá se Lz = fluid_gap + 14 stejně jako v GUI.
+    """
+    keys = list(grid)
+    configs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        point = dict(zip(keys, values))
+        config = dict(base_config)
+        config.update(point)
+        if "fluid_gap" in point and "Lz" not in point:
+            config["Lz"] = int(config["fluid_gap"]) + 14
+
+        if name_format:
+            name = name_format.format(**config)
+        else:
+            name = base_config["simulation_name"] + "".join(f"_{k}{v}" for k, v in point.items())
+        config["simulation_name"] = name.replace(".", "_")
+        configs.append(config)
+    return configs
+
+
+def _sweep_worker(config, decimals_map):
+    """Worker pro ProcessPoolExecutor – vrací záznam do manifestu, chyby nevyhazuje."""
+    try:
+        build_simulation(config, decimals_map)
+        return {"simulation_name": config["simulation_name"], "error": None}
+    except Exception as e:
+        return {"simulation_name": config["simulation_name"], "error": str(e)}
+
+
+def schedule_configs(configs):
+    """
+    Rozmístí body sweepu na nody podle aktuálního zatížení z pbsweb (scheduler.place_batch)
+    a dosadí do configů nodes / queue / ppn / mem_gb / walltime pro run.sh.
+    Vrací {simulation_name: Recommendation | None}.
+    """
+    from pbs_client import PbsWebClient
+    from scheduler import (JobSpec, estimate_atoms, load_cluster_layout, node_states,
+                           place_batch, template_nrun)
+
+    layout = load_cluster_layout()
+    try:
+        source, snapshot = PbsWebClient().load_snapshot()
+    except Exception as e:
+        print(f"[WARN] pbsweb nedostupný ({e}), plánuju bez aktuálního zatížení", file=sys.stderr)
+        source, snapshot = None, None
+
+    jobs = []
+    for config in configs:
+        nrun = template_nrun(in_src("config", config["box_template"])) or 0
+        jobs.append(JobSpec(config["simulation_name"], nrun, estimate_atoms(config)))
+
+    placement = place_batch(jobs, layout, node_states(layout, source, snapshot))
+    for config in configs:
+        rec = placement.get(config["simulation_name"])
+        if rec is not None:
+            config.update(nodes=rec.node, queue=rec.queue, ppn=rec.ppn, mem_gb=rec.mem_gb, walltime=rec.walltime)
+    return placement
+
+
+def run_sweep(base_config, grid, decimals_map, name_format=None, workers=None,
+              manifest_path="sweep_manifest.yaml", schedule=False, index_path="sweep_index.txt"):
+    """
+    Vygeneruje všechny body mřížky paralelně (jeden proces na jádro).
+    schedule=True – před generováním rozmístí joby na nody (schedule_configs).
+    Vrací manifest: [{simulation_name, folder, params, error[, placement]}, ...] a zároveň ho uloží do manifest_path.
+    Do index_path zapíše úspěšné složky (jedna na řádek) – vstup pro
+    `cluster_service.py submit-array`, který celý sweep odešle jako jeden PBS job array.
+    """
+    configs = sweep_configs(base_config, grid, name_format)
+    names = [c["simulation_name"] for c in configs]
+    if len(set(names)) != len(names):
+        raise ValueError("Názvy simulací ve sweepu nejsou jedinečné, uprav 'name' ve sweep souboru.")
+    placement = schedule_configs(configs) if schedule else {}
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_sweep_worker, c, decimals_map) for c in configs]
+        for future in as_completed(futures):
+            res = future.result()
+            results[res["simulation_name"]] = res["error"]
+
+    manifest = []
+    for config in configs:
+        name = config["simulation_name"]
+        manifest.append({
+            "simulation_name": name,
+            "folder": os.path.abspath(name),
+            "params": {k: config[k] for k in grid},
+            "error": results.get(name),
+        })
+        rec = placement.get(name)
+        if rec is not None:
+            manifest[-1]["placement"] = {"node": rec.node, "queue": rec.queue, "ppn": rec.ppn,
+                                         "mem_gb": rec.mem_gb, "walltime": rec.walltime,
+                                         "est_hours": round(rec.est_hours, 1)}
+
+    with open(manifest_path, "w") as f:
+        yaml.dump(manifest, f, sort_keys=False, allow_unicode=True)
+    with open(index_path, "w") as f:
+        f.writelines(f"{item['simulation_name']}\n" for item in manifest if item["error"] is None)
+    return manifest
+
+
+def main():
+    config = load_config(in_src("config", "params.yaml")) #or str(CONFIG/"params.yaml")
+    # Načtení desetinných míst
+    with open(in_src("config", "decimals.yaml")) as f:
+        decimals_map = yaml.safe_load(f)
+
+    # Sweep: python generate_input.py --sweep sweep.yaml
+    #   sweep.yaml:  name: "WCA_H{fluid_gap:g}_rho{rho_fluid:g}_sig{sig12:g}"   (nepovinné)
+    #                grid: {fluid_gap: [10, 13], rho_fluid: [0.6, 0.7], sig12: [1.0, 1.1]}
+    #                schedule: true   (nepovinné – rozmístí joby na nody podle zatížení, viz cluster.yaml)
+    # Odeslání celého sweepu jedním qsub (po nahrání složek):
+    #   python cluster_service.py submit-array sweep_index.txt
+    if len(sys.argv) > 2 and sys.argv[1] == "--sweep":
+        sweep = load_config(sys.argv[2])
+        manifest = run_sweep(config, sweep["grid"], decimals_map, name_format=sweep.get("name"),
+                             workers=sweep.get("workers"), schedule=bool(sweep.get("schedule")))
+        # vypis vsech uspesnych slozek, chyby na stderr
+        for item in manifest:
+            if item["error"] is None:
+                print(item["simulation_name"])
+            else:
+                print(f"[ERR] {item['simulation_name']}: {item['error']}", file=sys.stderr)
+        return
+
+    sim_name = build_simulation(config, decimals_map)
 
     # 5. Vypis nazvu slozky simulace (pro .bat soubor)
     print(sim_name)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from pbs_parser import NodeLoad
+
+DEFAULT_INTERVAL = 300          # s – jak často sampler bere snapshot z pbsweb
+RAW_RETENTION = 2 * 86400       # s – syrové vzorky; starší se slučují do hodinových průměrů
+HOURLY_RETENTION = 60 * 86400   # s – hodinové průměry; starší se mažou
+COMPACT_EVERY = 3600            # s
+
+_FIELDS = ("jobs", "cpus", "mem", "cpu_pct")
+
+
+def default_history_path() -> Path:
+    path = os.getenv("LOAD_HISTORY_PATH") or Path.home() / ".cache" / "simapp" / "node_load.sqlite"
+    return Path(path)
+
+
+def default_interval() -> float:
+    return float(os.getenv("LOAD_SAMPLE_INTERVAL") or DEFAULT_INTERVAL)
+
+
+def node_capacity(node_to_queue: Dict[str, str], queue_cpus: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    {node: počet jader} z .env NODE_CPUS ve tvaru '<fronta|noda>:<ncpus>,...' (ncpus z pbsnodes) –
+    klíčem je fronta (platí pro všechny její nody) nebo konkrétní node.
+    queue_cpus – výchozí hodnoty podle fronty (cluster.yaml), NODE_CPUS je přepisuje.
+    """
+    per_key: Dict[str, int] = {k: int(v) for k, v in (queue_cpus or {}).items() if v}
+    for item in (os.getenv("NODE_CPUS") or "").split(","):
+        key, _, cores = item.partition(":")
+        if key.strip() and cores.strip().isdigit():
+            per_key[key.strip()] = int(cores)
+    capacity = {}
+    for node, queue in node_to_queue.items():
+        cores = per_key.get(node, per_key.get(queue))
+        if cores:
+            capacity[node] = cores
+    return capacity
+
+
+@dataclass
+class NodeHistory:
+    """Сводка по истории загрузки узла за окно (среднее взвешено по числу сырых замеров)."""
+    samples: int = 0
+    avg_jobs: Optional[float] = None
+    avg_cpus: Optional[float] = None       # занятые CPU
+    avg_mem: Optional[float] = None        # GB
+    avg_cpu_pct: Optional[float] = None
+    avg_free_cpus: Optional[float] = None  # только если известна ёмкость узла
+    series: List[Optional[float]] = field(default_factory=list)  # занятые CPU по корзинам окна
+
+
+class LoadHistory:
+    """
+    Компактное локальное хранилище временных рядов загрузки узлов (SQLite).
+    Сырые замеры живут RAW_RETENTION, затем сворачиваются в часовые средние,
+    которые живут HOURLY_RETENTION.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path is not None else default_history_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._compacted_at = 0.0
+        with self._conn:
+            for table in ("samples", "hourly"):
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    " node TEXT NOT NULL, ts INTEGER NOT NULL,"
+                    " jobs REAL, cpus REAL, mem REAL, cpu_pct REAL,"
+                    " n INTEGER NOT NULL DEFAULT 1,"
+                    " PRIMARY KEY (node, ts)) WITHOUT ROWID")
+
+    # --- запись ---
+    def record(self, snapshot: Dict[str, NodeLoad], source: str,
+               nodes: Iterable[str] = (), ts: Optional[float] = None) -> int:
+        """
+        Сохраняет снимок. Для source='jobs' узлы из nodes, которых нет в снимке,
+        записываются как свободные (на /jobs видны только узлы с running-joby).
+        Возвращает число записанных узлов.
+        """
+        ts = int(ts if ts is not None else time.time())
+        rows = []
+        for node, load in snapshot.items():
+            if source == "nodes":
+                rows.append((node, ts, None, None, None, load.cpu_pct))
+            else:
+                rows.append((node, ts, load.jobs, load.cpus, load.mem, None))
+        if source == "jobs":
+            rows.extend((node, ts, 0, 0.0, 0.0, None) for node in nodes if node not in snapshot)
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO samples (node, ts, jobs, cpus, mem, cpu_pct) VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+        if time.time() - self._compacted_at > COMPACT_EVERY:
+            self.compact()
+        return len(rows)
+
+    def compact(self, now: Optional[float] = None) -> None:
+        """Сворачивает старые сырые замеры в часовые средние и удаляет всё, что старше ретенции."""
+        now = time.time() if now is None else now
+        # hranice zarovnaná na celou hodinu – každá hodina se sloučí najednou a jen jednou
+        cutoff = int(now - RAW_RETENTION) // 3600 * 3600
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hourly (node, ts, jobs, cpus, mem, cpu_pct, n)"
+                " SELECT node, (ts / 3600) * 3600 AS hour, AVG(jobs), AVG(cpus), AVG(mem), AVG(cpu_pct), COUNT(*)"
+                " FROM samples WHERE ts < ? GROUP BY node, hour", (cutoff,))
+            self._conn.execute("DELETE FROM samples WHERE ts < ?", (cutoff,))
+            self._conn.execute("DELETE FROM hourly WHERE ts < ?", (int(now - HOURLY_RETENTION),))
+        self._compacted_at = now
+
+    # --- чтение ---
+    def history(self, node: str, since: float) -> List[Tuple[int, Optional[float], Optional[float],
+                                                            Optional[float], Optional[float], int]]:
+        """[(ts, jobs, cpus, mem, cpu_pct, n)] po čase – hodinové průměry i syrové vzorky."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT ts, jobs, cpus, mem, cpu_pct, n FROM hourly WHERE node = ? AND ts >= ?"
+                " UNION ALL"
+                " SELECT ts, jobs, cpus, mem, cpu_pct, n FROM samples WHERE node = ? AND ts >= ?"
+                " ORDER BY ts", (node, int(since), node, int(since)))
+            return cur.fetchall()
+
+    def summary(self, nodes: Iterable[str], window: float = 86400,
+                capacity: Optional[Dict[str, int]] = None, buckets: int = 24,
+                now: Optional[float] = None) -> Dict[str, NodeHistory]:
+        """
+        {node: NodeHistory} za posledních window sekund.
+        capacity – {node: počet jader}; bez něj se volné CPU nepočítají a vzorky z /nodes
+        (jen procenta) se do obsazených CPU nepřepočítají.
+        """
+        now = time.time() if now is None else now
+        since = now - window
+        result: Dict[str, NodeHistory] = {}
+        for node in nodes:
+            cores = (capacity or {}).get(node)
+            sums = dict.fromkeys(_FIELDS, 0.0)
+            weights = dict.fromkeys(_FIELDS, 0)
+            bucket_sum = [0.0] * buckets
+            bucket_n = [0] * buckets
+            total = 0
+            for ts, jobs, cpus, mem, cpu_pct, n in self.history(node, since):
+                total += n
+                if cpus is None and cpu_pct is not None and cores:
+                    cpus = cpu_pct / 100.0 * cores
+                for name, value in zip(_FIELDS, (jobs, cpus, mem, cpu_pct)):
+                    if value is not None:
+                        sums[name] += value * n
+                        weights[name] += n
+                if cpus is not None:
+                    idx = min(buckets - 1, max(0, int((ts - since) / window * buckets)))
+                    bucket_sum[idx] += cpus * n
+                    bucket_n[idx] += n
+
+            avg = {name: (sums[name] / weights[name] if weights[name] else None) for name in _FIELDS}
+            free = None
+            if cores and avg["cpus"] is not None:
+                free = max(0.0, cores - avg["cpus"])
+            result[node] = NodeHistory(
+                samples=total, avg_jobs=avg["jobs"], avg_cpus=avg["cpus"], avg_mem=avg["mem"],
+                avg_cpu_pct=avg["cpu_pct"], avg_free_cpus=free,
+                series=[s / c if c else None for s, c in zip(bucket_sum, bucket_n)])
+        return result
+
+    def close(self):
+        self._conn.close()
@@ -3,6 +3,18 @@ from pathlib import Path
 
 UI_DIR = Path(__file__).resolve().parents[2] / "ui"
 
+_SPARK = "▁▂▃▄▅▆▇█"
+
+
+def _sparkline(series, vmax=None) -> str:
+    """Мини-график занятых CPU по корзинам; пустые корзины – пробел."""
+    values = [v for v in series if v is not None]
+    if not values:
+        return ""
+    top = vmax or max(values) or 1.0
+    return "".join(" " if v is None else _SPARK[min(len(_SPARK) - 1, int(v / top * (len(_SPARK) - 1) + 0.5))]
+                   for v in series)
+
 
 class NodeSelectionDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -32,11 +44,15 @@ class NodeSelectionDialog(QtWidgets.QDialog):
         self._selected_mem_gb: int | None = None
 
     def set_data(self, nodes: list[str], node_max_days: dict[str, int] | None,
-                 node_load: dict[str, str] | None):
+                 node_load: dict[str, str] | None, node_history: dict | None = None,
+                 capacity: dict[str, int] | None = None, recommendation=None):
         """
         nodes        – список нодов
         node_max_days – {node: max_days} или None
         node_load     – {node: 'описание нагрузки'} или None
+        node_history  – {node: NodeHistory} из LoadHistory.summary или None
+        capacity      – {node: počet jader} pro měřítko grafu nebo None
+        recommendation – scheduler.Recommendation: předvybere nodu, ppn a paměť
         """
         self.tableNodes.setRowCount(len(nodes))
 
@@ -58,10 +74,30 @@ class NodeSelectionDialog(QtWidgets.QDialog):
                 load_text = node_load.get(node, "")
             self.tableNodes.setItem(row, 2, QtWidgets.QTableWidgetItem(load_text))
 
+            # колонки 3–4: průměr a průběh za posledních 24 h
+            history = node_history.get(node) if node_history is not None else None
+            free_text, spark = "—", ""
+            if history is not None and history.samples:
+                if history.avg_free_cpus is not None:
+                    free_text = f"{history.avg_free_cpus:.0f}"
+                elif history.avg_cpus is not None:
+                    free_text = f"? (obsazeno {history.avg_cpus:.0f})"
+                elif history.avg_cpu_pct is not None:
+                    free_text = f"{100 - history.avg_cpu_pct:.0f} %"
+                spark = _sparkline(history.series, (capacity or {}).get(node))
+            self.tableNodes.setItem(row, 3, QtWidgets.QTableWidgetItem(free_text))
+            self.tableNodes.setItem(row, 4, QtWidgets.QTableWidgetItem(spark))
+
         self.tableNodes.resizeColumnsToContents()
 
-        # по умолчанию выбираем первую строку
-        if nodes:
+        # по умолчанию выбираем рекомендованную ноду, иначе первую строку
+        if recommendation is not None and recommendation.node in nodes:
+            self.tableNodes.selectRow(nodes.index(recommendation.node))
+            self.spinPpn.setValue(recommendation.ppn)
+            self.spinMemGb.setMaximum(max(self.spinMemGb.maximum(), recommendation.mem_gb))
+            self.spinMemGb.setValue(recommendation.mem_gb)
+            self.label.setText(f"Doporučeno: {recommendation.reason}")
+        elif nodes:
             self.tableNodes.selectRow(0)
 
     def _on_accept(self):
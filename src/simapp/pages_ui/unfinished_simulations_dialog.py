@@ -16,6 +16,9 @@ class UnfinishedSimulationsDialog(QtWidgets.QDialog):
         header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
         header.setStretchLastSection(True)  # последний столбец тянется, чтобы не было пустоты
         self.tableUnfinished.setAlternatingRowColors(True)
+        # víc řádků najednou (Ctrl/Shift) – hromadný restart
+        self.tableUnfinished.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.tableUnfinished.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         # 2) Кнопки (имена задай в .ui)
         self.closeButton.clicked.connect(self.reject)   # или self.close
         self.actionButton.clicked.connect(self.on_action_button_clicked)
@@ -24,6 +27,8 @@ class UnfinishedSimulationsDialog(QtWidgets.QDialog):
         self.selected_folder: str | None = None
         self.selected_last_step: int | None = None
         self.selected_expected_nrun: int | None = None
+        # všechny vybrané řádky: [(folder, last_step | None, expected_nrun | None), ...]
+        self.selected_rows: list[tuple[str, int | None, int | None]] = []
 
 
     def set_data(self, rows):
@@ -44,37 +49,35 @@ class UnfinishedSimulationsDialog(QtWidgets.QDialog):
 
 
 
-    def on_action_button_clicked(self):
-        """Забираем выбранную строку и закрываем диалог с Accepted."""
-        row = self.tableUnfinished.currentRow()
-        
-        if row < 0:
-            QtWidgets.QMessageBox.warning(self, "Výběr simulace", "Vyber prosím jednu simulaci v tabulce.")
-            return
-    
-        folder_item = self.tableUnfinished.item(row, 0)
-        last_item = self.tableUnfinished.item(row, 1)
-        expected_item = self.tableUnfinished.item(row, 2)
-        
-        if folder_item is None or expected_item is None:
-            QtWidgets.QMessageBox.warning(self, "Chyba", "Vybraný řádek je neplatný.")
-            return
-        
-        self.selected_folder = folder_item.text()
-        
-        # проверяем если вообще симуляция прошла до первой записи рестарта
-        last_text = last_item.text() if last_item is not None else "-"
-        if last_text in ("", "-"):
-            self.selected_last_step = None
-        else:
-            try:
-                self.selected_last_step = int(last_text)
-            except ValueError:
-                self.selected_last_step = None
-                
+    @staticmethod
+    def _int_or_none(item):
+        text = item.text() if item is not None else ""
         try:
-            self.selected_expected_nrun = int(expected_item.text())
+            return int(text)
         except ValueError:
-            self.selected_expected_nrun = None
+            return None  # "—" – simulace ještě nedošla k prvnímu restartu
+
+    def on_action_button_clicked(self):
+        """Забираем выбранные строки и закрываем диалог с Accepted."""
+        rows = sorted({index.row() for index in self.tableUnfinished.selectionModel().selectedRows()})
+        if not rows and self.tableUnfinished.currentRow() >= 0:
+            rows = [self.tableUnfinished.currentRow()]
+
+        if not rows:
+            QtWidgets.QMessageBox.warning(self, "Výběr simulace", "Vyber prosím alespoň jednu simulaci v tabulce.")
+            return
+
+        selected = []
+        for row in rows:
+            folder_item = self.tableUnfinished.item(row, 0)
+            if folder_item is None or self.tableUnfinished.item(row, 2) is None:
+                QtWidgets.QMessageBox.warning(self, "Chyba", "Vybraný řádek je neplatný.")
+                return
+            selected.append((folder_item.text(),
+                             self._int_or_none(self.tableUnfinished.item(row, 1)),
+                             self._int_or_none(self.tableUnfinished.item(row, 2))))
 
-        self.accept()
\ No newline at end of file
+        self.selected_rows = selected
+        # první vybraný řádek – pro restart jedné simulace
+        self.selected_folder, self.selected_last_step, self.selected_expected_nrun = selected[0]
+        self.accept()
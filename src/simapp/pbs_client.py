@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pbs_parser import NodeLoad, parse_jobs_page, parse_nodes_page
+
+DEFAULT_BASE_URL = "https://pbsweb.enputron.ujep.cz/statuspbs"
+DEFAULT_TTL = 30.0            # s – jak dlouho se stránka bere z cache bez dotazu na server
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) s – pomalý pbsweb nesmí zablokovat GUI
+
+_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+               "AppleWebKit/537.36 (KHTML, like Gecko) "
+               "Chrome/122.0.0.0 Safari/537.36")
+
+
+class PbsWebClient:
+    """
+    Общий HTTP-клиент для страниц статуса pbsweb:
+      - одна requests.Session (keep-alive, пул соединений),
+      - условный GET (ETag / If-Modified-Since) – при 304 страница не скачивается и не парсится заново,
+      - TTL-кэш уже разобранных страниц,
+      - явные таймауты; если сервер не отвечает, отдаётся последняя удачная версия.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, ttl: Optional[float] = None,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT):
+        self.base_url = (base_url or os.getenv("PBSWEB_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.ttl = float(os.getenv("PBSWEB_TTL") or DEFAULT_TTL) if ttl is None else ttl
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = _USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # page -> {"fetched_at", "etag", "last_modified", "parsed"}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_page(self, page: str, parser: Callable[[str], Any]) -> Any:
+        """Вернуть разобранную страницу (parser(html)) – из кэша, если она моложе ttl."""
+        with self._lock:
+            entry = self._cache.get(page)
+            if entry is not None and time.time() - entry["fetched_at"] < self.ttl:
+                return entry["parsed"]
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self.session.get(f"{self.base_url}/{page}", headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                with self._lock:
+                    entry["fetched_at"] = time.time()
+                return entry["parsed"]
+            response.raise_for_status()
+        except requests.RequestException:
+            if entry is not None:
+                return entry["parsed"]  # lepší starší data než zamrzlé okno
+            raise
+
+        parsed = parser(response.text)
+        with self._lock:
+            self._cache[page] = {
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "parsed": parsed,
+            }
+        return parsed
+
+    def load_snapshot(self) -> Tuple[Optional[str], Optional[Dict[str, NodeLoad]]]:
+        """
+        Снимок загрузки всех узлов: сначала старая таблица /nodes, если её нет – /jobs.
+        Возвращает (source, {node: NodeLoad}), source – 'nodes' или 'jobs'; (None, None) если ничего.
+        """
+        snapshot = self.get_page("nodes", parse_nodes_page)
+        if snapshot is not None:
+            return "nodes", snapshot
+        snapshot = self.get_page("jobs", parse_jobs_page)
+        if snapshot is not None:
+            return "jobs", snapshot
+        return None, None
+
+    def invalidate(self, page: Optional[str] = None):
+        """Сбросить TTL (ETag остаётся – следующий запрос всё равно может получить 304)."""
+        with self._lock:
+            pages = [page] if page is not None else list(self._cache)
+            for name in pages:
+                if name in self._cache:
+                    self._cache[name]["fetched_at"] = 0.0
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,219 @@
+# pbs_jobs.py
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import json
+import os
+import posixpath
+
+DEFAULT_POLL_INTERVAL = 60  # s
+
+# PBS job_state -> stav pro GUI
+_ACTIVE = {"Q": "queued", "H": "held", "W": "queued", "T": "queued", "M": "queued",
+           "R": "running", "E": "running", "B": "running", "S": "running", "U": "running"}
+_TERMINAL = {"F", "X"}
+
+
+def default_poll_interval() -> float:
+    return float(os.getenv("JOB_POLL_INTERVAL") or DEFAULT_POLL_INTERVAL)
+
+
+@dataclass
+class JobRecord:
+    """Один job из `qstat -f` (text nebo -F json)."""
+    job_id: str
+    name: str = ""
+    state: str = ""                       # PBS job_state: Q, R, H, E, F, X, ...
+    queue: Optional[str] = None
+    node: Optional[str] = None            # první host z exec_host
+    workdir: Optional[str] = None         # PBS_O_WORKDIR
+    folder: Optional[str] = None          # složka simulace (relativně k cluster_sim_path)
+    exit_status: Optional[int] = None
+    walltime_used: Optional[str] = None
+    walltime: Optional[str] = None        # Resource_List.walltime
+    array_index: Optional[int] = None
+
+    @property
+    def status(self) -> str:
+        """queued / held / running / finished / failed."""
+        if self.state in _TERMINAL:
+            return "finished" if self.exit_status in (0, None) else "failed"
+        return _ACTIVE.get(self.state, "queued")
+
+    @property
+    def active(self) -> bool:
+        return self.state not in _TERMINAL
+
+
+@dataclass
+class JobChange:
+    """Změna stavu jobu mezi dvěma dotazy: kind – new / running / finished / failed."""
+    kind: str
+    job: JobRecord
+
+
+def _nested(flat: Dict[str, str]) -> Dict[str, Any]:
+    """{'Resource_List.walltime': ..} -> {'Resource_List': {'walltime': ..}} (jako -F json)."""
+    data: Dict[str, Any] = {}
+    for key, value in flat.items():
+        head, dot, tail = key.partition(".")
+        if dot:
+            data.setdefault(head, {})[tail] = value
+        else:
+            data[key] = value
+    return data
+
+
+def parse_qstat_text(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Разбирает текстовый `qstat -f`: блоки 'Job Id: ...', строки 'klíč = hodnota',
+    pokračování dlouhých hodnot začínají tabulátorem.
+    Возвращает {job_id: attrs} ve stejném tvaru jako "Jobs" z `qstat -F json`.
+    """
+    jobs: Dict[str, Dict[str, Any]] = {}
+    job_id, attrs, key = None, {}, None
+    for line in text.splitlines():
+        if line.startswith("Job Id:"):
+            if job_id is not None:
+                jobs[job_id] = _nested(attrs)
+            job_id, attrs, key = line.split(":", 1)[1].strip(), {}, None
+        elif line.startswith("\t") and key is not None:
+            attrs[key] += line.strip()
+        elif " = " in line and job_id is not None:
+            key, _, value = line.strip().partition(" = ")
+            attrs[key] = value
+    if job_id is not None:
+        jobs[job_id] = _nested(attrs)
+    return jobs
+
+
+def parse_qstat_json(text: str) -> Dict[str, Dict[str, Any]]:
+    """`qstat -f -F json` -> {job_id: attrs}."""
+    return json.loads(text).get("Jobs") or {}
+
+
+def _variables(value) -> Dict[str, str]:
+    """Variable_List: slovník (-F json) nebo 'A=1,B=2' (text)."""
+    if isinstance(value, dict):
+        return value
+    pairs = (item.partition("=") for item in (value or "").split(","))
+    return {k: v for k, _, v in pairs if k}
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def job_record(job_id: str, attrs: Dict[str, Any], cluster_sim_path: Optional[str] = None) -> JobRecord:
+    """
+    attrs z qstat -> JobRecord. Složka simulace = PBS_O_WORKDIR relativně ke cluster_sim_path
+    (qsub se volá ve složce simulace); pole odeslaná z cluster_sim_path složku neznají.
+    """
+    workdir = _variables(attrs.get("Variable_List")).get("PBS_O_WORKDIR")
+    folder = None
+    if workdir and cluster_sim_path:
+        root = posixpath.basename(cluster_sim_path.rstrip("/"))
+        parts = workdir.rstrip("/").split("/")
+        # cluster_sim_path bývá '~/simulations' – porovnává se podle posledního dílu cesty
+        if root in parts[:-1]:
+            folder = "/".join(parts[len(parts) - parts[::-1].index(root):])
+    exec_host = attrs.get("exec_host") or ""
+    return JobRecord(
+        job_id=job_id,
+        name=attrs.get("Job_Name", ""),
+        state=attrs.get("job_state", ""),
+        queue=attrs.get("queue"),
+        node=exec_host.split("/", 1)[0].split("+", 1)[0] or None,
+        workdir=workdir,
+        folder=folder,
+        exit_status=_int_or_none(attrs.get("Exit_status")),
+        walltime_used=(attrs.get("resources_used") or {}).get("walltime"),
+        walltime=(attrs.get("Resource_List") or {}).get("walltime"),
+        array_index=_int_or_none(attrs.get("array_index")),
+    )
+
+
+def parse_qstat(text: str, cluster_sim_path: Optional[str] = None) -> Dict[str, JobRecord]:
+    """Výstup qstat -f (json, pokud začíná '{', jinak text) -> {job_id: JobRecord}."""
+    stripped = text.lstrip()
+    raw = parse_qstat_json(stripped) if stripped.startswith("{") else parse_qstat_text(text)
+    return {job_id: job_record(job_id, attrs, cluster_sim_path) for job_id, attrs in raw.items()}
+
+
+def _short_id(job_id: str) -> str:
+    """'123[4].server' -> '123[4]' – qsub vrací id se serverem, qstat -x někdy bez."""
+    return job_id.split(".", 1)[0]
+
+
+class JobMonitor:
+    """
+    Последнее известное состояние наших jobů; update() vrací jen změny proti minulému dotazu.
+    Volá se z GUI vlákna (on_done), proto bez zámků.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, JobRecord] = {}
+        self._folders: Dict[str, str] = {}   # short id -> složka (joby odeslané z aplikace, subjoby polí)
+        self._initialized = False
+
+    def register(self, job_id: str, folder: str) -> None:
+        """Zapamatovat složku jobu odeslaného z aplikace (hlavně subjoby polí, kde PBS_O_WORKDIR nepomůže)."""
+        self._folders[_short_id(job_id)] = folder
+
+    def update(self, records: Dict[str, JobRecord]) -> List[JobChange]:
+        changes: List[JobChange] = []
+        seen = set()
+        for job_id, job in records.items():
+            key = _short_id(job_id)
+            seen.add(key)
+            if job.folder is None:
+                job.folder = self._folders.get(key)
+            old = self.jobs.get(key)
+            if old is None:
+                # historie (-x) při prvním dotazu není změna; později je hotový job v historii nový
+                if job.active:
+                    changes.append(JobChange("new" if job.status in ("queued", "held") else "running", job))
+                elif self._initialized:
+                    changes.append(JobChange(job.status, job))
+            elif old.status != job.status and job.status in ("running", "finished", "failed"):
+                changes.append(JobChange(job.status, job))
+            self.jobs[key] = job
+
+        # bez historie (-x) job z qstat zmizí – aktivní job tedy skončil (exit neznámý)
+        for key in list(self.jobs):
+            if key not in seen:
+                job = self.jobs.pop(key)
+                if job.active:
+                    job.state = "F"
+                    changes.append(JobChange("finished", job))
+        self._initialized = True
+        return changes
+
+    def active_jobs(self) -> List[JobRecord]:
+        return [job for job in self.jobs.values() if job.active]
+
+
+def _progress_text(progress) -> str:
+    """Progress (cluster_service.read_progress) -> 'production 1.2M/5M, ETA 3.1 h'."""
+    if progress is None:
+        return "—"
+    text = f"{progress.phase} {progress.step / 1e6:.2f}M"
+    if progress.target:
+        text += f"/{progress.target / 1e6:.2f}M"
+    if progress.eta_s:
+        text += f", ETA {progress.eta_s / 3600:.1f} h"
+    return text
+
+
+def format_jobs(jobs: List[JobRecord], progress: Optional[Dict[str, Any]] = None) -> str:
+    """Tabulka jobů pro GUI (pevná šířka sloupců); progress – {folder: Progress} z progress.dat."""
+    lines = [f"{'Job':<16} {'Složka':<28} {'Stav':<9} {'Noda':<8} {'Walltime':<21} Průběh"]
+    for job in sorted(jobs, key=lambda j: j.job_id):
+        used = f"{job.walltime_used or '—'} / {job.walltime or '—'}"
+        step = _progress_text((progress or {}).get(job.folder)) if job.folder else "—"
+        lines.append(f"{_short_id(job.job_id):<16} {(job.folder or job.name)[:28]:<28} "
+                     f"{job.status:<9} {job.node or '—':<8} {used:<21} {step}")
+    return "\n".join(lines)
@@ -1,54 +1,72 @@
 # pbs_parser.py
 from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Optional
+import re
 from bs4 import BeautifulSoup
 
+try:
+    import lxml  # noqa: F401  – быстрый парсер, если установлен
+    _HTML_PARSER = "lxml"
+except ImportError:
+    _HTML_PARSER = "html.parser"
 
-def parse_node_load_from_nodes(html: str, node: str) -> str | None:
+
+@dataclass
+class NodeLoad:
+    """Загрузка одного узла по данным pbsweb."""
+    jobs: int = 0
+    cpus: float = 0.0          # занятые CPU (из /jobs)
+    mem: float = 0.0           # занятая память, GB (из /jobs)
+    cpu_pct: Optional[float] = None   # загрузка CPU в % (из /nodes, если есть)
+    cpu_text: Optional[str] = None    # сырой текст колонки CPU со страницы /nodes
+
+
+def _status_table(html: str):
+    soup = BeautifulSoup(html, _HTML_PARSER)
+    return soup.find("table", {"class": "status"})
+
+
+def _host_name(entry: str) -> str:
+    """'node10[0]' / 'node10/3' -> 'node10'."""
+    return re.split(r"[\[/]", entry, 1)[0]
+
+
+def parse_nodes_page(html: str) -> Dict[str, NodeLoad] | None:
     """
-    Разбирает страницу /nodes и пытается найти загрузку CPU для заданного node.
-    Возвращает строку вида 'Zatížení CPU: ...' либо None, если таблица не найдена
-    или нужный узел отсутствует.
+    Разбирает страницу /nodes один раз для всех узлов.
+    Возвращает {node: NodeLoad(cpu_text, cpu_pct)} либо None, если таблицы нет.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table", {"class": "status"})
+    table = _status_table(html)
     if table is None:
         return None
 
-    rows = table.find_all("tr")
-    for row in rows:
+    snapshot: Dict[str, NodeLoad] = {}
+    for row in table.find_all("tr"):
         cols = row.find_all("td")
         if len(cols) < 5:
             continue
         name = cols[0].get_text(strip=True)
-        if name == node:
-            cpu_usage = cols[2].get_text(strip=True)
-            return f"Zatížení CPU: {cpu_usage}"
-
-    return "Informace nenalezena"
+        cpu_usage = cols[2].get_text(strip=True)
+        match = re.search(r"[\d.]+", cpu_usage)
+        cpu_pct = float(match.group()) if match and "%" in cpu_usage else None
+        snapshot[name] = NodeLoad(cpu_pct=cpu_pct, cpu_text=cpu_usage)
+    return snapshot
 
 
-def parse_node_load_from_jobs(html: str, node: str) -> str | None:
+def parse_jobs_page(html: str) -> Dict[str, NodeLoad] | None:
     """
-    Разбирает страницу /jobs и оценивает загрузку выбранного узла:
-    - сколько running-jobů на этой ноде
+    Разбирает страницу /jobs один раз и суммирует по всем узлам:
+    - сколько running-jobů на узле
     - примерное количество занятых CPU
     - примерное количество занятой памяти (GB)
-
-    Возвращает строку вида:
-        'Zatížení: X jobů, Y CPU, Z GB RAM'
-    либо
-        'Nic neběží.'
-    либо None, если таблица не найдена.
+    Узлы без running-jobů в словаре отсутствуют. None, если таблица не найдена.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table", {"class": "status"})
+    table = _status_table(html)
     if table is None:
         return None
 
-    jobs_on_node = 0
-    cpus_on_node = 0.0
-    mem_on_node = 0.0
-
+    snapshot: Dict[str, NodeLoad] = {}
     # пропускаем строку-заголовок <tr><th>...</th></tr>
     for row in table.find_all("tr")[1:]:
         cols = row.find_all("td")
@@ -59,12 +77,6 @@ def parse_node_load_from_jobs(html: str, node: str) -> str | None:
         if job_state.lower() != "running":
             continue
 
-        exec_hosts = cols[13].get_text(strip=True)
-        if node not in exec_hosts:
-            continue
-
-        jobs_on_node += 1
-
         # CPU колонка формат "72 |72"
         cpu_text = cols[4].get_text(strip=True)
         used_cpus = None
@@ -87,20 +99,54 @@ def parse_node_load_from_jobs(html: str, node: str) -> str | None:
                     used_mem = 0.0
 
         # Exec Hosts: "node10[0] node10[1]" – делим ресурсы поровну между всеми хостами
-        hosts = [h for h in exec_hosts.split() if h.strip()]
+        hosts = [_host_name(h) for h in cols[13].get_text(strip=True).split() if h.strip()]
         n_hosts = max(len(hosts), 1)
 
-        if used_cpus is not None:
-            cpus_on_node += used_cpus / n_hosts
-        mem_on_node += used_mem / n_hosts
+        for node in set(hosts):
+            share = hosts.count(node) / n_hosts
+            load = snapshot.setdefault(node, NodeLoad())
+            load.jobs += 1
+            if used_cpus is not None:
+                load.cpus += used_cpus * share
+            load.mem += used_mem * share
+
+    return snapshot
 
-    if jobs_on_node == 0:
-        return "Nic neběží."
 
-    cpus_on_node_int = int(round(cpus_on_node))
-    mem_on_node_rounded = round(mem_on_node, 1)
+def format_node_load(load: NodeLoad | None, source: str) -> str:
+    """Текст для GUI в прежнем формате; source – 'nodes' или 'jobs'."""
+    if source == "nodes":
+        if load is None or load.cpu_text is None:
+            return "Informace nenalezena"
+        return f"Zatížení CPU: {load.cpu_text}"
 
+    if load is None or load.jobs == 0:
+        return "Nic neběží."
     return (
-        f"Zatížení: {jobs_on_node} jobů, "
-        f"{cpus_on_node_int} CPU, {mem_on_node_rounded} GB RAM"
-    )
\ No newline at end of file
+        f"Zatížení: {load.jobs} jobů, "
+        f"{int(round(load.cpus))} CPU, {round(load.mem, 1)} GB RAM"
+    )
+
+
+def parse_node_load_from_nodes(html: str, node: str) -> str | None:
+    """
+    Разбирает страницу /nodes и пытается найти загрузку CPU для заданного node.
+    Возвращает строку вида 'Zatížení CPU: ...' либо None, если таблица не найдена.
+    Для нескольких узлов лучше один раз вызвать parse_nodes_page.
+    """
+    snapshot = parse_nodes_page(html)
+    if snapshot is None:
+        return None
+    return format_node_load(snapshot.get(node), "nodes")
+
+
+def parse_node_load_from_jobs(html: str, node: str) -> str | None:
+    """
+    Разбирает страницу /jobs и оценивает загрузку выбранного узла.
+    Возвращает строку вида 'Zatížení: X jobů, Y CPU, Z GB RAM', 'Nic neběží.'
+    либо None, если таблица не найдена. Для нескольких узлов – parse_jobs_page.
+    """
+    snapshot = parse_jobs_page(html)
+    if snapshot is None:
+        return None
+    return format_node_load(snapshot.get(node), "jobs")
@@ -0,0 +1,130 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_TTL = 300  # s
+
+_COLUMNS = ("folder", "nrun", "last_step", "log_size", "log_mtime", "densF_size", "densF_mtime",
+            "conv_status", "conv_step", "conv_more", "conv_err")
+# sloupce přidané později – starší databáze se doplní přes ALTER TABLE
+_ADDED_COLUMNS = {"conv_status": "TEXT", "conv_step": "INTEGER", "conv_more": "INTEGER", "conv_err": "REAL"}
+
+
+def default_index_path() -> Path:
+    path = os.getenv("REMOTE_INDEX_PATH") or Path.home() / ".cache" / "simapp" / "remote_state.sqlite"
+    return Path(path)
+
+
+def default_ttl() -> float:
+    return float(os.getenv("REMOTE_INDEX_TTL") or DEFAULT_TTL)
+
+
+class RemoteIndex:
+    """
+    Локальный SQLite-индекс состояния симуляций на кластере (результат scan_remote_simulations).
+    Чтения обслуживаются из индекса, пока он моложе ttl; после qsub/рестарта индекс
+    инвалидируется явно. root = 'user@host:cluster_sim_path', чтобы не смешивать кластеры.
+    """
+
+    def __init__(self, root: str, db_path: Optional[Path] = None, ttl: Optional[float] = None):
+        self.root = root
+        self.ttl = default_ttl() if ttl is None else ttl
+        self.db_path = Path(db_path) if db_path is not None else default_index_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS simulations ("
+                " root TEXT NOT NULL, folder TEXT NOT NULL,"
+                " nrun INTEGER, last_step INTEGER,"
+                " log_size INTEGER, log_mtime INTEGER,"
+                " densF_size INTEGER, densF_mtime INTEGER,"
+                " conv_status TEXT, conv_step INTEGER, conv_more INTEGER, conv_err REAL,"
+                " updated_at REAL NOT NULL, stale INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (root, folder))")
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(simulations)")}
+            for column, sql_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE simulations ADD COLUMN {column} {sql_type}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS refresh (root TEXT PRIMARY KEY, refreshed_at REAL NOT NULL)")
+
+    # --- чтение ---
+    def refreshed_at(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT refreshed_at FROM refresh WHERE root = ?", (self.root,)).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self) -> bool:
+        """Индекс свежий: обновлён не раньше ttl секунд назад и ни одна папка не помечена stale."""
+        refreshed = self.refreshed_at()
+        if refreshed is None or time.time() - refreshed > self.ttl:
+            return False
+        with self._lock:
+            stale = self._conn.execute("SELECT COUNT(*) FROM simulations WHERE root = ? AND stale = 1",
+                                       (self.root,)).fetchone()[0]
+        return stale == 0
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Последнее известное состояние (может быть устаревшим – см. is_fresh)."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM simulations WHERE root = ? ORDER BY folder", (self.root,))
+            return [dict(zip(_COLUMNS, row)) for row in cur.fetchall()]
+
+    def folders(self) -> List[str]:
+        return [row["folder"] for row in self.rows()]
+
+    def get(self, folder: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM simulations WHERE root = ? AND folder = ?",
+                (self.root, folder)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    # --- запись ---
+    def replace_all(self, rows: List[Dict[str, Any]]) -> None:
+        """Полная замена после скана всех папок."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM simulations WHERE root = ?", (self.root,))
+            self._conn.executemany(
+                f"INSERT INTO simulations (root, {', '.join(_COLUMNS)}, updated_at)"
+                f" VALUES ({', '.join('?' * (len(_COLUMNS) + 2))})",
+                [(self.root, *(row.get(c) for c in _COLUMNS), now) for row in rows])
+            self._conn.execute("INSERT OR REPLACE INTO refresh (root, refreshed_at) VALUES (?, ?)",
+                               (self.root, now))
+
+    def update(self, folder: str, **fields) -> None:
+        """Точечное обновление одной папки (например, после рестарта известен новый nrun)."""
+        fields = {k: v for k, v in fields.items() if k in _COLUMNS and k != "folder"}
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO simulations (root, folder, updated_at) VALUES (?, ?, ?)",
+                (self.root, folder, now))
+            if fields:
+                assignments = ", ".join(f"{k} = ?" for k in fields)
+                self._conn.execute(
+                    f"UPDATE simulations SET {assignments}, updated_at = ? WHERE root = ? AND folder = ?",
+                    (*fields.values(), now, self.root, folder))
+
+    def invalidate(self, folder: Optional[str] = None) -> None:
+        """Пометить папку (или весь индекс) устаревшей – следующее чтение пойдёт на кластер."""
+        with self._lock, self._conn:
+            if folder is None:
+                self._conn.execute("DELETE FROM refresh WHERE root = ?", (self.root,))
+            else:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO simulations (root, folder, updated_at) VALUES (?, ?, ?)",
+                    (self.root, folder, time.time()))
+                self._conn.execute("UPDATE simulations SET stale = 1 WHERE root = ? AND folder = ?",
+                                   (self.root, folder))
+
+    def close(self):
+        self._conn.close()
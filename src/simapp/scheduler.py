@@ -0,0 +1,279 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+import re
+
+import yaml
+
+from path import CONFIG
+from pbs_parser import NodeLoad
+from load_history import NodeHistory, node_capacity
+
+CLUSTER_FILE = CONFIG / "cluster.yaml"
+WALLTIME_SAFETY = 1.25   # rezerva na odhad doby běhu
+WALLTIME_MARGIN_H = 1    # + hodina na start/zápis restartů
+BUSY_CPU_PCT = 90        # bez známé kapacity: noda s vyšší zátěží (/nodes, %) se bere jako obsazená
+
+
+@dataclass
+class ClusterLayout:
+    """Fronty, nody a parametry odhadu doby běhu (src/config/cluster.yaml)."""
+    node_to_queue: Dict[str, str]
+    queue_walltime_h: Dict[str, float]
+    node_cpus: Dict[str, int] = field(default_factory=dict)
+    steps_per_core_s: float = 0.8
+    mem_gb_per_matom: float = 2.0
+    min_mem_gb: int = 8
+    ppn_choices: List[int] = field(default_factory=lambda: [4, 8, 16, 32])
+    busy_wait_h: float = 12.0
+
+    def walltime_text(self, queue: str) -> Optional[str]:
+        """Limit fronty pro GUI: '20 dnů', '3 dny', '12 h'."""
+        hours = self.queue_walltime_h.get(queue)
+        if hours is None:
+            return None
+        days, rest = divmod(hours, 24)
+        if rest:
+            return f"{hours:g} h"
+        days = int(days)
+        if days == 1:
+            return "1 den"
+        return f"{days} dny" if 2 <= days <= 4 else f"{days} dnů"
+
+
+def load_cluster_layout(path=CLUSTER_FILE) -> ClusterLayout:
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+
+    node_to_queue, walltime, queue_cpus = {}, {}, {}
+    for queue, info in (data.get("queues") or {}).items():
+        walltime[queue] = float(info["max_walltime_h"])
+        queue_cpus[queue] = info.get("cpus")
+        for node in info.get("nodes") or []:
+            node_to_queue[node] = queue
+
+    defaults = ClusterLayout({}, {})
+    return ClusterLayout(
+        node_to_queue=node_to_queue,
+        queue_walltime_h=walltime,
+        node_cpus=node_capacity(node_to_queue, queue_cpus),
+        steps_per_core_s=float(data.get("steps_per_core_s", defaults.steps_per_core_s)),
+        mem_gb_per_matom=float(data.get("mem_gb_per_matom", defaults.mem_gb_per_matom)),
+        min_mem_gb=int(data.get("min_mem_gb", defaults.min_mem_gb)),
+        ppn_choices=sorted(int(p) for p in data.get("ppn_choices", defaults.ppn_choices)),
+        busy_wait_h=float(data.get("busy_wait_h", defaults.busy_wait_h)),
+    )
+
+
+@dataclass
+class JobSpec:
+    """Jeden job k naplánování: kolik kroků zbývá a (pokud je znám) počet atomů."""
+    name: str
+    steps: int
+    atoms: Optional[int] = None
+
+
+@dataclass
+class NodeState:
+    node: str
+    queue: str
+    cpus: Optional[int]          # kapacita nody, None = neznámá
+    used_cpus: Optional[float]   # teď obsazeno
+    avg_free_cpus: Optional[float] = None  # průměr z historie (tie-break)
+    cpu_pct: Optional[float] = None        # zátěž z /nodes (%) – pořadí nod, když kapacita není známa
+
+    @property
+    def free_cpus(self) -> Optional[float]:
+        if self.cpus is None or self.used_cpus is None:
+            return None
+        return max(0.0, self.cpus - self.used_cpus)
+
+
+@dataclass
+class Recommendation:
+    node: str
+    queue: str
+    ppn: int
+    mem_gb: int
+    walltime: str        # 'HH:MM:SS' pro #PBS -l walltime
+    est_hours: float     # odhad doby běhu
+    start_hours: float   # odhad čekání (0 = volná jádra teď)
+    fits_walltime: bool = True  # False – nestihne se v limitu fronty, bude potřeba restart
+    reason: str = ""
+
+    @property
+    def finish_hours(self) -> float:
+        return self.start_hours + self.est_hours
+
+
+def estimate_atoms(config) -> int:
+    """Přibližný počet atomů z geometrie (stejné vzorce jako particle_generator, bez mřížky)."""
+    Lx, Ly, Lz = config["Lx"], config["Ly"], config["Lz"]
+    fluid_gap = config["fluid_gap"]
+    wall_thickness = max(0.0, (Lz - fluid_gap - 2 * config["sig12"]) / 2.0)
+    return int(config["rho_fluid"] * Lx * Ly * fluid_gap + config["rho_wall"] * 2 * Lx * Ly * wall_thickness)
+
+
+def template_nrun(template_path=CONFIG / "box_template.in") -> Optional[int]:
+    """Počet kroků 'variable nrun equal N' ze šablony box.in."""
+    with open(template_path, "r") as f:
+        match = re.search(r"^variable\s+nrun\s+equal\s+(\d+)", f.read(), re.MULTILINE)
+    return int(match.group(1)) if match else None
+
+
+def estimate_hours(job: JobSpec, ppn: int, layout: ClusterLayout) -> float:
+    """Lineární model: kroky / (rychlost na jádro pro 1M atomů × ppn / M atomů)."""
+    matoms = (job.atoms or 1_000_000) / 1e6
+    steps_per_s = layout.steps_per_core_s * ppn / max(matoms, 1e-6)
+    return job.steps / steps_per_s / 3600.0
+
+
+def estimate_mem_gb(job: JobSpec, layout: ClusterLayout) -> int:
+    if not job.atoms:
+        return layout.min_mem_gb
+    return max(layout.min_mem_gb, math.ceil(job.atoms / 1e6 * layout.mem_gb_per_matom))
+
+
+def _walltime(est_hours: float, max_hours: float) -> str:
+    hours = min(max_hours, math.ceil(est_hours * WALLTIME_SAFETY + WALLTIME_MARGIN_H))
+    return f"{int(hours):02d}:00:00"
+
+
+def chain_plan(rec: Recommendation, layout: ClusterLayout) -> Tuple[int, str]:
+    """
+    Běh přes limit fronty jako řetěz segmentů (cluster_service.submit_restart_chain):
+    (počet segmentů, walltime jednoho segmentu = limit fronty).
+    """
+    max_hours = layout.queue_walltime_h.get(rec.queue)
+    if rec.fits_walltime or not max_hours:
+        return 1, rec.walltime
+    usable = max(1.0, max_hours - WALLTIME_MARGIN_H)
+    return math.ceil(rec.est_hours * WALLTIME_SAFETY / usable), f"{int(max_hours):02d}:00:00"
+
+
+def node_states(layout: ClusterLayout, source: Optional[str], snapshot: Optional[Dict[str, NodeLoad]],
+                history: Optional[Dict[str, NodeHistory]] = None) -> List[NodeState]:
+    """Stav nod z pbsweb snapshotu (source 'nodes' – procenta, 'jobs' – obsazená jádra) a historie."""
+    states = []
+    for node, queue in layout.node_to_queue.items():
+        cpus = layout.node_cpus.get(node)
+        load = (snapshot or {}).get(node)
+        used: Optional[float] = None
+        if source == "jobs":
+            used = load.cpus if load is not None else 0.0  # na /jobs chybí nody bez běžících jobů
+        elif load is not None and load.cpu_pct is not None and cpus:
+            used = load.cpu_pct / 100.0 * cpus
+        hist = (history or {}).get(node)
+        states.append(NodeState(node, queue, cpus, used, hist.avg_free_cpus if hist is not None else None,
+                                load.cpu_pct if load is not None else None))
+    return states
+
+
+def _candidates(job: JobSpec, state: NodeState, free: Optional[float], releases: List[Tuple[float, int]],
+                layout: ClusterLayout):
+    """Všechny (finish, -ppn, rec) pro job na jedné nodě; releases – kdy uvolní jádra naše dřív umístěné joby."""
+    max_hours = layout.queue_walltime_h.get(state.queue, float("inf"))
+    for ppn in layout.ppn_choices:
+        if state.cpus is not None and ppn > state.cpus:
+            continue
+        est = estimate_hours(job, ppn, layout)
+
+        if free is None:
+            # kapacita neznámá: prázdná noda = volno, cizí joby (nebo zátěž z /nodes nad BUSY_CPU_PCT)
+            # = odhad čekání, naše dřív umístěné joby na téže nodě se berou jako postupné
+            busy = state.used_cpus if state.used_cpus is not None else (state.cpu_pct or 0.0) >= BUSY_CPU_PCT
+            start = max([layout.busy_wait_h if busy else 0.0] + [when for when, _ in releases])
+        elif free >= ppn:
+            start = 0.0
+        else:
+            # čekáme, až naše dřívější joby uvolní dost jader; cizí joby ne – odtud busy_wait_h
+            start, available = layout.busy_wait_h, free
+            for when, cores in sorted(releases):
+                available += cores
+                if available >= ppn:
+                    start = min(start, when)
+                    break
+
+        rec = Recommendation(state.node, state.queue, ppn, estimate_mem_gb(job, layout),
+                             _walltime(est, max_hours), est, start,
+                             fits_walltime=est * WALLTIME_SAFETY <= max_hours)
+        yield rec.finish_hours, -ppn, rec
+
+
+def _pick(job: JobSpec, states: Iterable[NodeState], free: Dict[str, Optional[float]],
+          releases: Dict[str, List[Tuple[float, int]]], layout: ClusterLayout) -> Optional[Recommendation]:
+    best, best_key = None, None
+    for state in states:
+        for finish, neg_ppn, rec in _candidates(job, state, free[state.node], releases[state.node], layout):
+            # nejdřív to, co se vejde do limitu fronty, pak nejdřívější konec, pak nižší zátěž z /nodes,
+            # pak víc volných jader v průměru (klidnější noda), pak víc ppn
+            avg_free = state.avg_free_cpus if state.avg_free_cpus is not None else -1.0
+            cpu_pct = state.cpu_pct if state.cpu_pct is not None else 100.0
+            key = (not rec.fits_walltime, round(finish, 3), cpu_pct, -avg_free, neg_ppn, state.node)
+            if best_key is None or key < best_key:
+                best, best_key = rec, key
+    return best
+
+
+def recommend(job: JobSpec, layout: ClusterLayout, states: List[NodeState]) -> Optional[Recommendation]:
+    """Doporučení nody, fronty, ppn, paměti a walltime pro jeden job (None – žádná noda / ppn)."""
+    free = {s.node: s.free_cpus for s in states}
+    releases = {s.node: [] for s in states}
+    rec = _pick(job, states, free, releases, layout)
+    if rec is not None:
+        rec.reason = _reason(rec, {s.node: s for s in states}[rec.node])
+    return rec
+
+
+def place_batch(jobs: List[JobSpec], layout: ClusterLayout,
+                states: List[NodeState]) -> Dict[str, Optional[Recommendation]]:
+    """
+    Rozmístí dávku jobů tak, aby celá skončila co nejdřív (greedy LPT: nejdelší job první,
+    každý na nodu s nejdřívějším koncem; obsazená jádra se odečítají pro další joby).
+    """
+    by_node = {s.node: s for s in states}
+    free = {s.node: s.free_cpus for s in states}
+    releases: Dict[str, List[Tuple[float, int]]] = {s.node: [] for s in states}
+    # neznámá kapacita: každý umístěný job nodu "obsadí", aby se dávka rozprostřela
+    used_unknown = {s.node: s.used_cpus for s in states}
+
+    placement: Dict[str, Optional[Recommendation]] = {}
+    order = sorted(jobs, key=lambda j: estimate_hours(j, 1, layout), reverse=True)
+    for job in order:
+        view = [NodeState(s.node, s.queue, s.cpus, used_unknown[s.node], s.avg_free_cpus, s.cpu_pct) for s in states]
+        rec = _pick(job, view, free, releases, layout)
+        placement[job.name] = rec
+        if rec is None:
+            continue
+        rec.reason = _reason(rec, by_node[rec.node])
+        node_releases = releases[rec.node]
+        if free[rec.node] is None:
+            used_unknown[rec.node] = (used_unknown[rec.node] or 0.0) + rec.ppn
+        elif rec.start_hours == 0.0:
+            free[rec.node] -= rec.ppn
+        else:
+            # job čeká na jádra našich dřívějších jobů – ta se spotřebují, zbytek se uvolní v čase startu
+            available = free[rec.node]
+            for item in sorted(node_releases):
+                if item[0] > rec.start_hours:
+                    break
+                available += item[1]
+                node_releases.remove(item)
+            free[rec.node] = 0.0
+            if available > rec.ppn:
+                node_releases.append((rec.start_hours, available - rec.ppn))
+        node_releases.append((rec.finish_hours, rec.ppn))
+    return placement
+
+
+def _reason(rec: Recommendation, state: NodeState) -> str:
+    free = state.free_cpus
+    free_text = "?" if free is None else f"{free:.0f}"
+    if free is None and state.cpu_pct is not None:
+        free_text += f" (zátěž {state.cpu_pct:.0f} %)"
+    wait = "hned" if rec.start_hours == 0 else f"čekání ~{rec.start_hours:.0f} h"
+    text = f"{rec.node} ({rec.queue}): volných jader {free_text}, {wait}, odhad běhu {rec.est_hours:.1f} h"
+    if not rec.fits_walltime:
+        text += " – přes limit fronty, bude potřeba restart"
+    return text
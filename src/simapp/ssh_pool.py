@@ -0,0 +1,302 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+import os
+import posixpath
+import queue
+import stat
+import subprocess
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import paramiko
+except ImportError:  # paramiko je volitelný – bez něj cluster_service používá plink/pscp
+    paramiko = None
+
+
+DEFAULT_POOL_SIZE = 2
+CONNECT_TIMEOUT = 15
+
+
+def _remote(path: str) -> str:
+    """SFTP neumí '~' – cesty relativní k domovské složce stačí bez něj."""
+    if path == "~":
+        return "."
+    if path.startswith("~/"):
+        return path[2:]
+    return path
+
+
+class SSHPool:
+    """
+    Пул долгоживущих SSH-соединений (paramiko) к одному хосту.
+    Соединения создаются лениво, не больше size штук; мёртвый транспорт
+    переподключается автоматически (одна повторная попытка на команду).
+    """
+
+    def __init__(self, host: str, user_name: str, key_path: str, size: int = DEFAULT_POOL_SIZE):
+        if paramiko is None:
+            raise RuntimeError("paramiko není nainstalován")
+        self.host = host
+        self.user_name = user_name
+        self.key_path = key_path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[paramiko.SSHClient]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    # --- соединения ---
+    def _connect(self) -> "paramiko.SSHClient":
+        client = paramiko.SSHClient()
+        # neznámý klíč hostu se odmítá (jako plink -batch): ~/.ssh/known_hosts, případně SSH_KNOWN_HOSTS
+        client.load_system_host_keys()
+        known_hosts = os.getenv("SSH_KNOWN_HOSTS")
+        if known_hosts:
+            client.load_host_keys(known_hosts)
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        client.connect(self.host, username=self.user_name, key_filename=self.key_path,
+                       timeout=CONNECT_TIMEOUT, allow_agent=False, look_for_keys=False)
+        client.get_transport().set_keepalive(30)
+        return client
+
+    def _acquire(self) -> "paramiko.SSHClient":
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if not can_create:
+                client = self._idle.get()
+            else:
+                return self._reconnect()
+
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            client.close()
+            client = self._reconnect()
+        return client
+
+    def _reconnect(self) -> "paramiko.SSHClient":
+        """Новое соединение на уже зарезервированное место (_created); при неудаче место освобождается."""
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, client: "paramiko.SSHClient", broken: bool = False):
+        if broken:
+            client.close()
+            with self._lock:
+                self._created -= 1
+        else:
+            self._idle.put(client)
+
+    def _with_client(self, func):
+        """Выполняет func(client); при обрыве соединения один раз переподключается."""
+        for attempt in (1, 2):
+            client = self._acquire()
+            try:
+                result = func(client)
+            except Exception:
+                transport = client.get_transport()
+                if transport is not None and transport.is_active():
+                    # ошибка самой операции (нет файла и т.п.), соединение живое
+                    self._release(client)
+                    raise
+                self._release(client, broken=True)
+                if attempt == 2:
+                    raise
+                continue
+            self._release(client)
+            return result
+
+    # --- команды ---
+    def run(self, command: str, input: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Аналог plink: возвращает CompletedProcess(returncode, stdout, stderr); input – текст на stdin."""
+        def _exec(client):
+            stdin, stdout, stderr = client.exec_command(command)
+            if input is not None:
+                stdin.write(input.encode("utf-8"))
+                stdin.channel.shutdown_write()
+            out = stdout.read().decode("utf-8", errors="replace")
+            err = stderr.read().decode("utf-8", errors="replace")
+            code = stdout.channel.recv_exit_status()
+            return subprocess.CompletedProcess(command, code, out, err)
+        return self._with_client(_exec)
+
+    @contextmanager
+    def stream(self, command: str):
+        """
+        Запускает команду и отдаёт (stdout, stderr) как файловые объекты для потокового чтения
+        (например, tar-поток). Соединение занято, пока открыт контекст.
+        """
+        client = self._acquire()
+        broken = False
+        channel = None
+        try:
+            _, stdout, stderr = client.exec_command(command)
+            channel = stdout.channel
+            yield stdout, stderr
+        except Exception:
+            transport = client.get_transport()
+            broken = transport is None or not transport.is_active()
+            raise
+        finally:
+            if channel is not None:
+                channel.close()
+            self._release(client, broken=broken)
+
+    @contextmanager
+    def sink(self, command: str):
+        """
+        Запускает команду и отдаёт её stdin для потоковой записи (например, tar-поток на кластер).
+        После выхода из контекста stdin закрывается; при ненулевом коде выхода – RuntimeError.
+        """
+        client = self._acquire()
+        broken = False
+        channel = None
+        try:
+            stdin, stdout, stderr = client.exec_command(command)
+            channel = stdin.channel
+            yield stdin
+            channel.shutdown_write()
+            code = channel.recv_exit_status()
+            if code != 0:
+                raise RuntimeError(stderr.read().decode("utf-8", errors="replace") or f"exit {code}")
+        except Exception:
+            transport = client.get_transport()
+            broken = transport is None or not transport.is_active()
+            raise
+        finally:
+            if channel is not None:
+                channel.close()
+            self._release(client, broken=broken)
+
+    # --- передача файлов ---
+    def get(self, remote_path: str, local_path: str, recursive: bool = False) -> None:
+        """Аналог pscp user@host:remote local. Поддерживает '<dir>/*' и рекурсию."""
+        def _get(client):
+            sftp = client.open_sftp()
+            try:
+                src = _remote(remote_path)
+                if src.endswith("/*"):
+                    base = src[:-2]
+                    Path(local_path).mkdir(parents=True, exist_ok=True)
+                    for attr in sftp.listdir_attr(base):
+                        self._get_entry(sftp, posixpath.join(base, attr.filename), attr,
+                                        os.path.join(local_path, attr.filename), recursive)
+                    return
+                attr = sftp.stat(src)
+                dest = local_path
+                if os.path.isdir(dest):
+                    dest = os.path.join(dest, posixpath.basename(src.rstrip("/")))
+                self._get_entry(sftp, src, attr, dest, recursive)
+            finally:
+                sftp.close()
+        self._with_client(_get)
+
+    def _get_entry(self, sftp, src: str, attr, dest: str, recursive: bool):
+        if stat.S_ISDIR(attr.st_mode):
+            if not recursive:
+                return
+            Path(dest).mkdir(parents=True, exist_ok=True)
+            for child in sftp.listdir_attr(src):
+                self._get_entry(sftp, posixpath.join(src, child.filename), child,
+                                os.path.join(dest, child.filename), recursive)
+        else:
+            sftp.get(src, dest)
+
+    def put(self, local_path: str, remote_path: str, recursive: bool = False) -> None:
+        """
+        Аналог pscp [-r] local user@host:remote: existuje-li remote jako složka, kopíruje se
+        do remote/<jméno>, jinak vznikne remote (složka s obsahem local, nebo soubor).
+        """
+        def _put(client):
+            sftp = client.open_sftp()
+            try:
+                src = Path(local_path)
+                dest = _remote(remote_path)
+                try:
+                    if stat.S_ISDIR(sftp.stat(dest).st_mode):
+                        dest = posixpath.join(dest, src.name)
+                except IOError:
+                    pass  # remote ještě neexistuje
+                self._put_entry(sftp, src, dest, recursive)
+            finally:
+                sftp.close()
+        self._with_client(_put)
+
+    def _put_entry(self, sftp, src: Path, dest: str, recursive: bool):
+        if src.is_dir():
+            if not recursive:
+                return
+            try:
+                sftp.mkdir(dest)
+            except IOError:
+                pass  # уже существует
+            for child in src.iterdir():
+                self._put_entry(sftp, child, posixpath.join(dest, child.name), recursive)
+        else:
+            sftp.put(str(src), dest)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+_pools: Dict[Tuple[str, str, str], SSHPool] = {}
+_pools_lock = threading.Lock()
+
+
+def openssh_key_path(key_path: str) -> Optional[str]:
+    """
+    paramiko neumí PuTTY .ppk – použije se CLUSTER_OPENSSH_KEY_PATH z .env,
+    případně key_path, pokud to .ppk není.
+    """
+    key = os.getenv("CLUSTER_OPENSSH_KEY_PATH")
+    if key:
+        return key
+    if key_path and not key_path.lower().endswith(".ppk"):
+        return key_path
+    return None
+
+
+def get_pool(key_path: str, user_name: str, host: str) -> Optional[SSHPool]:
+    """
+    Возвращает общий пул для (host, user, key) или None, если пул недоступен
+    (нет paramiko, нет OpenSSH-ключа или SSH_POOL_SIZE=0) – тогда вызывающий
+    код работает через plink/pscp как раньше.
+    """
+    if paramiko is None or not host or not user_name:
+        return None
+    size = int(os.getenv("SSH_POOL_SIZE") or DEFAULT_POOL_SIZE)
+    if size <= 0:
+        return None
+    key = openssh_key_path(key_path)
+    if key is None:
+        return None
+
+    pool_key = (host, user_name, key)
+    with _pools_lock:
+        pool = _pools.get(pool_key)
+        if pool is None:
+            pool = SSHPool(host, user_name, key, size=size)
+            _pools[pool_key] = pool
+        return pool
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()